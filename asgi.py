@@ -0,0 +1,5 @@
+from app import app
+from async_app import create_asgi_app
+
+# gunicorn -k uvicorn.workers.UvicornWorker asgi:application
+application = create_asgi_app(app)
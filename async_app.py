@@ -0,0 +1,167 @@
+"""
+ASGI front for the Flask app (served by asgi.py)
+The Gemini-bound endpoints — /api/chat, /api/voice/chat and
+/api/build-itinerary — run as coroutines on the event loop, so a request
+waiting on Gemini or edge-tts holds no thread. Every other route is passed
+through to the unchanged Flask app via asgiref's WSGI adapter.
+"""
+
+import asyncio
+import io
+import sys
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import request
+
+from middleware.rate_limit import check_rate_limit
+from routes.chat import chat_async
+from routes.itinerary_builder import build_itinerary_async
+from routes.voice import voice_chat_async, MAX_FILE_SIZE
+from services.conversation_writer import conversation_writer
+from logger import get_logger
+
+log = get_logger("asgi")
+
+MAX_BODY_BYTES = MAX_FILE_SIZE + 1024 * 1024  # audio upload plus form overhead
+
+
+async def _chat(app):
+    return await chat_async(app, request.get_json(silent=True))
+
+
+async def _voice_chat(app):
+    return await voice_chat_async(app, request.files, request.form)
+
+
+async def _build_itinerary(app):
+    return await build_itinerary_async(app, request.get_json(silent=True))
+
+
+# path -> (handler, rate limited) — POST only; OPTIONS and everything else go to Flask
+_NATIVE_ROUTES = {
+    "/api/chat": (_chat, False),
+    "/api/voice/chat": (_voice_chat, True),
+    "/api/build-itinerary": (_build_itinerary, True),
+}
+
+
+def _environ(scope, body):
+    """Minimal WSGI environ for an ASGI HTTP scope, so Flask can parse the request."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("ascii"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1")
+        value = value.decode("latin-1")
+        if name == "content-length":
+            continue
+        if name == "content-type":
+            environ["CONTENT_TYPE"] = value
+            continue
+        key = "HTTP_" + name.upper().replace("-", "_")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _read_body(receive):
+    """Whole request body, or None if it exceeds MAX_BODY_BYTES."""
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+async def _send_response(send, response):
+    headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in response.headers.items()]
+    await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": response.get_data()})
+
+
+class AsyncApp:
+    """ASGI application: native async handlers for the Gemini routes, Flask for the rest."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+
+        route = None
+        if scope["type"] == "http" and scope["method"] == "POST":
+            route = _NATIVE_ROUTES.get(scope["path"])
+        if route is None:
+            return await self.wsgi(scope, receive, send)
+
+        body = await _read_body(receive)
+        if body is None:
+            await send({"type": "http.response.start", "status": 413,
+                        "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": b'{"error": "Request body too large"}'})
+            return
+        await _send_response(send, await self._dispatch(route, _environ(scope, body)))
+
+    async def _dispatch(self, route, environ):
+        """Run one native route inside a Flask request context, with Flask's before/after hooks (CORS, logging)."""
+        handler, rate_limited = route
+        app = self.flask_app
+        ctx = app.request_context(environ)
+        ctx.push()
+        error = None
+        try:
+            try:
+                rv = app.preprocess_request()
+                if rv is None and rate_limited:
+                    rv = check_rate_limit(request.remote_addr)
+                if rv is None:
+                    rv = await handler(app)
+                response = app.make_response(rv)
+            except Exception as e:
+                error = e
+                log.error(f"ASGI {environ['PATH_INFO']} failed: {e}", exc_info=True)
+                response = app.make_response(app.handle_exception(e))
+            return app.process_response(response)
+        finally:
+            ctx.pop(error)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                # Flush queued conversation writes before the worker exits
+                await asyncio.to_thread(conversation_writer.drain)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(flask_app):
+    return AsyncApp(flask_app)
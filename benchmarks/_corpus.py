@@ -0,0 +1,57 @@
+"""
+Synthetic stand-in for the scraped everythinguganda.com corpus.
+Used when company_content.txt is not present so benchmarks run offline.
+"""
+
+import os
+import random
+
+from services.content_fetcher import SITE_URLS
+
+_TOPICS = {
+    "/": ["Uganda", "Pearl of Africa", "safari", "adventure", "travel"],
+    "/facts": ["population", "currency", "shilling", "equator", "climate"],
+    "/culture": ["Buganda", "kingdom", "dance", "drums", "ceremony"],
+    "/top-cities/kampala": ["Kampala", "market", "nightlife", "mosque", "taxi"],
+    "/religion": ["church", "martyrs", "Namugongo", "pilgrimage", "faith"],
+    "/travel-tips": ["visa", "vaccination", "yellow fever", "packing", "malaria"],
+    "/destinations": ["Bwindi", "gorilla", "Murchison", "falls", "Queen Elizabeth"],
+    "/holiday-types?type=birding-holidays": ["shoebill", "birding", "Mabamba", "swamp", "species"],
+    "/about": ["team", "mission", "company", "founded", "partners"],
+    "/where-to-stay": ["lodge", "hotel", "accommodation", "guesthouse", "luxury"],
+    "/insights": ["guide", "season", "itinerary", "budget", "blog"],
+    "/impact": ["community", "conservation", "school", "donation", "sustainable"],
+}
+
+_FILLER = (
+    "the visitors experience region local guided tour day journey views people "
+    "park road trip morning evening lake river forest hills wildlife").split()
+
+_DEFAULT_TOPIC = ["Uganda"]
+
+
+def load_corpus(target_chars=238000, seed=7):
+    """company_content.txt when available, otherwise a deterministic synthetic corpus."""
+    if os.path.exists("company_content.txt"):
+        with open("company_content.txt", "r", encoding="utf-8") as f:
+            return f.read()
+
+    rng = random.Random(seed)
+    per_page = target_chars // len(SITE_URLS)
+    pages = []
+    for url in SITE_URLS:
+        path = url.replace("https://www.everythinguganda.com", "") or "/"
+        topic = _TOPICS.get(path, _DEFAULT_TOPIC)
+        lines = []
+        size = 0
+        while size < per_page:
+            heading = f"{rng.choice(topic).title()} {rng.choice(_FILLER).title()}"
+            lines.append(heading)
+            for _ in range(rng.randint(2, 5)):
+                words = [rng.choice(topic if rng.random() < 0.25 else _FILLER) for _ in range(rng.randint(15, 40))]
+                sentence = " ".join(words).capitalize() + "."
+                lines.append(sentence)
+                size += len(sentence)
+        pages.append(f"\n--- CONTENT FROM {url} ---\n" + "\n".join(lines))
+    return "\n".join(pages)
+
@@ -0,0 +1,154 @@
+"""
+CacheManager before and after the striped LRU rewrite: throughput on a
+skewed get/set mix at 1 and 8 threads (with a concurrent clear(), as a
+content refresh does), memory under a stream of unique
+keys, and the cost of expiring a large batch of short-TTL entries.
+
+    python -m benchmarks.bench_cache_manager [--ops 200000] [--keys 50000]
+"""
+
+import argparse
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from services.cache_manager import StripedLRUCache
+
+
+class LegacyCache:
+    """The previous CacheManager: two unbounded dicts, no lock, wall-clock TTLs."""
+
+    def __init__(self):
+        self._cache = {}
+        self._cache_timestamps = {}
+
+    def get(self, key):
+        if key in self._cache:
+            if self._is_expired(key):
+                self.delete(key)
+                return None
+            return self._cache[key]
+        return None
+
+    def set(self, key, value, ttl):
+        self._cache[key] = value
+        self._cache_timestamps[key] = {'created_at': datetime.utcnow(), 'ttl': ttl}
+
+    def delete(self, key):
+        if key in self._cache:
+            del self._cache[key]
+        if key in self._cache_timestamps:
+            del self._cache_timestamps[key]
+
+    def _is_expired(self, key):
+        if key not in self._cache_timestamps:
+            return True
+        data = self._cache_timestamps[key]
+        return datetime.utcnow() > data['created_at'] + timedelta(seconds=data['ttl'])
+
+    def clear(self):
+        self._cache.clear()
+        self._cache_timestamps.clear()
+
+    def cleanup_expired(self):
+        expired = [key for key in list(self._cache.keys()) if self._is_expired(key)]
+        for key in expired:
+            self.delete(key)
+        return len(expired)
+
+    def __len__(self):
+        return len(self._cache)
+
+
+def _keys(n_ops, n_keys, seed):
+    rng = random.Random(seed)
+    # Zipf-ish popularity: a few hot keys, a long tail
+    return [f"k{int(n_keys * rng.random() ** 3)}" for _ in range(n_ops)]
+
+
+def _mix(cache, keys, value, errors):
+    for i, key in enumerate(keys):
+        try:
+            if i % 10 == 0 or cache.get(key) is None:
+                cache.set(key, value, 60)
+        except Exception:
+            errors.append(key)
+
+
+def _clearer(cache, stop):
+    # A content refresh clearing the cache while requests are reading it
+    while not stop.wait(0.005):
+        cache.clear()
+
+
+def throughput(make, ops, n_keys, threads):
+    cache = make()
+    value = "x" * 512
+    errors = []
+    stop = threading.Event()
+    chunks = [_keys(ops // threads, n_keys, seed) for seed in range(threads)]
+    workers = [threading.Thread(target=_mix, args=(cache, chunk, value, errors)) for chunk in chunks]
+    clearer = threading.Thread(target=_clearer, args=(cache, stop))
+    t0 = time.perf_counter()
+    clearer.start()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - t0
+    stop.set()
+    clearer.join()
+    return ops / wall, len(errors)
+
+
+def growth(make, n):
+    cache = make()
+    value = "y" * 1024
+    for i in range(n):
+        cache.set(f"unique-{i}", value, 3600)
+    return len(cache)
+
+
+def expiry(make, n):
+    cache = make()
+    for i in range(n):
+        cache.set(f"short-{i}", i, 0.05)
+    time.sleep(0.1)
+    held = len(cache)
+    t0 = time.perf_counter()
+    dropped = cache.cleanup_expired()
+    return held, dropped, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--keys", type=int, default=50000)
+    args = parser.parse_args()
+
+    # Throughput and expiry run with room for every key, so both sides see the same hit rate
+    roomy = (("legacy", LegacyCache),
+             ("striped", lambda: StripedLRUCache(max_entries=10**6, max_bytes=2**30)))
+    bounded = (("legacy", LegacyCache),
+               ("striped", lambda: StripedLRUCache(max_entries=10000, max_bytes=64 * 2**20)))
+
+    print(f"get/set mix (90% reads, {args.keys:,} keys, skewed), {args.ops:,} ops, clear() every 5 ms")
+    for threads in (1, 8):
+        for label, make in roomy:
+            rate, errors = throughput(make, args.ops, args.keys, threads)
+            print(f"  {label:<8} threads={threads}  {rate:>10,.0f} ops/s  errors={errors}")
+
+    n = 200000
+    print(f"\n{n:,} unique 1 KiB values, striped bounded to 10,000 entries / 64 MiB")
+    for label, make in bounded:
+        print(f"  {label:<8} entries held={growth(make, n):,}")
+
+    print(f"\n{n:,} entries with a 50 ms TTL: still held once all are due, then cleanup_expired()")
+    for label, make in roomy:
+        held, dropped, took = expiry(make, n)
+        print(f"  {label:<8} held={held:>8,}  cleanup dropped {dropped:,} in {took * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+CacheManager with and without a shared L2, across forked worker processes
+the way gunicorn runs them: the combined hit rate of a cache-aside workload,
+how long a clear() in one worker takes to reach the others, and the size and
+speed of the L2 value encoding against JSON and pickle.
+
+    python -m benchmarks.bench_cache_tiers [--workers 4] [--requests 20000] [--keys 5000]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import random
+import tempfile
+import time
+
+os.environ.setdefault("CACHE_L2", "none")   # the process-wide store isn't measured here
+
+import services.cache_manager as cache_manager
+from services.cache_backends import backend_from_url, decode, encode
+from services.cache_manager import StripedLRUCache, TwoTierCache
+from fake_redis import FakeRedisServer
+
+SAMPLE = {
+    "package_name": "Gorillas, Chimps & the Source of the Nile",
+    "duration": "7 days",
+    "days": [{"day": d, "title": f"Day {d} in Bwindi", "activities": ["gorilla trekking", "nature walk"],
+              "accommodation": "Buhoma Lodge", "meals": ["B", "L", "D"], "cost_gbp": 420.0}
+             for d in range(1, 8)],
+    "total_cost_gbp": 2940.0,
+    "tips": ["Pack rain gear", "Book permits early"],
+}
+
+
+def _make(url):
+    return TwoTierCache(StripedLRUCache(), backend_from_url(url) if url else None)
+
+
+def _workload(url, requests, n_keys, seed, results):
+    cache = _make(url)
+    rng = random.Random(seed)
+    computed = 0
+    t0 = time.perf_counter()
+    for _ in range(requests):
+        key = f"k{int(n_keys * rng.random() ** 2)}"
+        if cache.get(key) is None:
+            computed += 1
+            cache.set(key, SAMPLE, 600)
+    results.put((computed, time.perf_counter() - t0))
+
+
+def hit_rate(url, workers, requests, n_keys):
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_workload, args=(url, requests, n_keys, seed, results)) for seed in range(workers)]
+    for p in procs:
+        p.start()
+    outcomes = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    computed = sum(c for c, _ in outcomes)
+    rate = requests / (sum(t for _, t in outcomes) / workers)
+    return 1 - computed / (workers * requests), computed, rate
+
+
+def _watcher(url, ready, cleared, delays):
+    cache = _make(url)
+    cache.set("page", SAMPLE, 600)
+    ready.put(os.getpid())
+    while cache.get("page") is not None:
+        time.sleep(0.001)
+    delays.put(time.time() - cleared.get())
+
+
+def propagation(url, workers):
+    """Seconds from a clear() in one process until each other worker's L1 misses."""
+    ctx = multiprocessing.get_context("fork")
+    ready, cleared, delays = ctx.Queue(), ctx.Queue(), ctx.Queue()
+    procs = [ctx.Process(target=_watcher, args=(url, ready, cleared, delays)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    for _ in procs:
+        ready.get()
+    time.sleep(2 * cache_manager.CACHE_L1_SYNC)   # every watcher past its first sync
+    _make(url).clear()
+    now = time.time()
+    for _ in procs:
+        cleared.put(now)
+    out = sorted(delays.get(timeout=30) for _ in procs)
+    for p in procs:
+        p.join()
+    return out
+
+
+def _time(fn, n=2000):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def encodings():
+    blob = encode(SAMPLE, time.time())
+    as_json = json.dumps(SAMPLE).encode()
+    as_pickle = pickle.dumps(SAMPLE, protocol=pickle.HIGHEST_PROTOCOL)
+    return [
+        ("marshal (L2)", len(blob), _time(lambda: encode(SAMPLE, 0.0)), _time(lambda: decode(blob))),
+        ("json", len(as_json), _time(lambda: json.dumps(SAMPLE).encode()), _time(lambda: json.loads(as_json))),
+        ("pickle", len(as_pickle), _time(lambda: pickle.dumps(SAMPLE, protocol=pickle.HIGHEST_PROTOCOL)),
+         _time(lambda: pickle.loads(as_pickle))),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=5000)
+    args = parser.parse_args()
+
+    redis = FakeRedisServer().start()
+    with tempfile.TemporaryDirectory() as tmp:
+        tiers = (("L1 only", None),
+                 ("L1 + sqlite", f"sqlite:///{os.path.join(tmp, 'l2.sqlite')}"),
+                 ("L1 + redis", redis.url))
+
+        print(f"{args.workers} workers x {args.requests:,} skewed lookups over {args.keys:,} keys, "
+              f"compute + set on miss")
+        for label, url in tiers:
+            rate, computed, ops = hit_rate(url, args.workers, args.requests, args.keys)
+            print(f"  {label:<12} hit rate {rate:6.1%}  computed {computed:>6,}  {ops:>9,.0f} lookups/s per worker")
+
+        print(f"\nclear() in one process -> miss in each of {args.workers} workers "
+              f"(CACHE_L1_SYNC={cache_manager.CACHE_L1_SYNC}s)")
+        for label, url in tiers[1:]:
+            delays = propagation(url, args.workers)
+            print(f"  {label:<12} " + "  ".join(f"{d * 1000:.0f}ms" for d in delays))
+        print("  L1 only      never: the other workers keep serving their copies")
+    redis.stop()
+
+    print("\nL2 encoding of a 7-day itinerary")
+    for label, size, enc, dec in encodings():
+        print(f"  {label:<13} {size:>5} bytes  encode {enc:6.1f} us  decode {dec:6.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Characters sent to Gemini per request with and without context caching,
+using the offline fake client (no network, no API key).
+
+    python -m benchmarks.bench_context_cache
+"""
+
+import os
+
+os.environ.setdefault("GEMINI_BACKEND", "fake")
+
+import gemini  # noqa: E402
+from benchmarks._corpus import load_corpus  # noqa: E402
+from fake_gemini import FakeGeminiClient  # noqa: E402
+
+PREFIX_CHARS = 240000   # a large static prefix, the case context caching pays off for
+
+QUESTIONS = [
+    "Where can I stay near Bwindi?",
+    "What vaccinations do I need?",
+    "Tell me about Kampala nightlife",
+    "When is the best season for gorilla trekking?",
+]
+
+
+def _run(label, enabled, prefix, requests=40):
+    gemini._client = FakeGeminiClient()
+    gemini._context_cache = gemini._ContextCache()
+    gemini.CONTEXT_CACHE_ENABLED = enabled
+    model = gemini.get_gemini_model()
+    for i in range(requests):
+        q = QUESTIONS[i % len(QUESTIONS)]
+        suffix = f"LANGUAGE: Respond in en only.\n\nUser: {q}"
+        model.generate_cached(prefix, suffix, label="chat")
+    calls = gemini._client.calls
+    sent = sum(c["chars"] for c in calls)
+    creates = sum(1 for c in calls if c["op"] == "caches.create")
+    print(f"{label:<10} requests={requests}  cache creates={creates}  "
+          f"chars sent={sent:>11,}  per request={sent / requests:>9,.0f}")
+    return gemini._client
+
+
+def main():
+    content = load_corpus()
+    prefix = "You are Nambi...\n\nCOMPANY CONTENT:\n" + content[:PREFIX_CHARS]
+    print(f"Static prefix: {len(prefix):,} chars\n")
+
+    _run("full", False, prefix)
+    client = _run("cached", True, prefix)
+
+    # Content change -> new handle, old one deleted
+    model = gemini.get_gemini_model()
+    model.generate_cached(prefix + "\nNEW PAGE", "User: hi", label="chat")
+    print(f"\nAfter content change: live caches={len(client.caches)} "
+          f"creates={sum(1 for c in client.calls if c['op'] == 'caches.create')}")
+
+    # Server-side expiry -> call fails, falls back to full prompt, handle recreated next time
+    for item in list(client.caches._items.values()):
+        item.expires_at = 0
+    before = len(client.calls)
+    model.generate_cached(prefix + "\nNEW PAGE", "User: hi", label="chat")
+    model.generate_cached(prefix + "\nNEW PAGE", "User: hi", label="chat")
+    ops = [(c["op"], c["chars"]) for c in client.calls[before:]]
+    print(f"After expiry: {ops}")
+
+
+if __name__ == "__main__":
+    main()
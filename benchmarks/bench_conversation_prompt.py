@@ -0,0 +1,69 @@
+"""
+Itinerary conversation prompt size vs turn count: full history every turn
+vs rolling summary + recent messages. Summaries come from the offline fake
+Gemini client, so this runs without a network or database.
+
+    python -m benchmarks.bench_conversation_prompt
+"""
+
+import os
+
+os.environ.setdefault("GEMINI_BACKEND", "fake")
+os.environ.setdefault("GEMINI_RPM", "1000000")
+os.environ.setdefault("GEMINI_BURST", "100000")
+
+import gemini  # noqa: E402
+from fake_gemini import FakeGeminiClient  # noqa: E402
+from routes.itinerary_builder import _conversation_prompt  # noqa: E402
+from services import conversation_summary  # noqa: E402
+
+USER_TURNS = [
+    "I'm thinking about a trip to Uganda with my partner",
+    "Probably around ten days in August",
+    "We love wildlife, especially gorillas and chimps",
+    "Budget is roughly 3000 pounds each",
+    "Mid-range lodges are fine, nothing too rustic",
+    "Could we also fit in some white water rafting on the Nile?",
+    "What about a boat cruise on the Kazinga Channel?",
+    "We'd prefer a relaxed pace with no 5am starts every day",
+]
+BOT_REPLY = ("Lovely choice! Bwindi and Kibale make a great pairing for primates, and Jinja is perfect "
+             "for rafting. Anything else you'd like to include before I draft your itinerary?")
+SUMMARY = ("Couple, ~10 days in August, budget about £3000 each, mid-range lodges, relaxed pace. "
+           "Interests: gorilla trekking, chimpanzees, wildlife, rafting in Jinja, Kazinga Channel cruise. ") * 3
+
+CHECKPOINTS = [1, 5, 10, 20, 40, 80]
+
+
+def main():
+    gemini._client = FakeGeminiClient(reply=SUMMARY)
+    model = gemini.get_gemini_model()
+
+    messages = []
+    summary, summarized = None, 0
+    print(f"K={conversation_summary.SUMMARY_EVERY}  recent={conversation_summary.RECENT_MESSAGES}\n")
+    print(f"{'turn':>5} {'full history':>14} {'rolling':>10} {'summary calls':>14}")
+    calls = 0
+    for turn in range(1, CHECKPOINTS[-1] + 1):
+        user_message = USER_TURNS[turn % len(USER_TURNS)]
+        messages.append({"role": "user", "content": user_message})
+
+        # Same steps as build_itinerary: the prompt uses the summary as it stands,
+        # and a fold that is due runs after it (in the background there)
+        recent = messages[summarized:]
+        full = len(_conversation_prompt(messages, user_message).encode("utf-8"))
+        rolling = len(_conversation_prompt(recent, user_message, summary).encode("utf-8"))
+        if turn in CHECKPOINTS:
+            print(f"{turn:>5} {full:>12,} B {rolling:>8,} B {calls:>14}")
+
+        n = conversation_summary.fold_count(len(recent))
+        if n:
+            summary = conversation_summary.summarize(summary, recent[:n], model=model)
+            summarized += n
+            calls += 1
+
+        messages.append({"role": "bot", "content": BOT_REPLY})
+
+
+if __name__ == "__main__":
+    main()
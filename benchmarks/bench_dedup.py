@@ -0,0 +1,83 @@
+"""
+Corpus and prompt size before and after near-duplicate block elimination.
+With company_content.txt present the real scrape is measured; otherwise the
+synthetic corpus is re-emitted the way EXTRACT_JS walks nested elements —
+every child block, then each card/div repeating its children inline, then
+section and main containers repeating them line by line.
+
+    python -m benchmarks.bench_dedup
+"""
+
+import os
+import random
+import statistics
+
+from benchmarks._corpus import load_corpus
+from benchmarks.bench_retrieval import QUESTIONS
+from services.content_dedup import dedupe_pages
+from services.content_index import ContentIndex, split_pages, select_context, _is_heading
+from services.content_snapshot import SiteContent
+
+
+def _nested_extract(body, rng):
+    """Lines EXTRACT_JS would emit for a page whose DOM nests body's sections."""
+    sections, current = [], []
+    for line in body.splitlines():
+        if _is_heading(line) and current:
+            sections.append(current)
+            current = []
+        current.append(line)
+    if current:
+        sections.append(current)
+
+    lines = [line for section in sections for line in section]   # h2 / p
+    for section in sections:
+        if len(section) > 1 and rng.random() < 0.6:
+            lines.append(" ".join(section[:2]))                   # card div, children inline
+    for section in sections:
+        lines.extend(section)                                     # section innerText
+    lines.extend(lines[:len(lines) // 2])                         # main innerText
+    return "\n".join(lines)
+
+
+def _pages():
+    pages = [(url, body) for url, body in split_pages(load_corpus()) if url]
+    if os.path.exists("company_content.txt"):
+        return "company_content.txt", pages
+    rng = random.Random(3)
+    return "synthetic nested extract", [(url, _nested_extract(body, rng)) for url, body in pages]
+
+
+def _corpus(pages):
+    return "\n".join(f"\n--- CONTENT FROM {url} ---\n{text}" for url, text in pages)
+
+
+def _prompt_stats(text):
+    content = SiteContent.from_text(text)
+    index = ContentIndex.build(content)
+    contexts = [select_context(index, content, q) for q in QUESTIONS]
+    unique = []
+    for ctx in contexts:
+        lines = [line for line in ctx.splitlines() if line and not line.startswith("---")]
+        unique.append(len(set(lines)) / max(1, len(lines)))
+    return statistics.mean(len(c) for c in contexts), statistics.mean(unique), len(index)
+
+
+def main():
+    source, pages = _pages()
+    exact = []
+    seen = set()
+    for url, text in pages:
+        lines = [line for line in text.splitlines() if line not in seen and not seen.add(line)]
+        exact.append((url, "\n".join(lines)))
+
+    print(f"source: {source}\n")
+    print(f"{'corpus':<20} {'chars':>10} {'passages':>9} {'context chars':>14} {'unique lines':>13}")
+    for label, variant in (("raw", pages), ("exact line dedup", exact), ("containment dedup", dedupe_pages(pages))):
+        content = _corpus(variant)
+        ctx_chars, unique, passages = _prompt_stats(content)
+        print(f"{label:<20} {len(content):>10,} {passages:>9,} {ctx_chars:>14,.0f} {unique:>12.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Site extraction wall time and peak RSS: Playwright for every page vs the
+httpx + BeautifulSoup fast path (Playwright only for pages it can't read).
+Each mode runs in a child process so peak RSS covers that process and
+everything it spawns (Chromium included).
+
+Fixtures are saved HTML pages served from 127.0.0.1 — either a directory of
+*.html files (e.g. written by `benchmarks.scrape_replay record`) or generated Next.js-style
+pages: server-rendered body text plus __NEXT_DATA__, with a few client-only
+shells that force the browser fallback.
+
+    python -m benchmarks.bench_fast_extract [--fixtures DIR] [--pages 12]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks._corpus import load_corpus
+from benchmarks.bench_scrape_pool import _serve
+
+SSR_PAGE = """<!doctype html>
+<html><head><title>{title}</title></head>
+<body>
+<header><nav>Home | Destinations | Culture</nav></header>
+<main><h1>{title}</h1>{sections}</main>
+<footer>Everything Uganda</footer>
+<script id="__NEXT_DATA__" type="application/json">{next_data}</script>
+</body></html>"""
+
+SHELL_PAGE = """<!doctype html>
+<html><head><title>{title}</title></head>
+<body><div id="root">Loading...</div>
+<script>
+document.getElementById("root").innerHTML = {sections};
+</script>
+</body></html>"""
+
+
+def _generate(pages, seed=11):
+    """slug -> html. Every fourth page is a client-rendered shell."""
+    rng = random.Random(seed)
+    paragraphs = [p for p in load_corpus().split("\n") if len(p) > 80]
+    site = {}
+    for i in range(pages):
+        title = f"Uganda page {i}"
+        sections = [{"heading": f"Section {j}", "body": rng.choice(paragraphs)} for j in range(8)]
+        html_sections = "".join(f"<h2>{s['heading']}</h2><p>{s['body']}</p>" for s in sections)
+        if i % 4 == 3:
+            html = SHELL_PAGE.format(title=title, sections=json.dumps(html_sections))
+        else:
+            extra = [{"id": f"faq-{j}", "question": rng.choice(paragraphs)[:60] + "?",
+                      "answer": f"<p>{rng.choice(paragraphs)}</p>"} for j in range(4)]
+            next_data = json.dumps({"props": {"pageProps": {"title": title, "sections": sections, "faqs": extra}},
+                                    "page": f"/page-{i}", "buildId": "bench"})
+            html = SSR_PAGE.format(title=title, sections=html_sections, next_data=next_data)
+        site[f"page-{i}"] = html
+    return site
+
+
+def _load_fixtures(directory):
+    site = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".html"):
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                site[name[:-5]] = f.read()
+    return site
+
+
+def _tree_rss(pid):
+    """RSS in bytes of pid plus all its descendants (Linux /proc)."""
+    children, rss = {}, {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+        rss[int(entry)] = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+    total, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        total += rss.get(p, 0)
+        stack.extend(children.get(p, []))
+    return total
+
+
+def _run_child(argv, urls):
+    """
+    Run `python -m <argv>` with urls as JSON on stdin, sampling its process
+    tree RSS. Returns (last stdout line parsed as JSON, peak bytes).
+    """
+    proc = subprocess.Popen([sys.executable, "-m", *argv],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    peak = [0]
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            peak[0] = max(peak[0], _tree_rss(proc.pid))
+            time.sleep(0.05)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    out, _ = proc.communicate(json.dumps(urls))
+    done.set()
+    sampler.join()
+    return json.loads(out.strip().splitlines()[-1]), peak[0]
+
+
+def _child(mode):
+    import contextlib
+    from services import content_fetcher
+
+    urls = json.loads(sys.stdin.read())
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        if mode == "browser":
+            try:
+                texts = content_fetcher._run_isolated(lambda: content_fetcher._scrape_pages(urls))
+            except Exception as e:
+                print(json.dumps({"error": repr(e)}), file=sys.__stdout__)
+                return
+            sources = ["browser" if t else "failed" for t in texts]
+        else:
+            pages, _ = content_fetcher._refetch(urls, {})
+            texts = [pages[url][1] for url in urls]
+            sources = [pages[url][2] for url in urls]
+    print(json.dumps({
+        "wall": time.perf_counter() - t0,
+        "chars": sum(len(t) for t in texts if t),
+        "fast": sources.count("http"),
+        "rendered": sources.count("browser"),
+        "failed": sources.count("failed"),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", help="directory of saved *.html pages")
+    parser.add_argument("--pages", type=int, default=12, help="generated pages when --fixtures is not given")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return _child(args.child)
+
+    site = _load_fixtures(args.fixtures) if args.fixtures else _generate(args.pages)
+    server = _serve({slug: (html.encode("utf-8"), None, 0) for slug, html in site.items()})
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/{slug}" for slug in site]
+    print(f"{len(urls)} fixture pages at {base}\n")
+
+    for label, mode in (("playwright every page", "browser"), ("fast path + fallback", "hybrid")):
+        r, peak = _run_child(["benchmarks.bench_fast_extract", "--child", mode], urls)
+        if "error" in r:
+            print(f"{label:<24} failed: {r['error']}")
+            continue
+        print(f"{label:<24} wall={r['wall']:6.2f}s  peak RSS={peak / 2**20:7.1f} MiB  chars={r['chars']:>8,}  "
+              f"fast={r['fast']} rendered={r['rendered']} failed={r['failed']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
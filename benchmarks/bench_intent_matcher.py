@@ -0,0 +1,71 @@
+"""
+Greeting-language + intent detection: the old per-request keyword scans
+vs the compiled matcher in services/intent_matcher.py.
+
+    python -m benchmarks.bench_intent_matcher
+"""
+
+import timeit
+
+from services.intent_matcher import GREETING_LANGUAGES, INTENT_KEYWORDS, match
+
+QUESTIONS = [
+    "Tell me about Kampala nightlife",
+    "When is the best season for gorilla trekking in Bwindi?",
+    "Habari, ninataka kuhifadhi safari ya siku tano",
+    "Can I speak to a person about my plans?",
+    "Bonjour, quelles sont les meilleures destinations?",
+    "Please build a trip for two weeks with lots of hiking",
+    "What are the agents of change in Ugandan conservation?",
+    "Give me some talking points about the Source of the Nile",
+    "Do you have audio guides for Murchison Falls?",
+    "How much does a chimpanzee permit cost and what should I pack for the rainforest?",
+]
+
+# Cases the old substring scan got wrong
+MISFIRES = [
+    ("What are the agents of change in Ugandan conservation?", None),
+    ("Give me some talking points about the Source of the Nile", None),
+    ("Are there bookshops in Kampala?", None),
+    ("salutations from Canada", None),
+]
+
+
+def _legacy(question):
+    """The scans chat() ran per request before the compiled matcher (lists rebuilt every call)."""
+    t = question.lower().strip()
+    greeting_map = dict(GREETING_LANGUAGES)
+    language = None
+    for word, lang in greeting_map.items():
+        if word in t:
+            language = lang
+            break
+    keywords = {intent: list(words) for intent, words in INTENT_KEYWORDS.items()}
+    intent = None
+    for name in ("itinerary", "human", "booking", "voice"):
+        if any(k in t for k in keywords[name]):
+            intent = name
+            break
+    return language, intent
+
+
+def main():
+    n = 20000
+    legacy = timeit.timeit(lambda: [_legacy(q) for q in QUESTIONS], number=n // len(QUESTIONS))
+    compiled = timeit.timeit(lambda: [match(q) for q in QUESTIONS], number=n // len(QUESTIONS))
+    print(f"legacy    {legacy / n * 1e6:7.2f} µs/question")
+    print(f"compiled  {compiled / n * 1e6:7.2f} µs/question  ({legacy / compiled:.1f}x)")
+
+    print("\nSubstring misfires:")
+    for question, expected in MISFIRES:
+        print(f"  {question[:48]:<50} legacy={_legacy(question)[1]!s:<8} compiled={match(question)[1]}"
+              f"{'' if match(question)[1] == expected else '  <-- unexpected'}")
+
+    changed = [q for q in QUESTIONS if _legacy(q) != match(q)]
+    print(f"\nSample questions whose result changed: {len(changed)}")
+    for q in changed:
+        print(f"  {q[:60]:<62} {_legacy(q)} -> {match(q)}")
+
+
+if __name__ == "__main__":
+    main()
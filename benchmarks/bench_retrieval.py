@@ -0,0 +1,87 @@
+"""
+Prompt size and end-to-end latency: BM25 passage retrieval vs the old
+fixed 30k-char prefix, against a stubbed Gemini whose latency grows with
+prompt length (prefill cost).
+
+    python -m benchmarks.bench_retrieval
+"""
+
+import statistics
+import time
+
+from benchmarks._corpus import load_corpus
+from services.content_index import ContentIndex, select_context, RETRIEVAL_CHAR_BUDGET
+from services.content_snapshot import SiteContent
+
+QUESTIONS = [
+    "Where can I stay near Bwindi? Any luxury lodge?",
+    "What vaccinations do I need for Uganda?",
+    "Tell me about the shoebill and birding at Mabamba swamp",
+    "What is the currency and climate like?",
+    "Which community and conservation projects do you support?",
+    "Tell me about Kampala nightlife",
+]
+
+SYSTEM_PROMPT = """You are Nambi, Virtual Travel Assistant for Everything Uganda. You are warm, fun and quick.
+
+LANGUAGE: Respond in en only.
+
+COMPANY CONTENT:
+{content}
+"""
+
+
+class StubGemini:
+    """Fixed network overhead plus per-character prefill time."""
+
+    def __init__(self, base_s=0.05, per_kchar_s=0.004):
+        self.base_s = base_s
+        self.per_kchar_s = per_kchar_s
+
+    def generate_content(self, prompt):
+        time.sleep(self.base_s + self.per_kchar_s * len(prompt) / 1000)
+        return "ok"
+
+
+def _run(label, build_prompt, model):
+    sizes, latencies = [], []
+    for q in QUESTIONS:
+        t0 = time.perf_counter()
+        prompt = build_prompt(q)
+        model.generate_content(prompt)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        sizes.append(len(prompt))
+    print(f"{label:<12} prompt chars avg={statistics.mean(sizes):>8,.0f}  max={max(sizes):>8,}"
+          f"  ~tokens={statistics.mean(sizes) / 4:>7,.0f}  latency avg={statistics.mean(latencies):7.1f}ms")
+
+
+def main():
+    text = load_corpus()
+    content = SiteContent.from_text(text)
+    t0 = time.perf_counter()
+    index = ContentIndex.build(content)
+    build_ms = (time.perf_counter() - t0) * 1000
+    print(f"Corpus: {len(text):,} chars | {len(index)} passages | index build {build_ms:.1f}ms")
+    print(f"Retrieval budget: {RETRIEVAL_CHAR_BUDGET:,} chars\n")
+
+    model = StubGemini()
+    _run("truncate30k", lambda q: SYSTEM_PROMPT.format(content=text[:30000]) + f"\n\nUser: {q}", model)
+    _run("bm25", lambda q: SYSTEM_PROMPT.format(content=select_context(index, content, q)) + f"\n\nUser: {q}", model)
+
+    # Grounding check — does the relevant page make it into the prompt at all?
+    print()
+    for q in QUESTIONS:
+        ctx = select_context(index, content, q)
+        pages = sorted({line[17:-4] for line in ctx.splitlines() if line.startswith("--- CONTENT FROM")})
+        print(f"  {q[:48]:<48} -> {', '.join(p.rsplit('/', 1)[-1] or '/' for p in pages)}")
+
+    t0 = time.perf_counter()
+    for _ in range(200):
+        for q in QUESTIONS:
+            select_context(index, content, q)
+    per_query = (time.perf_counter() - t0) * 1000 / (200 * len(QUESTIONS))
+    print(f"\nRetrieval cost: {per_query:.3f}ms per question")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Site scrape wall time: the old sequential loop with a fixed 5s wait per page
+vs the concurrent page pool with readiness detection. Pages are generated
+locally and served from 127.0.0.1 — each renders a server-side shell, then
+fetches its body from a JSON endpoint with a random delay, like the
+Next.js site does during hydration.
+
+    python -m benchmarks.bench_scrape_pool [--pages 12] [--skip-legacy]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks._corpus import load_corpus
+from services import content_fetcher
+
+PAGE = """<!doctype html>
+<html><head><title>{title}</title></head>
+<body>
+<header><nav>Home | Destinations | Culture</nav></header>
+<main><h1>{title}</h1><div id="root">Loading...</div></main>
+<footer>Everything Uganda</footer>
+<script>
+fetch("/data/{slug}.json").then(r => r.json()).then(data => {{
+  const root = document.getElementById("root");
+  root.innerHTML = data.sections.map(s => "<h2>" + s.heading + "</h2><p>" + s.body + "</p>").join("");
+}});
+</script>
+</body></html>"""
+
+
+def _fixtures(pages, seed=7):
+    """slug -> (html, json body, server-side delay in seconds)"""
+    rng = random.Random(seed)
+    paragraphs = [p for p in load_corpus().split("\n") if len(p) > 80]
+    site = {}
+    for i in range(pages):
+        slug = f"page-{i}"
+        sections = [{"heading": f"Section {j}", "body": rng.choice(paragraphs)} for j in range(8)]
+        html = PAGE.format(title=f"Uganda page {i}", slug=slug)
+        site[slug] = (html.encode("utf-8"), json.dumps({"sections": sections}).encode("utf-8"),
+                      rng.uniform(0.2, 1.2))
+    return site
+
+
+def _serve(site):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            if parts[0] == "data" and len(parts) == 2:
+                html, body, delay = site.get(parts[1].removesuffix(".json"), (None, None, 0))
+                time.sleep(delay)
+                ctype = "application/json"
+            else:
+                body, _, _ = site.get(parts[0], (None, None, 0))
+                ctype = "text/html; charset=utf-8"
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def _legacy(urls):
+    """The pre-pool scrape loop: one page at a time, fixed 5s hydration wait."""
+    from playwright.async_api import async_playwright
+
+    chars = 0
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=content_fetcher.LAUNCH_ARGS)
+        context = await browser.new_context(user_agent=content_fetcher.USER_AGENT)
+        for url in urls:
+            page = await context.new_page()
+            await page.goto(url, timeout=90000, wait_until="load")
+            await page.wait_for_timeout(5000)
+            chars += len(await page.evaluate(content_fetcher.EXTRACT_JS) or "")
+            await page.close()
+        await browser.close()
+    return chars
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--skip-legacy", action="store_true", help="skip the ~5s-per-page baseline")
+    args = parser.parse_args()
+
+    site = _fixtures(args.pages)
+    server = _serve(site)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/{slug}" for slug in site]
+    print(f"{len(urls)} fixture pages at {base}\n")
+
+    results = []
+    if not args.skip_legacy:
+        t0 = time.perf_counter()
+        chars = asyncio.run(_legacy(urls))
+        results.append(("legacy sequential + 5s", time.perf_counter() - t0, chars))
+
+    for concurrency in (1, 4, 8):
+        t0 = time.perf_counter()
+        text = asyncio.run(content_fetcher._scrape(urls, concurrency=concurrency))
+        results.append((f"pool n={concurrency} + readiness", time.perf_counter() - t0, len(text or "")))
+
+    print()
+    for label, wall, chars in results:
+        print(f"{label:<28} wall={wall:6.1f}s  chars={chars:>8,}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
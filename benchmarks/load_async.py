@@ -0,0 +1,127 @@
+"""
+Load test for /api/chat: sync Flask (thread pool, like gunicorn workers)
+vs the async path in async_app.py, against the fake Gemini client with a
+fixed per-call latency. Both run in-process — no server, no network.
+
+    python -m benchmarks.load_async [--latency 0.5] [--threads 8]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Sized so our own admission control never throttles the test
+os.environ.setdefault("GEMINI_BACKEND", "fake")
+os.environ.setdefault("GEMINI_RPM", "1000000")
+os.environ.setdefault("GEMINI_BURST", "100000")
+os.environ.setdefault("GEMINI_MAX_WAITERS", "100000")
+os.environ.setdefault("FAQ_PREGEN", "0")  # no background batch competing with the measured requests
+
+from flask import Flask  # noqa: E402
+
+import gemini  # noqa: E402
+from async_app import create_asgi_app  # noqa: E402
+from benchmarks._corpus import load_corpus  # noqa: E402
+from fake_gemini import FakeGeminiClient  # noqa: E402
+from routes import chat as chat_routes  # noqa: E402
+
+CONCURRENCY = [1, 10, 100, 300]
+
+
+def _app():
+    app = Flask(__name__)
+    app.register_blueprint(chat_routes.chat_bp, url_prefix="/api")
+    return app
+
+
+def _question(run, i):
+    # Unique per request so the answer cache never short-circuits Gemini
+    return f"What should I see in Uganda on trip {run}-{i}?"
+
+
+def _summary(label, concurrency, latencies, statuses, wall):
+    ok = sum(1 for s in statuses if s == 200)
+    p50 = statistics.median(latencies)
+    p95 = sorted(latencies)[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{label:<6} c={concurrency:<4} ok={ok:>4}/{len(statuses):<4} "
+          f"wall={wall:6.2f}s  req/s={len(statuses) / wall:7.1f}  "
+          f"p50={p50 * 1000:7.0f}ms  p95={p95 * 1000:7.0f}ms")
+
+
+def run_sync(app, concurrency, threads, run):
+    client = app.test_client()
+
+    def one(i):
+        t0 = time.perf_counter()
+        resp = client.post("/api/chat", json={"question": _question(run, i)})
+        return time.perf_counter() - t0, resp.status_code
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(one, range(concurrency)))
+    wall = time.perf_counter() - t0
+    _summary("sync", concurrency, [r[0] for r in results], [r[1] for r in results], wall)
+
+
+async def _asgi_post(asgi, path, payload):
+    body = json.dumps(payload).encode("utf-8")
+    scope = {
+        "type": "http", "method": "POST", "path": path, "root_path": "",
+        "query_string": b"", "http_version": "1.1", "scheme": "http",
+        "server": ("localhost", 80), "client": ("127.0.0.1", 5000),
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())],
+    }
+    sent = False
+    status = []
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await asgi(scope, receive, send)
+    return status[0]
+
+
+async def run_async(asgi, concurrency, run):
+    async def one(i):
+        t0 = time.perf_counter()
+        status = await _asgi_post(asgi, "/api/chat", {"question": _question(run, i)})
+        return time.perf_counter() - t0, status
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(concurrency)))
+    wall = time.perf_counter() - t0
+    _summary("async", concurrency, [r[0] for r in results], [r[1] for r in results], wall)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.5, help="fake Gemini latency per call (s)")
+    parser.add_argument("--threads", type=int, default=8, help="sync worker threads")
+    args = parser.parse_args()
+
+    gemini._client = FakeGeminiClient(latency=args.latency)
+    chat_routes._set_site_content(load_corpus())
+    app = _app()
+    asgi = create_asgi_app(app)
+
+    print(f"Fake Gemini latency {args.latency}s | sync threads={args.threads}\n")
+    for run, concurrency in enumerate(CONCURRENCY):
+        run_sync(app, concurrency, args.threads, f"s{run}")
+        asyncio.run(run_async(asgi, concurrency, f"a{run}"))
+
+
+if __name__ == "__main__":
+    main()
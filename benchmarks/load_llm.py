@@ -0,0 +1,186 @@
+"""
+Load test for the Gemini-bound endpoints — /api/chat, /api/voice/chat and
+/api/build-itinerary — through the ASGI app, against the fake Gemini
+backend. Nothing leaves the process: latency, streaming rate, injected
+429/500s and malformed itinerary JSON all come from fake_gemini.py, and a
+fixed --seed replays the same run.
+
+    python -m benchmarks.load_llm [--requests 200] [--concurrency 50]
+                                  [--latency lognormal:0.6,0.5] [--rate-429 0.02]
+                                  [--rate-500 0.01] [--malformed 0.1] [--seed 1]
+                                  [--endpoints chat,voice,itinerary]
+
+Whisper and edge-tts are replaced by instant stand-ins for the voice
+endpoint so only the Gemini leg is measured. Itineraries use a throwaway
+SQLite database; half the requests ask to generate immediately
+(--generate-ratio), so they make both the conversation and the generation
+call.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter
+
+# Sized so our own admission control never throttles the test
+os.environ.setdefault("GEMINI_BACKEND", "fake")
+os.environ.setdefault("GEMINI_RPM", "1000000")
+os.environ.setdefault("GEMINI_BURST", "100000")
+os.environ.setdefault("GEMINI_MAX_WAITERS", "100000")
+os.environ.setdefault("FAQ_PREGEN", "0")  # no background batch competing with the measured requests
+os.environ.setdefault("CONTENT_REFRESH_INTERVAL", "0")
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "load_llm.db"))
+
+import gemini  # noqa: E402
+from app import create_app  # noqa: E402
+from async_app import create_asgi_app  # noqa: E402
+from benchmarks._corpus import load_corpus  # noqa: E402
+from extensions import db  # noqa: E402
+from fake_gemini import FakeGeminiClient  # noqa: E402
+from routes import chat as chat_routes  # noqa: E402
+from routes import voice as voice_routes  # noqa: E402
+from services.voice_service import VoiceService  # noqa: E402
+
+ENDPOINTS = ("chat", "voice", "itinerary")
+_BOUNDARY = "loadllmboundary"
+
+
+def _patch_voice():
+    """Whisper reads the question straight out of the upload; TTS returns no audio."""
+    def transcribe(audio_bytes, filename="audio.wav", language=None):
+        return {"success": True, "text": audio_bytes.decode("utf-8"), "language": "en", "segments": []}
+
+    async def no_audio(text, language="en"):
+        return None
+
+    VoiceService.transcribe_audio_bytes = staticmethod(transcribe)
+    voice_routes._generate_audio_b64_async = no_audio
+
+
+def _multipart(fields, audio):
+    parts = [f'--{_BOUNDARY}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode()
+             for k, v in fields.items()]
+    parts.append(f'--{_BOUNDARY}\r\nContent-Disposition: form-data; name="audio"; filename="q.webm"\r\n'
+                 f'Content-Type: audio/webm\r\n\r\n'.encode() + audio + b"\r\n")
+    parts.append(f"--{_BOUNDARY}--\r\n".encode())
+    return b"".join(parts)
+
+
+def _request(endpoint, i, rng, generate_ratio):
+    """(path, body, content type) for request i — unique text, so no answer cache short-circuits Gemini."""
+    if endpoint == "chat":
+        body = json.dumps({"question": f"What should I see in Uganda on trip {i}?"}).encode()
+        return "/api/chat", body, "application/json"
+    if endpoint == "voice":
+        body = _multipart({"session_id": f"voice-{i}"}, f"Which national park is best for trip {i}?".encode())
+        return "/api/voice/chat", body, f"multipart/form-data; boundary={_BOUNDARY}"
+    body = json.dumps({"session_id": f"itin-{i}", "message": "A week of wildlife, mid-range, about £1500",
+                       "generate_now": rng.random() < generate_ratio}).encode()
+    return "/api/build-itinerary", body, "application/json"
+
+
+async def _post(asgi, path, body, content_type, client_ip):
+    scope = {
+        "type": "http", "method": "POST", "path": path, "root_path": "",
+        "query_string": b"", "http_version": "1.1", "scheme": "http",
+        "server": ("localhost", 80), "client": (client_ip, 5000),
+        "headers": [(b"content-type", content_type.encode()),
+                    (b"content-length", str(len(body)).encode())],
+    }
+    sent = False
+    status, chunks = [], []
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await asgi(scope, receive, send)
+    return status[0], b"".join(chunks)
+
+
+def _outcome(endpoint, status, body):
+    """Status plus, for itineraries, what the app made of the reply."""
+    if endpoint != "itinerary" or status != 200:
+        return str(status)
+    try:
+        return f"200 {json.loads(body).get('status')}"
+    except ValueError:
+        return "200 ?"
+
+
+async def run(asgi, endpoint, requests, concurrency, seed, generate_ratio):
+    rng = random.Random(f"{seed}|{endpoint}")
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        path, body, content_type = _request(endpoint, i, rng, generate_ratio)
+        async with gate:
+            t0 = time.perf_counter()
+            # One client address per request: the per-IP rate limiter isn't what's under test
+            client_ip = f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"
+            status, payload = await _post(asgi, path, body, content_type, client_ip)
+            return time.perf_counter() - t0, _outcome(endpoint, status, payload)
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - t0
+    latencies = sorted(r[0] for r in results)
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+    outcomes = Counter(r[1] for r in results)
+    print(f"{endpoint:<10} req/s={requests / wall:7.1f}  p50={statistics.median(latencies) * 1000:6.0f}ms  "
+          f"p95={pct(0.95) * 1000:6.0f}ms  p99={pct(0.99) * 1000:6.0f}ms  "
+          + " ".join(f"{k}={v}" for k, v in sorted(outcomes.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", default="lognormal:0.6,0.5", help="fake Gemini latency distribution")
+    parser.add_argument("--tokens-per-s", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.02)
+    parser.add_argument("--rate-500", type=float, default=0.01)
+    parser.add_argument("--malformed", type=float, default=0.1, help="fraction of broken itinerary JSON")
+    parser.add_argument("--generate-ratio", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    args = parser.parse_args()
+
+    client = FakeGeminiClient(latency=args.latency, tokens_per_s=args.tokens_per_s, rate_429=args.rate_429,
+                              rate_500=args.rate_500, malformed_rate=args.malformed, seed=args.seed)
+    gemini._client = client
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    chat_routes._set_site_content(load_corpus())
+    _patch_voice()
+    asgi = create_asgi_app(app)
+
+    print(f"Fake Gemini latency={args.latency} 429={args.rate_429:.0%} 500={args.rate_500:.0%} "
+          f"malformed={args.malformed:.0%} seed={args.seed} | {args.requests} requests, "
+          f"concurrency {args.concurrency}\n")
+    for endpoint in [e for e in args.endpoints.split(",") if e]:
+        asyncio.run(run(asgi, endpoint, args.requests, args.concurrency, args.seed, args.generate_ratio))
+    print("\nGemini calls: " + " ".join(f"{k}={v}" for k, v in sorted(client.outcomes().items(), key=str)))
+    print(json.dumps(gemini.gemini_stats()["breakers"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
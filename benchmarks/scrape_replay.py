@@ -0,0 +1,175 @@
+"""
+Record / replay harness for the scrape pipeline.
+
+record  renders every SITE_URLS page once against the live site and saves
+        the rendered DOM (<slug>.html) and the raw server response
+        (<slug>.raw.html) to a fixtures directory, with a manifest.
+replay  serves those fixtures from 127.0.0.1 and times the pipeline end to
+        end with no network — pages/s, chars extracted and peak RSS of the
+        process tree (Chromium included), one child process per mode.
+
+    python -m benchmarks.scrape_replay record [--out benchmarks/fixtures/site]
+    python -m benchmarks.scrape_replay replay [--fixtures DIR] [--variant rendered|raw]
+                                              [--modes pipeline,fast,browser] [--repeat 3]
+
+The rendered variant is complete offline; the raw variant is what the live
+server sends (its client-side scripts won't load here, so it mostly
+exercises the fast path).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.bench_fast_extract import _run_child
+from services import content_fetcher
+
+DEFAULT_FIXTURES = os.path.join("benchmarks", "fixtures", "site")
+MODES = ("pipeline", "fast", "browser")
+
+
+def _slug(url):
+    path = re.sub(r"^https?://[^/]+", "", url).strip("/") or "index"
+    return re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-")
+
+
+async def _record(urls, out_dir):
+    import httpx
+    from playwright.async_api import async_playwright
+
+    manifest = []
+    async with httpx.AsyncClient(headers={"User-Agent": content_fetcher.USER_AGENT},
+                                 follow_redirects=True, timeout=30) as client, async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=content_fetcher.LAUNCH_ARGS)
+        context = await browser.new_context(user_agent=content_fetcher.USER_AGENT,
+                                            viewport={"width": 1280, "height": 800})
+        page = await context.new_page()
+        for url in urls:
+            slug = _slug(url)
+            raw = (await client.get(url)).text
+            await page.goto(url, timeout=90000, wait_until="domcontentloaded")
+            ready = await content_fetcher._wait_ready(page)
+            rendered = await page.content()
+            for name, html in ((f"{slug}.html", rendered), (f"{slug}.raw.html", raw)):
+                with open(os.path.join(out_dir, name), "w", encoding="utf-8") as f:
+                    f.write(html)
+            manifest.append({"url": url, "slug": slug, "ready": ready,
+                             "rendered_bytes": len(rendered), "raw_bytes": len(raw)})
+            print(f"  {url} -> {slug} | rendered={len(rendered):,} raw={len(raw):,} ({ready})")
+        await browser.close()
+    return manifest
+
+
+def record(out_dir, urls=None):
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = asyncio.run(_record(urls or content_fetcher.SITE_URLS, out_dir))
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"recorded_at": time.time(), "pages": manifest}, f, indent=2)
+    print(f"Recorded {len(manifest)} pages to {out_dir}")
+
+
+def serve(fixtures_dir, variant="rendered"):
+    """Serve recorded pages at /<slug>. Returns (server, urls in SITE_URLS order)."""
+    with open(os.path.join(fixtures_dir, "manifest.json"), "r", encoding="utf-8") as f:
+        pages = json.load(f)["pages"]
+    suffix = ".html" if variant == "rendered" else ".raw.html"
+    site = {}
+    for entry in pages:
+        with open(os.path.join(fixtures_dir, entry["slug"] + suffix), "rb") as f:
+            site[entry["slug"]] = f.read()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = site.get(self.path.strip("/").split("?")[0])
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    return server, [f"{base}/{entry['slug']}" for entry in pages]
+
+
+def _child(mode):
+    """One replay run in this (child) process: urls on stdin, result JSON on stdout."""
+    import contextlib
+
+    urls = json.loads(sys.stdin.read())
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            if mode == "browser":
+                texts = content_fetcher._run_isolated(lambda: content_fetcher._scrape_pages(urls))
+                content = content_fetcher._assemble([(u, t) for u, t in zip(urls, texts) if t])
+            else:
+                if mode == "fast":
+                    content_fetcher.FAST_MIN_CHARS = 0   # never fall back to the browser
+                pages, _ = content_fetcher._refetch(urls, {})
+                texts = [pages[u][1] for u in urls]
+                content = content_fetcher._assemble([(u, pages[u][1]) for u in urls if pages[u][1]])
+        except Exception as e:
+            print(json.dumps({"error": repr(e)}), file=sys.__stdout__)
+            return
+    wall = time.perf_counter() - t0
+    print(json.dumps({
+        "wall": wall,
+        "pages": sum(1 for t in texts if t),
+        "raw_chars": sum(len(t) for t in texts if t),
+        "chars": len(content),
+    }))
+
+
+def replay(fixtures_dir, variant, modes, repeat):
+    server, urls = serve(fixtures_dir, variant)
+    print(f"Replaying {len(urls)} {variant} pages from {fixtures_dir}\n")
+    print(f"{'mode':<10} {'run':>3} {'wall':>8} {'pages/s':>8} {'pages':>6} {'extracted':>10} {'corpus':>9} {'peak RSS':>10}")
+    for mode in modes:
+        for run in range(1, repeat + 1):
+            r, peak = _run_child(["benchmarks.scrape_replay", "child", mode], urls)
+            if "error" in r:
+                print(f"{mode:<10} {run:>3} failed: {r['error']}")
+                break
+            print(f"{mode:<10} {run:>3} {r['wall']:7.2f}s {r['pages'] / r['wall']:8.1f} {r['pages']:>6} "
+                  f"{r['raw_chars']:>10,} {r['chars']:>9,} {peak / 2**20:7.1f} MiB")
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="render SITE_URLS from the live site into fixtures")
+    rec.add_argument("--out", default=DEFAULT_FIXTURES)
+    rep = sub.add_parser("replay", help="time the pipeline against recorded fixtures")
+    rep.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    rep.add_argument("--variant", choices=("rendered", "raw"), default="rendered")
+    rep.add_argument("--modes", default=",".join(MODES))
+    rep.add_argument("--repeat", type=int, default=1)
+    child = sub.add_parser("child", help=argparse.SUPPRESS)
+    child.add_argument("mode")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.out)
+    elif args.command == "replay":
+        replay(args.fixtures, args.variant, [m for m in args.modes.split(",") if m], args.repeat)
+    else:
+        _child(args.mode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Offline stand-in for google-genai's Client — enable with GEMINI_BACKEND=fake.
+Implements the slice of the API gemini.py uses (models.generate_content,
+models.generate_content_stream, caches.create/get/delete) and records every
+call so prompt sizes and cache usage can be inspected without a network.
+
+For load tests it also behaves like a real backend under pressure, all
+configurable from the environment (FakeGeminiClient.from_env):
+    GEMINI_FAKE_LATENCY        "0.5", "uniform:0.2,0.8", "lognormal:0.6,0.5"
+                               (median, sigma) or "tail:0.3,4,0.05" (base,
+                               slow, probability of slow)
+    GEMINI_FAKE_TOKENS_PER_S   streaming rate after the first token (0 = one burst)
+    GEMINI_FAKE_429_RATE       fraction of calls answered 429 RESOURCE_EXHAUSTED
+    GEMINI_FAKE_500_RATE       fraction of calls failing with 500 INTERNAL
+    GEMINI_FAKE_MALFORMED_RATE fraction of itinerary JSON replies that are broken
+    GEMINI_FAKE_SEED           runs with the same seed make the same choices
+
+Replies are canned per prompt kind: itinerary conversation and generation
+prompts get well-formed (or deliberately malformed) JSON, everything else
+gets the fixed chat reply. Every random choice is drawn from a generator
+seeded by (seed, model, prompt, repeat count), so a call's outcome doesn't
+depend on what ran concurrently with it.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+DEFAULT_REPLY = "Uganda is wonderful! What would you like to explore first?"
+
+
+class FakeAPIError(Exception):
+    """Raised for injected failures; the message mimics google-genai's errors."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+def parse_latency(spec):
+    """
+    Latency spec -> sampler(rng) returning seconds. Accepts a number or
+    "fixed:S", "uniform:LO,HI", "lognormal:MEDIAN,SIGMA", "tail:BASE,SLOW,P".
+    """
+    if isinstance(spec, (int, float)):
+        return lambda rng, s=float(spec): s
+    kind, _, args = str(spec).partition(":")
+    if not args:
+        return lambda rng, s=float(kind): s
+    values = [float(v) for v in args.split(",")]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0, sigma)
+    if kind == "tail":
+        base, slow, p = values
+        return lambda rng: slow if rng.random() < p else base
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+# Prompt kinds, recognised by fixed phrases in the prompts the app sends
+_CONVERSATION_MARKER = '"status": "gathering" or "ready"'
+_GENERATION_MARKER = '"package_name"'
+_DAYS = re.compile(r'"days":\s*(\d+)')
+
+
+def _prompt_kind(prompt):
+    if _CONVERSATION_MARKER in prompt:
+        return "itinerary_conversation"
+    if _GENERATION_MARKER in prompt:
+        return "itinerary"
+    return "chat"
+
+
+def _conversation_reply():
+    return {
+        "status": "gathering",
+        "reply": "Lovely! How many days are you planning, and roughly what budget in £ per person?",
+        "extracted": {"duration": None, "budget": None, "interests": "wildlife",
+                      "accommodation": None, "pace": None},
+    }
+
+
+def _itinerary_reply(prompt):
+    match = _DAYS.search(prompt)
+    days = int(match.group(1)) if match else 7
+    return {
+        "title": f"{days} Days of Gorillas, Lakes and the Source of the Nile",
+        "days": days,
+        "budget": "£1500",
+        "places": "Entebbe, Bwindi Impenetrable Forest, Lake Bunyonyi, Queen Elizabeth NP, Jinja",
+        "accommodation": "Mid-range lodges and tented camps",
+        "transport": "Private 4x4 with driver-guide",
+        "details": "\n".join(f"Day {d}: Game drive, community visit and sunset on the lake (£{90 + d * 5})"
+                             for d in range(1, days + 1)),
+        "package_name": "Gold",
+    }
+
+
+def _malformed(payload, rng):
+    """A broken rendering of payload, in one of the ways real models get JSON wrong."""
+    text = json.dumps(payload, indent=2)
+    choice = rng.randrange(3)
+    if choice == 0:
+        return text[:len(text) // 2]                                   # truncated mid-object
+    if choice == 1:
+        return "```json\n" + text[:-1].rstrip() + ",\n}\n```"          # fenced, trailing comma
+    return "Here is your itinerary! " + payload.get("reply", payload.get("title", ""))  # prose, no JSON
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class _CachedContent:
+    def __init__(self, name, model, display_name, text, ttl_seconds):
+        self.name = name
+        self.model = model
+        self.display_name = display_name
+        self.text = text
+        self.expires_at = time.monotonic() + ttl_seconds
+
+
+def _ttl_seconds(ttl):
+    if not ttl:
+        return 3600
+    return float(str(ttl).rstrip("s"))
+
+
+def _text_of(contents):
+    """Flatten str / list-of-str / list-of-parts prompts to a single string."""
+    if contents is None:
+        return ""
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, (list, tuple)):
+        return "\n".join(_text_of(c) for c in contents)
+    text = getattr(contents, "text", None)
+    if text is not None:
+        return text
+    parts = getattr(contents, "parts", None)
+    return _text_of(parts) if parts is not None else str(contents)
+
+
+class _FakeCaches:
+    def __init__(self, client):
+        self._client = client
+        self._items = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create(self, model, config=None):
+        text = _text_of(getattr(config, "system_instruction", None)) + _text_of(getattr(config, "contents", None))
+        with self._lock:
+            name = f"cachedContents/fake-{next(self._ids)}"
+            item = _CachedContent(name, model, getattr(config, "display_name", None), text,
+                                  _ttl_seconds(getattr(config, "ttl", None)))
+            self._items[name] = item
+        self._client.calls.append({"op": "caches.create", "model": model, "chars": len(text)})
+        return item
+
+    def get(self, name):
+        with self._lock:
+            item = self._items.get(name)
+        if item is None or time.monotonic() >= item.expires_at:
+            raise RuntimeError(f"404 NOT_FOUND: CachedContent {name} not found")
+        return item
+
+    def delete(self, name):
+        with self._lock:
+            self._items.pop(name, None)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class _FakeModels:
+    def __init__(self, client):
+        self._client = client
+
+    def _respond(self, model, contents, config):
+        """Record the call and decide its outcome: (latency, error or None, reply text)."""
+        prompt = _text_of(contents)
+        cached_name = getattr(config, "cached_content", None) if config is not None else None
+        cached_chars = 0
+        cached_text = ""
+        if cached_name:
+            item = self._client.caches.get(cached_name)
+            if item.model != model:
+                raise RuntimeError(f"400 INVALID_ARGUMENT: cache {cached_name} belongs to {item.model}")
+            cached_chars = len(item.text)
+            cached_text = item.text
+        rng = self._client._rng(model, prompt)
+        latency, error, text = self._client._outcome(rng, cached_text + prompt)
+        self._client.calls.append({"op": "generate_content", "model": model,
+                                   "chars": len(prompt), "cached_chars": cached_chars,
+                                   "outcome": error.code if error else "ok"})
+        return latency, error, text
+
+    def generate_content(self, model, contents, config=None):
+        latency, error, text = self._respond(model, contents, config)
+        if latency:
+            time.sleep(latency)
+        if error:
+            raise error
+        return _Response(text)
+
+    def generate_content_stream(self, model, contents, config=None):
+        latency, error, text = self._respond(model, contents, config)
+        if latency:
+            time.sleep(latency)
+        if error:
+            raise error
+        gap = self._client._token_gap()
+        for i, token in enumerate(_tokens(text)):
+            if i and gap:
+                time.sleep(gap)
+            yield _Response(token)
+
+
+def _tokens(text):
+    """Roughly token-sized chunks: a word with its trailing whitespace."""
+    return re.findall(r"\S+\s*|\s+", text) or [text]
+
+
+class _FakeAsyncModels:
+    """client.aio.models — latency is an asyncio.sleep, so no thread is held."""
+
+    def __init__(self, client):
+        self._client = client
+
+    async def generate_content(self, model, contents, config=None):
+        latency, error, text = self._client.models._respond(model, contents, config)
+        if latency:
+            await asyncio.sleep(latency)
+        if error:
+            raise error
+        return _Response(text)
+
+
+class _FakeAsyncCaches:
+    def __init__(self, client):
+        self._caches = client.caches
+
+    async def create(self, model, config=None):
+        return self._caches.create(model, config)
+
+    async def get(self, name):
+        return self._caches.get(name)
+
+    async def delete(self, name):
+        return self._caches.delete(name)
+
+
+class _FakeAio:
+    def __init__(self, client):
+        self.models = _FakeAsyncModels(client)
+        self.caches = _FakeAsyncCaches(client)
+
+
+class FakeGeminiClient:
+    """Drop-in for genai.Client with canned replies, latency and injected errors."""
+
+    def __init__(self, reply=DEFAULT_REPLY, latency=0.0, tokens_per_s=0.0,
+                 rate_429=0.0, rate_500=0.0, malformed_rate=0.0, seed=0):
+        self.reply = reply
+        self.latency = latency
+        self.tokens_per_s = tokens_per_s
+        self.rate_429 = rate_429
+        self.rate_500 = rate_500
+        self.malformed_rate = malformed_rate
+        self.seed = seed
+        self.calls = []
+        self._seen = Counter()
+        self._seen_lock = threading.Lock()
+        self.models = _FakeModels(self)
+        self.caches = _FakeCaches(self)
+        self.aio = _FakeAio(self)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            reply=os.getenv("GEMINI_FAKE_REPLY", DEFAULT_REPLY),
+            latency=os.getenv("GEMINI_FAKE_LATENCY", "0"),
+            tokens_per_s=float(os.getenv("GEMINI_FAKE_TOKENS_PER_S", "0")),
+            rate_429=float(os.getenv("GEMINI_FAKE_429_RATE", "0")),
+            rate_500=float(os.getenv("GEMINI_FAKE_500_RATE", "0")),
+            malformed_rate=float(os.getenv("GEMINI_FAKE_MALFORMED_RATE", "0")),
+            seed=int(os.getenv("GEMINI_FAKE_SEED", "0")),
+        )
+
+    @property
+    def latency(self):
+        return self._latency_spec
+
+    @latency.setter
+    def latency(self, spec):
+        self._latency_spec = spec
+        self._sample_latency = parse_latency(spec)
+
+    def _rng(self, model, prompt):
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+        with self._seen_lock:
+            repeat = self._seen[(model, digest)]
+            self._seen[(model, digest)] = repeat + 1
+        return random.Random(f"{self.seed}|{model}|{digest}|{repeat}")
+
+    def _outcome(self, rng, prompt):
+        roll = rng.random()
+        if roll < self.rate_429:
+            # Quota errors come back fast, with the retry hint Gemini sends
+            retry = rng.randint(2, 30)
+            return min(0.05, self._sample_latency(rng)), FakeAPIError(
+                429, f"RESOURCE_EXHAUSTED. Quota exceeded. {{'retryDelay': '{retry}s'}}"), None
+        latency = self._sample_latency(rng)
+        if roll < self.rate_429 + self.rate_500:
+            return latency, FakeAPIError(500, "INTERNAL. An internal error has occurred."), None
+        kind = _prompt_kind(prompt)
+        if kind == "chat":
+            return latency, None, self.reply
+        payload = _conversation_reply() if kind == "itinerary_conversation" else _itinerary_reply(prompt)
+        if rng.random() < self.malformed_rate:
+            return latency, None, _malformed(payload, rng)
+        return latency, None, json.dumps(payload, indent=2)
+
+    def _token_gap(self):
+        return 1 / self.tokens_per_s if self.tokens_per_s > 0 else 0
+
+    def outcomes(self):
+        """Count of generate_content calls by outcome ("ok", 429, 500)."""
+        return Counter(c["outcome"] for c in self.calls if c["op"] == "generate_content")
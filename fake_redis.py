@@ -0,0 +1,143 @@
+"""
+In-process stand-in for a Redis server — the commands CacheManager's L2
+(services.cache_backends.RedisBackend) sends, over real RESP on a local
+socket, so the shared cache tier can be exercised without a Redis install:
+
+    server = FakeRedisServer().start()
+    CACHE_L2=redis://127.0.0.1:<server.port>/0
+
+or, for several gunicorn workers on one host:
+
+    python -m fake_redis --port 6399
+
+Supports PING, AUTH, SELECT, GET, MGET, SET (EX/PX), DEL, INCR, DBSIZE and
+FLUSHDB. Everything is kept in one dict behind one lock; expiry is lazy.
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server.owner
+        while True:
+            try:
+                args = self._read_command()
+            except (ConnectionError, ValueError):
+                return
+            if args is None:
+                return
+            self.wfile.write(server.execute(args))
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if line[:1] != b"*":
+            raise ValueError("inline commands are not supported")
+        args = []
+        for _ in range(int(line[1:-2])):
+            size = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _bulk(value):
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class FakeRedisServer:
+    def __init__(self, host="127.0.0.1", port=0):
+        self._data = {}      # key -> (value bytes, expires_at monotonic or None)
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.owner = self
+        self.host, self.port = self._server.server_address
+        self.commands = 0
+
+    @property
+    def url(self):
+        return f"redis://{self.host}:{self.port}/0"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="fake-redis", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _get(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and now >= entry[1]:
+            del self._data[key]
+            return None
+        return entry[0]
+
+    def execute(self, args):
+        """One RESP reply for one command."""
+        name = args[0].upper().decode()
+        now = time.monotonic()
+        with self._lock:
+            self.commands += 1
+            if name in ("PING", "AUTH", "SELECT"):
+                return b"+PONG\r\n" if name == "PING" else b"+OK\r\n"
+            if name == "GET":
+                return _bulk(self._get(args[1], now))
+            if name == "MGET":
+                return b"*%d\r\n" % (len(args) - 1) + b"".join(_bulk(self._get(k, now)) for k in args[1:])
+            if name == "SET":
+                expires_at = None
+                options = [a.upper() for a in args[3::2]]
+                for option, amount in zip(options, args[4::2]):
+                    if option == b"EX":
+                        expires_at = now + int(amount)
+                    elif option == b"PX":
+                        expires_at = now + int(amount) / 1000
+                self._data[args[1]] = (args[2], expires_at)
+                return b"+OK\r\n"
+            if name == "DEL":
+                return b":%d\r\n" % sum(self._data.pop(k, None) is not None for k in args[1:])
+            if name == "INCR":
+                value = self._get(args[1], now)
+                try:
+                    value = int(value or 0) + 1
+                except ValueError:
+                    return b"-ERR value is not an integer or out of range\r\n"
+                self._data[args[1]] = (str(value).encode(), self._data.get(args[1], (None, None))[1])
+                return b":%d\r\n" % value
+            if name == "DBSIZE":
+                return b":%d\r\n" % len(self._data)
+            if name == "FLUSHDB":
+                self._data.clear()
+                return b"+OK\r\n"
+        return b"-ERR unknown command '%s'\r\n" % name.encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    server = FakeRedisServer(args.host, args.port)
+    print(f"fake redis listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,67 @@
 import os
+import asyncio
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import deque
 from google import genai
+from google.genai import types
 from logger import get_logger
 
 log = get_logger("gemini")
 
 _client = None
 _model_name = "gemini-2.5-flash"  # confirmed working on this key
+_FALLBACK_MODELS = ["gemini-2.5-flash", "gemini-2.0-flash-lite"]
+
+# Context caching — the static prompt prefix is uploaded once and referenced by name
+CONTEXT_CACHE_ENABLED = os.getenv("GEMINI_CONTEXT_CACHE", "1") == "1"
+CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))  # seconds
+CONTEXT_CACHE_RETRY = 300  # seconds to wait after a failed create before trying again
+# Gemini refuses to cache less than ~1024 tokens; a shorter prefix is sent with the full prompt instead
+CONTEXT_CACHE_MIN_CHARS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_CHARS", "4096"))
+
+# Admission control — sized to our Gemini quota
+ADMISSION_RPM = float(os.getenv("GEMINI_RPM", "60"))
+ADMISSION_BURST = int(os.getenv("GEMINI_BURST", "10"))
+ADMISSION_MAX_WAITERS = int(os.getenv("GEMINI_MAX_WAITERS", "16"))
+ADMISSION_DEADLINE = float(os.getenv("GEMINI_ADMISSION_DEADLINE", "3"))  # seconds
+# Background calls (FAQ pre-generation) never wait and leave this many burst slots to live traffic
+ADMISSION_BACKGROUND_SPARE = int(os.getenv("GEMINI_BACKGROUND_SPARE", str(max(1, ADMISSION_BURST // 2))))
+RATE_LIMIT_BACKOFF = float(os.getenv("GEMINI_RATE_LIMIT_BACKOFF", "10"))  # seconds after a 429
+
+# Per-model circuit breakers — see _CircuitBreaker
+BREAKER_WINDOW = int(os.getenv("GEMINI_BREAKER_WINDOW", "20"))              # most recent calls considered
+BREAKER_WINDOW_S = float(os.getenv("GEMINI_BREAKER_WINDOW_S", "120"))       # ...and no older than this
+BREAKER_MIN_CALLS = int(os.getenv("GEMINI_BREAKER_MIN_CALLS", "5"))
+BREAKER_ERROR_RATE = float(os.getenv("GEMINI_BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_S = float(os.getenv("GEMINI_BREAKER_SLOW_S", "20"))            # a call slower than this counts as slow
+BREAKER_SLOW_RATE = float(os.getenv("GEMINI_BREAKER_SLOW_RATE", "0.8"))
+BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "30"))        # first open period, doubles per re-trip
+BREAKER_MAX_COOLDOWN = float(os.getenv("GEMINI_BREAKER_MAX_COOLDOWN", "300"))
+
+# Single-flight — identical concurrent prompts share one call
+SINGLE_FLIGHT_ENABLED = os.getenv("GEMINI_SINGLE_FLIGHT", "1") == "1"
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("GEMINI_SINGLE_FLIGHT_TIMEOUT", "60"))  # seconds a caller waits on a shared call
+
+# Hedged requests — see _Hedger (off by default)
+HEDGE_ENABLED = os.getenv("GEMINI_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95"))    # hedge once a call outlives this percentile
+HEDGE_BUDGET = float(os.getenv("GEMINI_HEDGE_BUDGET", "0.05"))          # max fraction of calls that get a backup
+HEDGE_MODEL = os.getenv("GEMINI_HEDGE_MODEL", "gemini-2.0-flash-lite")
+HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))    # no hedging until the percentile means something
+HEDGE_WINDOW = 200                                                     # latencies kept per call kind
 
 def _get_client():
     global _client
     if _client is None:
+        if os.environ.get("GEMINI_BACKEND") == "fake":
+            from fake_gemini import FakeGeminiClient
+            _client = FakeGeminiClient.from_env()
+            log.info("Gemini client ready — offline fake backend")
+            return _client
         api_key = os.environ.get("GEMINI_API_KEY")
         if not api_key:
             raise RuntimeError("GEMINI_API_KEY not set")
@@ -22,26 +74,884 @@ try:
 except Exception as e:
     log.warning(f"Gemini pre-warm failed: {e}")
 
-def get_gemini_model():
-    return _GeminiWrapper()
+def get_gemini_model(deadline=None, background=False):
+    """background=True: low priority — admitted only while the bucket has spare capacity, never queued."""
+    return _GeminiWrapper(deadline, background)
+
+
+class GeminiUnavailable(RuntimeError):
+    """
+    No Gemini capacity before the request's deadline — either our own token
+    bucket is empty or Gemini answered 429. Callers answer 503 + Retry-After.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class _AdmissionController:
+    """
+    Process-wide token bucket in front of every Gemini call (GCRA form).
+    Each request reserves the next free slot; if that slot is later than its
+    deadline, or too many requests are already waiting, it fails immediately
+    instead of sleeping in the worker. A low-priority request (spare > 0) is
+    only admitted when at least `spare` more slots would still be free right
+    now, so background work never takes the capacity live requests need.
+    """
+
+    def __init__(self, rate_per_minute, burst, max_waiters):
+        self.interval = 60.0 / rate_per_minute
+        self.tolerance = self.interval * (burst - 1)
+        self.max_waiters = max_waiters
+        self._tat = 0.0        # theoretical arrival time of the next request
+        self._waiters = 0
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+        self.deferred = 0
+        self.penalties = 0
+
+    def _reserve(self, deadline, spare=0):
+        """Reserve the next slot. Returns seconds to wait (caller must _release() after waiting)."""
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tat, now)
+            wait = tat - self.tolerance - now
+            if spare and wait + spare * self.interval > 0:
+                self.deferred += 1
+                raise GeminiUnavailable("Gemini capacity reserved for live requests", wait + spare * self.interval)
+            if wait > 0 and (wait > deadline or self._waiters >= self.max_waiters):
+                self.rejected += 1
+                raise GeminiUnavailable("Gemini capacity exhausted", wait)
+            self._tat = tat + self.interval
+            self.admitted += 1
+            if wait <= 0:
+                return 0.0
+            self._waiters += 1
+            return wait
+
+    def _release(self):
+        with self._lock:
+            self._waiters -= 1
+
+    def acquire(self, deadline, spare=0):
+        """Block at most `deadline` seconds for a slot, else raise GeminiUnavailable."""
+        wait = self._reserve(deadline, spare)
+        if wait:
+            try:
+                time.sleep(wait)
+            finally:
+                self._release()
+
+    async def acquire_async(self, deadline, spare=0):
+        """acquire() for the event loop — waits without holding a thread."""
+        wait = self._reserve(deadline, spare)
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._release()
+
+    def penalize(self, seconds):
+        """Gemini said 429 — hold every caller back for `seconds`."""
+        with self._lock:
+            self._tat = max(self._tat, time.monotonic() + seconds + self.tolerance)
+            self.penalties += 1
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "rate_per_minute": round(60.0 / self.interval, 2),
+                "burst": int(round(self.tolerance / self.interval)) + 1,
+                "waiting": self._waiters,
+                "max_waiters": self.max_waiters,
+                "next_free_in": round(max(0.0, self._tat - self.tolerance - now), 2),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "background_deferred": self.deferred,
+                "rate_limit_penalties": self.penalties,
+            }
+
+
+_admission = _AdmissionController(ADMISSION_RPM, ADMISSION_BURST, ADMISSION_MAX_WAITERS)
+
+_RETRY_DELAY = re.compile(r"retry(?:Delay|\s+in)\W+(\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+
+
+def _is_rate_limited(e):
+    err = str(e)
+    return '429' in err or 'RESOURCE_EXHAUSTED' in err
+
+
+def _raise_if_rate_limited(e):
+    """Translate a Gemini 429 into GeminiUnavailable and back off the whole process."""
+    if not _is_rate_limited(e):
+        return
+    err = str(e)
+    match = _RETRY_DELAY.search(err)
+    retry_after = float(match.group(1)) if match else RATE_LIMIT_BACKOFF
+    _admission.penalize(retry_after)
+    log.warning(f"Gemini 429 — backing off {retry_after:.0f}s: {err[:100]}")
+    raise GeminiUnavailable("Gemini rate limited", retry_after) from e
+
+
+class _CircuitBreaker:
+    """
+    Health memory for one model, so calls skip a failing model instead of
+    paying a failed round-trip first.
+
+    closed     calls flow; the last BREAKER_WINDOW outcomes (within
+               BREAKER_WINDOW_S) are kept. Once there are BREAKER_MIN_CALLS,
+               an error rate >= BREAKER_ERROR_RATE or a slow-call rate >=
+               BREAKER_SLOW_RATE opens the breaker.
+    open       calls are refused until the cooldown passes. The cooldown
+               doubles each time the breaker re-opens, up to BREAKER_MAX_COOLDOWN.
+    half-open  one probe call at a time; success closes the breaker and
+               resets the cooldown, failure opens it again.
+
+    429s are quota, not model health: they release a probe without counting.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, model):
+        self.model = model
+        self.state = self.CLOSED
+        self._window = deque(maxlen=BREAKER_WINDOW)   # (monotonic time, ok, latency)
+        self._cooldown = BREAKER_COOLDOWN
+        self._open_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.trips = 0
+        self.refused = 0
+
+    def allow(self):
+        """True if a call may go to this model now (claims the probe when half-open)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() < self._open_until:
+                    self.refused += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self._probing:
+                self.refused += 1
+                return False
+            self._probing = True
+            return True
+
+    def retry_in(self):
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self._open_until - time.monotonic())
+
+    def success(self, latency):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                log.info(f"Circuit closed for {self.model} — probe succeeded in {latency:.1f}s")
+                self.state = self.CLOSED
+                self._probing = False
+                self._window.clear()
+                self._cooldown = BREAKER_COOLDOWN
+            self._window.append((time.monotonic(), True, latency))
+            self._check()
+
+    def release(self):
+        """Give back a claimed probe without an outcome (call not made, 429, or abandoned stream)."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+
+    def failure(self, e):
+        if _is_rate_limited(e):
+            self.release()
+            return
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._cooldown = min(self._cooldown * 2, BREAKER_MAX_COOLDOWN)
+                self._open(f"probe failed: {str(e)[:80]}")
+                return
+            self._window.append((time.monotonic(), False, None))
+            self._check()
+
+    def _check(self):
+        if self.state != self.CLOSED:
+            return
+        cutoff = time.monotonic() - BREAKER_WINDOW_S
+        while self._window and self._window[0][0] < cutoff:
+            self._window.popleft()
+        n = len(self._window)
+        if n < BREAKER_MIN_CALLS:
+            return
+        errors = sum(1 for _, ok, _ in self._window if not ok)
+        slow = sum(1 for _, ok, latency in self._window if ok and latency > BREAKER_SLOW_S)
+        if errors / n >= BREAKER_ERROR_RATE:
+            self._open(f"error rate {errors}/{n}")
+        elif slow / n >= BREAKER_SLOW_RATE:
+            self._open(f"slow calls {slow}/{n} over {BREAKER_SLOW_S:.0f}s")
+
+    def _open(self, reason):
+        self.state = self.OPEN
+        self._probing = False
+        self._open_until = time.monotonic() + self._cooldown
+        self._window.clear()
+        self.trips += 1
+        log.warning(f"Circuit open for {self.model} for {self._cooldown:.0f}s — {reason}")
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(latency for _, ok, latency in self._window if ok)
+            return {
+                "state": self.state,
+                "calls_in_window": len(self._window),
+                "errors_in_window": sum(1 for _, ok, _ in self._window if not ok),
+                "p50_latency_s": round(latencies[len(latencies) // 2], 2) if latencies else None,
+                "open_for_s": round(max(0.0, self._open_until - time.monotonic()), 1) if self.state == self.OPEN else 0,
+                "cooldown_s": self._cooldown,
+                "trips": self.trips,
+                "refused": self.refused,
+            }
+
+
+# Primary first, then fallbacks — each model once
+_MODELS = list(dict.fromkeys([_model_name] + _FALLBACK_MODELS))
+_breakers = {model: _CircuitBreaker(model) for model in dict.fromkeys(_MODELS + [HEDGE_MODEL])}
+
+
+def _all_models_open():
+    """Every breaker is open — fail fast until the first one half-opens."""
+    retry_after = min(b.retry_in() for b in _breakers.values())
+    return GeminiUnavailable("All Gemini models are failing", retry_after or BREAKER_COOLDOWN)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _SingleFlight:
+    """
+    Coalesces identical in-flight Gemini calls. The first caller for a key
+    (the leader) makes the call; callers arriving while it runs wait for it
+    and get the same result or the same exception. Followers never touch
+    admission or the breakers — each saved call is one less request against
+    the quota. A follower that waits longer than SINGLE_FLIGHT_TIMEOUT gets
+    GeminiUnavailable (503) rather than piling a second call on a slow one.
+
+    Threads (Flask) share a _Flight; coroutines (asgi.py) share a task, so a
+    leader whose request is cancelled doesn't cancel its followers' result.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._flights = {}   # key -> _Flight
+        self._tasks = {}     # (loop id, key) -> asyncio.Task
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key, fn):
+        if not SINGLE_FLIGHT_ENABLED:
+            return fn()
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            if not flight.done.wait(self.timeout):
+                self._timed_out()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            if flight.result is None and flight.error is None:
+                flight.error = RuntimeError("Identical in-flight Gemini call was aborted")
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def do_async(self, key, make_coro):
+        if not SINGLE_FLIGHT_ENABLED:
+            return await make_coro()
+        task_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = asyncio.ensure_future(make_coro())
+                self._tasks[task_key] = task
+                task.add_done_callback(lambda t: self._task_done(task_key, t))
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.timeout)
+        except asyncio.TimeoutError:
+            self._timed_out()
+
+    def _task_done(self, task_key, task):
+        with self._lock:
+            if self._tasks.get(task_key) is task:
+                del self._tasks[task_key]
+        if not task.cancelled():
+            task.exception()  # retrieved — every waiter may have gone away
+
+    def _timed_out(self):
+        with self._lock:
+            self.timeouts += 1
+        raise GeminiUnavailable("Timed out waiting for an identical in-flight Gemini call", 5)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": SINGLE_FLIGHT_ENABLED,
+                "in_flight": len(self._flights) + len(self._tasks),
+                "leader_calls": self.leaders,
+                "calls_saved": self.coalesced,
+                "timeouts": self.timeouts,
+            }
+
+
+_single_flight = _SingleFlight(SINGLE_FLIGHT_TIMEOUT)
+
+
+def digest_prefix(prefix):
+    """Identity of a static prompt prefix. PromptBuilder computes it once per content version."""
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+
+def _cacheable(static_prefix):
+    """Whether a static prefix goes through the context cache: caching is on and the prefix is big enough."""
+    return CONTEXT_CACHE_ENABLED and len(static_prefix) >= CONTEXT_CACHE_MIN_CHARS
+
+
+def _flight_key(kind, *parts):
+    """Hash of the model plus everything that determines the response."""
+    h = hashlib.sha256(f"{kind}\0{_model_name}".encode("utf-8"))
+    for part in parts:
+        h.update(b"\0")
+        h.update(part.encode("utf-8"))
+    return h.hexdigest()
+
+
+class _Hedger:
+    """
+    Request hedging for one kind of call (chat, voice, itinerary, plain
+    prompt). Latencies of the primary call are tracked over the last
+    HEDGE_WINDOW calls; when a call outlives the HEDGE_PERCENTILE latency,
+    a backup (HEDGE_MODEL, full prompt) is fired and whichever succeeds
+    first wins. Backups are capped at HEDGE_BUDGET of calls.
+
+    Only async callers hedge (asgi.py serves chat, voice and itinerary):
+    they take whichever call finishes first and cancel the loser. Sync
+    callers just run the primary and feed its latency into the window.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self._latencies = deque(maxlen=HEDGE_WINDOW)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.backup_wins = 0
+
+    def _delay(self):
+        """Seconds to wait before hedging, or None when this call must not hedge."""
+        with self._lock:
+            self.calls += 1
+            if not HEDGE_ENABLED or len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            if self.hedged + 1 > HEDGE_BUDGET * self.calls:
+                return None
+            ordered = sorted(self._latencies)
+            return ordered[min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE / 100))]
+
+    def _claim(self):
+        with self._lock:
+            if self.hedged + 1 > HEDGE_BUDGET * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def _won(self):
+        with self._lock:
+            self.backup_wins += 1
+
+    def _timed(self, primary):
+        t0 = time.monotonic()
+        try:
+            return primary()
+        finally:
+            with self._lock:
+                self._latencies.append(time.monotonic() - t0)
+
+    async def _timed_async(self, primary):
+        t0 = time.monotonic()
+        try:
+            return await primary()
+        finally:
+            # A primary cancelled after losing still counts, at its elapsed time (a lower bound),
+            # so the slow tail isn't dropped from the percentile
+            with self._lock:
+                self._latencies.append(time.monotonic() - t0)
+
+    def run(self, primary):
+        """
+        primary() makes one call and raises on failure. A sync call is never
+        hedged: a blocking primary can't be abandoned, so a backup could only
+        spend quota without cutting the wait. Only the latency is recorded,
+        for run_async's percentile.
+        """
+        return self._timed(primary)
+
+    async def run_async(self, primary, backup):
+        delay = self._delay()
+        if delay is None:
+            return await self._timed_async(primary)
+        first = asyncio.ensure_future(self._timed_async(primary))
+        second = None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if done or not self._claim():
+                return await first
+            second = asyncio.ensure_future(backup())
+            done, _ = await asyncio.wait({first, second}, return_when=asyncio.FIRST_COMPLETED)
+            for task in ([first, second] if first in done else [second, first]):
+                try:
+                    result = await task
+                except Exception:
+                    continue
+                if task is second:
+                    self._won()
+                return result
+            return first.result()
+        finally:
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self):
+        with self._lock:
+            ordered = sorted(self._latencies)
+            pct = ordered[min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE / 100))] if ordered else None
+            return {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "backup_wins": self.backup_wins,
+                "hedge_after_s": round(pct, 2) if pct is not None and len(ordered) >= HEDGE_MIN_SAMPLES else None,
+                "samples": len(ordered),
+            }
+
+
+_hedgers = {}
+_hedgers_lock = threading.Lock()
+
+
+def _hedger(kind):
+    with _hedgers_lock:
+        hedger = _hedgers.get(kind)
+        if hedger is None:
+            hedger = _hedgers[kind] = _Hedger(kind)
+        return hedger
+
+
+def _call(client, model, contents, config=None):
+    """One generate_content call with breaker bookkeeping. The caller has claimed breaker.allow()."""
+    breaker = _breakers[model]
+    t0 = time.monotonic()
+    try:
+        response = client.models.generate_content(model=model, contents=contents, config=config)
+    except Exception as e:
+        breaker.failure(e)
+        raise
+    breaker.success(time.monotonic() - t0)
+    return response
+
+
+async def _call_async(client, model, contents, config=None):
+    breaker = _breakers[model]
+    t0 = time.monotonic()
+    try:
+        response = await client.aio.models.generate_content(model=model, contents=contents, config=config)
+    except Exception as e:
+        breaker.failure(e)
+        raise
+    except BaseException:
+        breaker.release()  # cancelled
+        raise
+    breaker.success(time.monotonic() - t0)
+    return response
+
+
+def _claim_backup():
+    # The backup is extra quota — only if a slot is free right now and its model is healthy
+    _admission.acquire(0)
+    if not _breakers[HEDGE_MODEL].allow():
+        raise RuntimeError(f"Hedge model {HEDGE_MODEL} circuit open")
+
+
+async def _backup_call_async(client, prompt):
+    _claim_backup()
+    return await _call_async(client, HEDGE_MODEL, prompt)
+
+
+def serving_models():
+    """Every model a full prompt may be sent to — the fallback chain, plus the hedge model when hedging."""
+    return list(dict.fromkeys(_MODELS + ([HEDGE_MODEL] if HEDGE_ENABLED else [])))
+
+
+def gemini_stats():
+    """Admission, context cache and circuit breaker state for the diagnostics endpoint."""
+    return {
+        "models": _MODELS,
+        "breakers": {model: b.stats() for model, b in _breakers.items()},
+        "admission": _admission.stats(),
+        "single_flight": _single_flight.stats(),
+        "hedging": {"enabled": HEDGE_ENABLED, "percentile": HEDGE_PERCENTILE, "budget": HEDGE_BUDGET,
+                    "model": HEDGE_MODEL, "kinds": {k: h.stats() for k, h in list(_hedgers.items())}},
+        "context_caches": _context_cache.stats(),
+    }
+
+
+class _ContextCache:
+    """
+    Cached-content handles for static prompt prefixes, one per (label, model).
+    A handle is recreated when its prefix changes (new site content) or its TTL
+    is about to run out. The upload runs outside the lock: one caller per key
+    creates the handle while the others go ahead with the full prompt, so
+    peek() (called on the event loop) never waits for it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handles = {}   # (label, model) -> {"hash", "name", "expires_at"}
+        self._retry_at = {}  # (label, model) -> monotonic time of next create attempt
+        self._creating = set()  # (label, model) with an upload in flight
+
+    def _live(self, key, digest, now):
+        handle = self._handles.get(key)
+        # Refresh a minute before expiry so in-flight calls never reference a dead cache
+        if handle and handle["hash"] == digest and now < handle["expires_at"] - 60:
+            return handle["name"]
+        return None
+
+    def peek(self, model, label, digest):
+        """
+        Non-blocking lookup: (name, needs_create). name is set when a live handle
+        exists for the prefix with this digest; needs_create is True when get()
+        would try to create one.
+        """
+        key = (label, model)
+        now = time.monotonic()
+        with self._lock:
+            name = self._live(key, digest, now)
+            return name, name is None and now >= self._retry_at.get(key, 0) and key not in self._creating
+
+    def get(self, client, model, label, prefix, digest):
+        """Return the cache name for this prefix (digest_prefix(prefix)), creating it if needed. None if unavailable."""
+        key = (label, model)
+        now = time.monotonic()
+        with self._lock:
+            name = self._live(key, digest, now)
+            if name:
+                return name
+            if now < self._retry_at.get(key, 0) or key in self._creating:
+                return None
+            self._creating.add(key)
+        try:
+            cache = client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"nambi-{label}",
+                    system_instruction=prefix,
+                    ttl=f"{CONTEXT_CACHE_TTL}s",
+                ),
+            )
+        except Exception as e:
+            log.warning(f"Context cache create failed for {label}/{model}: {e}")
+            with self._lock:
+                self._retry_at[key] = time.monotonic() + CONTEXT_CACHE_RETRY
+            return None
+        else:
+            with self._lock:
+                handle = self._handles.get(key)
+                self._handles[key] = {"hash": digest, "name": cache.name,
+                                      "expires_at": now + CONTEXT_CACHE_TTL}
+        finally:
+            with self._lock:
+                self._creating.discard(key)
+        log.info(f"Context cache ready | {label}/{model} | {len(prefix):,} chars | {cache.name}")
+        if handle and handle["name"] != cache.name:
+            try:
+                client.caches.delete(name=handle["name"])
+            except Exception:
+                pass  # expires on its own
+        return cache.name
+
+    def invalidate(self, label, model):
+        with self._lock:
+            self._handles.pop((label, model), None)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                f"{label}/{model}": {"name": h["name"], "expires_in": round(h["expires_at"] - now)}
+                for (label, model), h in self._handles.items()
+            }
+
+
+_context_cache = _ContextCache()
+
 
 class _GeminiWrapper:
+    def __init__(self, deadline=None, background=False):
+        # Seconds this request may wait for Gemini capacity before failing fast
+        self.deadline = 0 if background else ADMISSION_DEADLINE if deadline is None else deadline
+        self.spare = ADMISSION_BACKGROUND_SPARE if background else 0
+
+    def _kind(self, kind):
+        # A live request must not coalesce onto a background call that admission may defer
+        return kind + "/background" if self.spare else kind
+
+    def generate_cached(self, static_prefix, suffix, fallback_prompt=None, label="chat", prefix_digest=None):
+        """
+        Generate with the static prefix served from Gemini context caching, sending
+        only the per-request suffix. Falls back to a full prompt (fallback_prompt,
+        or prefix + suffix) when caching is disabled, the prefix is too short to
+        cache, or the cache is unavailable.
+        Identical concurrent calls share one request (_SingleFlight). Pass
+        prefix_digest (Prompt.prefix_digest) so the prefix isn't hashed per call.
+        """
+        digest = prefix_digest or digest_prefix(static_prefix)
+        return _single_flight.do(
+            _flight_key(self._kind("cached"), label, digest, suffix),
+            lambda: self._generate_cached(static_prefix, suffix, fallback_prompt, label, digest),
+        )
+
+    def _generate_cached(self, static_prefix, suffix, fallback_prompt, label, digest):
+        _admission.acquire(self.deadline, self.spare)
+        full_prompt = fallback_prompt or (static_prefix + suffix)
+        breaker = _breakers[_model_name]
+        if _cacheable(static_prefix) and breaker.allow():
+            client = _get_client()
+            name = _context_cache.get(client, _model_name, label, static_prefix, digest)
+            if not name:
+                breaker.release()
+            else:
+                config = types.GenerateContentConfig(cached_content=name)
+                try:
+                    response = _hedger(label).run(lambda: _call(client, _model_name, suffix, config))
+                    return _ResponseWrapper(response.text)
+                except Exception as e:
+                    _raise_if_rate_limited(e)
+                    log.warning(f"Cached-content call failed ({e}), using full prompt")
+                    _context_cache.invalidate(label, _model_name)
+        return self._generate(full_prompt, label)
+
+    def generate_cached_stream(self, static_prefix, suffix, fallback_prompt=None, label="chat", prefix_digest=None):
+        """
+        Streaming counterpart of generate_cached(). Admission happens here, before
+        the first chunk is requested, so callers can still answer 503.
+        """
+        _admission.acquire(self.deadline, self.spare)
+        return self._stream_cached(static_prefix, suffix, fallback_prompt, label,
+                                   prefix_digest or digest_prefix(static_prefix))
+
     def generate_content(self, prompt):
+        return _single_flight.do(_flight_key(self._kind("prompt"), prompt), lambda: self._admit_and_generate(prompt))
+
+    def _admit_and_generate(self, prompt):
+        _admission.acquire(self.deadline, self.spare)
+        return self._generate(prompt, "prompt")
+
+    def generate_content_stream(self, prompt):
+        """Yield text chunks as Gemini produces them.
+        Falls back to the next model only if nothing has been streamed yet."""
+        _admission.acquire(self.deadline, self.spare)
+        return self._stream(prompt)
+
+    def _stream_cached(self, static_prefix, suffix, fallback_prompt, label, digest):
+        breaker = _breakers[_model_name]
+        if _cacheable(static_prefix) and breaker.allow():
+            client = _get_client()
+            name = _context_cache.get(client, _model_name, label, static_prefix, digest)
+            if not name:
+                breaker.release()
+            else:
+                started = False
+                t0 = time.monotonic()
+                try:
+                    for chunk in client.models.generate_content_stream(
+                        model=_model_name,
+                        contents=suffix,
+                        config=types.GenerateContentConfig(cached_content=name),
+                    ):
+                        if chunk.text:
+                            if not started:
+                                breaker.success(time.monotonic() - t0)  # time to first chunk
+                            started = True
+                            yield chunk.text
+                    if not started:
+                        breaker.success(time.monotonic() - t0)
+                    return
+                except Exception as e:
+                    _raise_if_rate_limited(e)
+                    if started:
+                        raise
+                    breaker.failure(e)
+                    log.warning(f"Cached-content stream failed ({e}), using full prompt")
+                    _context_cache.invalidate(label, _model_name)
+                finally:
+                    if not started:
+                        breaker.release()
+        yield from self._stream(fallback_prompt or (static_prefix + suffix))
+
+    def _generate(self, prompt, kind):
         client = _get_client()
-        # Try primary model, fall back to gemini-2.5-flash if needed
-        for model in [_model_name, "gemini-2.5-flash", "gemini-2.0-flash-lite"]:
+        # Primary model first, then the fallbacks — skipping any whose circuit is open
+        tried = False
+        for model in _MODELS:
+            if not _breakers[model].allow():
+                continue
+            tried = True
             try:
-                response = client.models.generate_content(
+                if model == _model_name and model != HEDGE_MODEL:
+                    response = _hedger(kind).run(lambda: _call(client, model, prompt))
+                else:
+                    response = _call(client, model, prompt)
+            except Exception as e:
+                _raise_if_rate_limited(e)  # Let caller answer 503
+                log.warning(f"Model {model} failed: {e}, trying next...")
+                continue
+            return _ResponseWrapper(response.text)
+        if not tried:
+            raise _all_models_open()
+        raise RuntimeError("All Gemini models failed")
+
+    def _stream(self, prompt):
+        client = _get_client()
+        tried = False
+        for model in _MODELS:
+            breaker = _breakers[model]
+            if not breaker.allow():
+                continue
+            tried = True
+            started = False
+            t0 = time.monotonic()
+            try:
+                for chunk in client.models.generate_content_stream(
                     model=model,
                     contents=prompt,
-                )
-                return _ResponseWrapper(response.text)
+                ):
+                    if chunk.text:
+                        if not started:
+                            breaker.success(time.monotonic() - t0)  # time to first chunk
+                        started = True
+                        yield chunk.text
+                if not started:
+                    breaker.success(time.monotonic() - t0)
+                return
+            except Exception as e:
+                _raise_if_rate_limited(e)
+                if started:
+                    raise
+                breaker.failure(e)
+                log.warning(f"Model {model} stream failed: {e}, trying next...")
+                continue
+            finally:
+                if not started:
+                    breaker.release()
+        if not tried:
+            raise _all_models_open()
+        raise RuntimeError("All Gemini models failed")
+
+    # ── Async path (asgi.py) ────────────────────────────────────────────────
+    # Same behaviour as the sync methods, on google-genai's async client.
+
+    async def generate_cached_async(self, static_prefix, suffix, fallback_prompt=None, label="chat",
+                                    prefix_digest=None):
+        digest = prefix_digest or digest_prefix(static_prefix)
+        return await _single_flight.do_async(
+            _flight_key(self._kind("cached"), label, digest, suffix),
+            lambda: self._generate_cached_async(static_prefix, suffix, fallback_prompt, label, digest),
+        )
+
+    async def _generate_cached_async(self, static_prefix, suffix, fallback_prompt, label, digest):
+        await _admission.acquire_async(self.deadline, self.spare)
+        full_prompt = fallback_prompt or (static_prefix + suffix)
+        breaker = _breakers[_model_name]
+        if _cacheable(static_prefix) and breaker.allow():
+            client = _get_client()
+            name, needs_create = _context_cache.peek(_model_name, label, digest)
+            if name is None and needs_create:
+                # Creating the cache is a one-off upload — keep it off the event loop
+                name = await asyncio.to_thread(_context_cache.get, client, _model_name, label,
+                                               static_prefix, digest)
+            if not name:
+                breaker.release()
+            else:
+                config = types.GenerateContentConfig(cached_content=name)
+                try:
+                    response = await _hedger(label).run_async(
+                        lambda: _call_async(client, _model_name, suffix, config),
+                        lambda: _backup_call_async(client, full_prompt),
+                    )
+                    return _ResponseWrapper(response.text)
+                except Exception as e:
+                    _raise_if_rate_limited(e)
+                    log.warning(f"Cached-content call failed ({e}), using full prompt")
+                    _context_cache.invalidate(label, _model_name)
+        return await self._generate_async(full_prompt, label)
+
+    async def generate_content_async(self, prompt):
+        return await _single_flight.do_async(_flight_key(self._kind("prompt"), prompt),
+                                             lambda: self._admit_and_generate_async(prompt))
+
+    async def _admit_and_generate_async(self, prompt):
+        await _admission.acquire_async(self.deadline, self.spare)
+        return await self._generate_async(prompt, "prompt")
+
+    async def _generate_async(self, prompt, kind):
+        client = _get_client()
+        tried = False
+        for model in _MODELS:
+            if not _breakers[model].allow():
+                continue
+            tried = True
+            try:
+                if model == _model_name and model != HEDGE_MODEL:
+                    response = await _hedger(kind).run_async(
+                        lambda: _call_async(client, model, prompt),
+                        lambda: _backup_call_async(client, prompt),
+                    )
+                else:
+                    response = await _call_async(client, model, prompt)
             except Exception as e:
-                err = str(e)
-                if '429' in err or 'RESOURCE_EXHAUSTED' in err:
-                    raise  # Let caller handle rate limits
-                log.warning(f"Model {model} failed: {err}, trying next...")
+                _raise_if_rate_limited(e)
+                log.warning(f"Model {model} failed: {e}, trying next...")
                 continue
+            return _ResponseWrapper(response.text)
+        if not tried:
+            raise _all_models_open()
         raise RuntimeError("All Gemini models failed")
 
 class _ResponseWrapper:
@@ -8,31 +8,45 @@ rate_limit_store = defaultdict(list)
 RATE_LIMIT = 10  # requests
 RATE_WINDOW = 80  # seconds
 
+def check_rate_limit(client_ip):
+    """Record a request from client_ip. Returns a 429 response if over the limit, else None."""
+    # Get current time
+    now = datetime.utcnow()
+
+    # Clean old requests
+    rate_limit_store[client_ip] = [
+        req_time for req_time in rate_limit_store[client_ip]
+        if now - req_time < timedelta(seconds=RATE_WINDOW)
+    ]
+
+    # Check rate limit
+    if len(rate_limit_store[client_ip]) >= RATE_LIMIT:
+        return jsonify({
+            'error': f'Rate limit exceeded. Maximum {RATE_LIMIT} requests per {RATE_WINDOW} seconds.'
+        }), 429
+
+    # Add current request
+    rate_limit_store[client_ip].append(now)
+    return None
+
+
 def rate_limit(f):
     """Rate limiting decorator"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
         # Get client identifier (IP address)
-        client_ip = request.remote_addr
-        
-        # Get current time
-        now = datetime.utcnow()
-        
-        # Clean old requests
-        rate_limit_store[client_ip] = [
-            req_time for req_time in rate_limit_store[client_ip]
-            if now - req_time < timedelta(seconds=RATE_WINDOW)
-        ]
-        
-        # Check rate limit
-        if len(rate_limit_store[client_ip]) >= RATE_LIMIT:
-            return jsonify({
-                'error': f'Rate limit exceeded. Maximum {RATE_LIMIT} requests per {RATE_WINDOW} seconds.'
-            }), 429
-        
-        # Add current request
-        rate_limit_store[client_ip].append(now)
-        
+        limited = check_rate_limit(request.remote_addr)
+        if limited is not None:
+            return limited
+
         return f(*args, **kwargs)
     
     return decorated_function
+
+
+def service_unavailable(retry_after, payload):
+    """503 response telling the client when Gemini capacity frees up"""
+    response = jsonify(payload)
+    response.status_code = 503
+    response.headers['Retry-After'] = str(retry_after)
+    return response
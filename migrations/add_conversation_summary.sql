@@ -0,0 +1,14 @@
+-- Migration: Rolling conversation summary
+-- Older messages are folded into `summary`; only messages with an id above
+-- `summary_through_id` are sent to Gemini verbatim. The boundary is an id,
+-- not a count, because write-behind rows can land after later messages.
+
+ALTER TABLE conversations
+ADD COLUMN IF NOT EXISTS summary TEXT,
+ADD COLUMN IF NOT EXISTS summary_through_id INTEGER DEFAULT 0 NOT NULL;
+
+-- History is read past the boundary in id order
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages(conversation_id, id);
+
+COMMENT ON COLUMN conversations.summary IS 'Rolling summary of messages up to summary_through_id';
+COMMENT ON COLUMN conversations.summary_through_id IS 'Id of the last message folded into summary (0 = none)';
@@ -12,6 +12,8 @@ class Conversation(db.Model):
     last_activity = db.Column(db.DateTime, server_default=db.func.now())
     is_active = db.Column(db.Boolean, default=True)
     language = db.Column(db.String(10), default='en', nullable=False)  # User's preferred language
+    summary = db.Column(db.Text, nullable=True)  # Rolling summary of the oldest messages
+    summary_through_id = db.Column(db.Integer, default=0, nullable=False)  # Id of the last message folded into summary
     
     messages = db.relationship('Message', backref='conversation', lazy=True, cascade='all, delete-orphan')
     
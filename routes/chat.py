@@ -1,88 +1,281 @@
-from flask import Blueprint, request, jsonify, current_app
-from gemini import get_gemini_model
-from services.content_fetcher import fetch_full_site
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from gemini import get_gemini_model, gemini_stats, GeminiUnavailable
+from services.content_fetcher import fetch_site_incremental
 from services.session_manager import SessionManager
 from services.cache_manager import CacheManager, cached
 from services.multilingual_chat_service import MultilingualChatService
-from middleware.rate_limit import rate_limit
+from services.content_index import ContentIndex, changed_pages
+from services.content_snapshot import (SiteContent, SnapshotWatcher, SNAPSHOT_MAX_AGE, loader_lock, read_generation,
+                                       read_header, read_refresh_status, wait_for_generation, write_refresh_status,
+                                       write_snapshot)
+from services.content_scheduler import RefreshScheduler
+from services.answer_cache import answer_cache
+from services.faq_answers import faq_answers
+from services.prompt_builder import chat_prompts, get_company_context, prompt_stats, set_content_index
+from services.intent_matcher import match as match_keywords, is_simple_greeting
+from services.response_catalog import catalog, catalog_response
+from services.conversation_writer import conversation_writer
+from middleware.rate_limit import rate_limit, service_unavailable
 from extensions import db
 from models.conversation import Conversation
 from models.message import Message
 from models.feedback import Feedback
 from logger import get_logger
+import asyncio
+import os
 import threading
+import json
+import time
+from collections import namedtuple
 
 log = get_logger("chat")
 chat_bp = Blueprint("chat", __name__)
 
-# Global variable to store site content
-_site_content = None
+# Installed site content. Replaced as a whole on every swap, never mutated,
+# so a reader always sees content, index and version from the same corpus.
+# content is a SiteContent over the mapped snapshot — no str copy per worker.
+_LoadedContent = namedtuple("_LoadedContent", "content index version generation")
+_content = _LoadedContent(SiteContent(b"", None), None, None, 0)
 _content_loaded = False
-_loading_lock = threading.Lock()
+_loading_lock = threading.Lock()    # first load only
+_install_lock = threading.Lock()    # orders swaps; readers never take it
+_refresh_lock = threading.Lock()
+_refresh_thread = None
+_snapshot = SnapshotWatcher()
 
 
+def _reset_after_fork():
+    # gunicorn --preload forks while the master's _bg_load may hold the lock
+    global _loading_lock, _install_lock, _refresh_lock
+    _loading_lock = threading.Lock()
+    _install_lock = threading.Lock()
+    _refresh_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
 
-def load_site_content():
-    """Load site content in background thread — doesn't block Flask startup"""
-    global _site_content, _content_loaded
 
+def load_site_content():
+    """
+    Make site content available in this worker. Maps the shared on-disk
+    snapshot when a fresh one exists; otherwise the one process that takes
+    the loader lock scrapes and publishes a new generation while the others
+    wait for it.
+    """
     with _loading_lock:
         if _content_loaded:
-            return _site_content
+            return _content.content
+
+        snapshot = _snapshot.poll(force=True) or _snapshot.snapshot
+        if snapshot is not None and snapshot.length and snapshot.age() < SNAPSHOT_MAX_AGE:
+            _install_snapshot(snapshot)
+            return _content.content
+
+        seen = read_generation()
+        with loader_lock() as owner:
+            # A generation published while we waited for the lock is as good as our own scrape
+            if owner and read_generation() <= seen:
+                _publish_snapshot("startup")
+        if not owner:
+            log.info("Another process is loading site content — waiting for its snapshot")
+            wait_for_generation(seen)
+
+        snapshot = _snapshot.poll(force=True) or _snapshot.snapshot
+        if snapshot is not None:
+            _install_snapshot(snapshot)
+        elif not _content_loaded:
+            _set_site_content("")
+
+    return _content.content
+
+
+def refresh_site_content(trigger="manual"):
+    """
+    Re-scrape and publish a new generation. Only pages that changed since the
+    last scrape are re-rendered, and readers keep the current content until
+    the new one is swapped in. Blocks for the whole scrape — run it off the
+    request thread (start_content_refresh or the scheduler).
+
+    A manual refresh waits for the loader lock. A scheduled one skips its
+    round when another process holds the lock or refreshed within the last
+    half interval — that process's generation is picked up by the poll.
+    """
+    seen = read_generation()
+    scheduled = trigger == "schedule"
+    with loader_lock(blocking=not scheduled) as owner:
+        if owner and read_generation() <= seen and not (scheduled and _refreshed_recently()):
+            _publish_snapshot(trigger)
+    _poll_snapshot()
+    return _content
+
+
+def _refreshed_recently():
+    header = read_header()
+    return header is not None and time.time() - header[1] < refresh_scheduler.interval / 2
+
+
+def _publish_snapshot(trigger):
+    """Scrape and write the next generation, recording when and how long it took. Caller holds the loader lock."""
+    status = {"trigger": trigger, "pid": os.getpid(), "started_at": time.time(), "ok": False}
+    t0 = time.perf_counter()
+    try:
+        content = _scrape_site_content()
+        status["generation"] = write_snapshot(content)
+        status["content_length"] = len(content)
+        status["ok"] = True
+    except Exception as e:
+        status["error"] = str(e)
+        raise
+    finally:
+        status["finished_at"] = time.time()
+        status["duration_s"] = round(time.perf_counter() - t0, 2)
+        write_refresh_status(status)
+        log.info(f"Content refresh ({trigger}) finished in {status['duration_s']}s | ok={status['ok']}")
+
+
+def _poll_snapshot():
+    """Install a newer generation if another process (or this one) published it."""
+    snapshot = _snapshot.poll(force=True)
+    if snapshot is not None:
+        _install_snapshot(snapshot)
+
+
+def start_content_refresh():
+    """Start refresh_site_content in a background thread. False if one is already running."""
+    global _refresh_thread
+    with _refresh_lock:
+        if _refresh_thread is not None and _refresh_thread.is_alive():
+            return False
+        _refresh_thread = threading.Thread(target=_refresh_in_background, name="content-refresh", daemon=True)
+        _refresh_thread.start()
+    return True
+
+
+def _refresh_in_background():
+    try:
+        refresh_site_content()
+    except Exception as e:
+        log.error(f"Content refresh failed: {e}", exc_info=True)
+
+
+refresh_scheduler = RefreshScheduler(lambda: refresh_site_content(trigger="schedule"), _poll_snapshot)
+
+
+def _scrape_site_content():
+    try:
+        content, changed = fetch_site_incremental()
+        print(f"Site content loaded: {len(content):,} chars | {len(changed)} pages changed")
+    except Exception as e:
+        print(f"ERROR: Failed to fetch site content: {e}")
+        content = ""
 
+    # Fall back to the manual scrape (scrape_site.py) — read once here, never per request
+    if not content:
         try:
-            _site_content = fetch_full_site("https://www.everythinguganda.com/")
-            _content_loaded = True
-            print(f"Site content loaded: {len(_site_content):,} chars")
-        except Exception as e:
-            print(f"ERROR: Failed to fetch site content: {e}")
-            _site_content = ""
-            _content_loaded = True
+            with open("company_content.txt", "r", encoding="utf-8") as f:
+                content = f.read()
+            print(f"Using company_content.txt: {len(content):,} chars")
+        except FileNotFoundError:
+            pass
+    return content
+
 
-    return _site_content
+def _install_snapshot(snapshot):
+    with _install_lock:
+        previous = _content
+        if snapshot.generation <= previous.generation:
+            return
+        _set_site_content(snapshot.content(), snapshot.generation)
+    log.info(f"Content snapshot generation {snapshot.generation} installed")
+    if previous.version and previous.version != snapshot.version:
+        # Answers are keyed by content version already; this frees the memory, and the
+        # CacheManager clear reaches every worker through its shared L2
+        CacheManager.clear()
+        answer_cache.clear()
+
+
+def _set_site_content(content, generation=0):
+    """
+    Install content (a SiteContent, or a str from the benchmarks) plus its
+    passage index and version. Only pages that differ from the installed
+    corpus are re-indexed, and the new state becomes visible in one
+    assignment.
+    """
+    global _content, _content_loaded
+    previous = _content
+    if isinstance(content, str):
+        content = SiteContent.from_text(content)
+    version = content.version
+    if version == previous.version:
+        _content = previous._replace(generation=generation)
+        _content_loaded = True
+        return
+    if previous.index is not None:
+        changed = changed_pages(previous.content, content)
+        index = previous.index.update(content, changed)
+        log.info(f"Content index updated: {len(changed)} pages re-indexed")
+    else:
+        index = ContentIndex.build(content)
+    set_content_index(content, index)
+    _content = _LoadedContent(content, index, version, generation)
+    _content_loaded = True
+    log.info(f"Content index built: {len(index)} passages | version={version}")
 
 
 def get_site_content():
-    """Get cached site content"""
-    global _site_content, _content_loaded
+    """Get cached site content, switching to a newer snapshot generation if one was published"""
     if not _content_loaded:
         load_site_content()
-    return _site_content if _site_content else ""
+    else:
+        snapshot = _snapshot.poll()
+        if snapshot is not None:
+            _install_snapshot(snapshot)
+    refresh_scheduler.ensure_started()
+    _ensure_faq_answers()
+    return _content.content
+
+
+def get_content_version(site_content):
+    """Version hash of the content a prompt was built from — part of the answer cache key."""
+    return site_content.version
+
+
+def _ensure_faq_answers():
+    """Pre-generate (or load) the suggested-question answers for the installed content version."""
+    current = _content
+    if current.content:
+        faq_answers.ensure(current.version, _FAQ_QUESTIONS,
+                           lambda question, language: _faq_answer(current.content, question, language))
+
+
+def _faq_answer(site_content, question, language):
+    """The answer /api/chat would give, generated off the request path at low priority."""
+    prompt = _chat_prompt(question, language, site_content)
+    response = get_gemini_model(background=True).generate_cached(
+        prompt.static_prefix, prompt.suffix, fallback_prompt=prompt.full_prompt, label="chat",
+        prefix_digest=prompt.prefix_digest,
+    )
+    return response.text
 
 
 # In-memory language cache — avoids DB hit on every message
 _session_lang_cache = {}
 
 
-def _fast_detect_language(text, session_id=None):
+def _fast_detect_language(text, session_id=None, matched=None):
     """
     Pure in-memory language detection — zero DB calls, zero network calls.
+    `matched` is a precomputed intent_matcher.match(text).
     """
     if not text or not text.strip():
         return _session_lang_cache.get(session_id, 'en')
 
-    t = text.lower().strip()
-
-    # Greeting keyword map
-    greeting_map = {
-        'habari': 'sw', 'jambo': 'sw', 'mambo': 'sw', 'karibu': 'sw',
-        'bonjour': 'fr', 'salut': 'fr', 'bonsoir': 'fr',
-        'hola': 'es', 'buenos': 'es', 'gracias': 'es',
-        'hallo': 'de', 'guten': 'de', 'danke': 'de',
-        'ciao': 'it', 'buongiorno': 'it', 'grazie': 'it',
-        'olá': 'pt', 'obrigado': 'pt',
-        'привет': 'ru', 'здравствуйте': 'ru', 'спасибо': 'ru',
-        'مرحبا': 'ar', 'شكرا': 'ar', 'السلام': 'ar',
-        'नमस्ते': 'hi', 'धन्यवाद': 'hi',
-        '안녕': 'ko', '감사': 'ko',
-        'こんにちは': 'ja', 'ありがとう': 'ja',
-        '你好': 'zh-cn', '谢谢': 'zh-cn',
-    }
-    for word, lang in greeting_map.items():
-        if word in t:
-            if session_id:
-                _session_lang_cache[session_id] = lang
-            return lang
+    # Greeting keywords — compiled matcher, one pass
+    lang = (matched or match_keywords(text))[0]
+    if lang:
+        if session_id:
+            _session_lang_cache[session_id] = lang
+        return lang
 
     # Unicode script detection — instant
     for char in text:
@@ -109,6 +302,224 @@ def _fast_detect_language(text, session_id=None):
     cached = _session_lang_cache.get(session_id, 'en')
     return cached
 
+
+# ── Canned replies ───────────────────────────────────────────────────────
+# Greeting and intent replies never change at runtime — they are serialized
+# once per (intent, language) into the response catalog at import.
+
+_SUGGESTED_QUESTIONS = {
+    'en': ["What are the top tourist destinations in Uganda?", "Tell me about accommodation options", "What cultural experiences are available?"],
+    'sw': ["Ni vivutio gani vya utalii nchini Uganda?", "Niambie kuhusu malazi", "Ni uzoefu gani wa kitamaduni unapatikana?"],
+    'fr': ["Quelles sont les meilleures destinations en Ouganda?", "Parlez-moi des options d'hébergement", "Quelles expériences culturelles sont disponibles?"],
+    'de': ["Was sind die besten Reiseziele in Uganda?", "Erzähl mir von Unterkunftsmöglichkeiten", "Welche kulturellen Erlebnisse gibt es?"],
+    'es': ["¿Cuáles son los mejores destinos turísticos en Uganda?", "Háblame de las opciones de alojamiento", "¿Qué experiencias culturales están disponibles?"],
+    'pt': ["Quais são os melhores destinos turísticos em Uganda?", "Fale-me sobre opções de acomodação", "Que experiências culturais estão disponíveis?"],
+    'ar': ["ما هي أفضل الوجهات السياحية في أوغندا؟", "أخبرني عن خيارات الإقامة", "ما هي التجارب الثقافية المتاحة؟"],
+    'it': ["Quali sono le migliori destinazioni turistiche in Uganda?", "Parlami delle opzioni di alloggio", "Quali esperienze culturali sono disponibili?"],
+    'ru': ["Каковы лучшие туристические направления в Уганде?", "Расскажи мне о вариантах проживания", "Какие культурные мероприятия доступны?"],
+    'ko': ["우간다의 최고 관광지는 어디인가요?", "숙박 옵션에 대해 알려주세요", "어떤 문화 체험이 가능한가요?"],
+    'ja': ["ウガンダのトップ観光地はどこですか？", "宿泊オプションについて教えてください", "どんな文化体験ができますか？"],
+    'zh': ["乌干达最好的旅游目的地是哪里？", "告诉我住宿选择", "有哪些文化体验？"],
+    'zh-cn': ["乌干达最好的旅游目的地是哪里？", "告诉我住宿选择", "有哪些文化体验？"],
+    'hi': ["युगांडा में शीर्ष पर्यटन स्थल कौन से हैं?", "आवास विकल्पों के बारे में बताएं", "कौन से सांस्कृतिक अनुभव उपलब्ध हैं?"],
+}
+
+_BOOKING_ANSWERS = {
+    'en': "Wonderful! To book your Uganda experience, please visit https://www.everythinguganda.com/holiday-booking or contact us directly. Our team will craft the perfect trip for you.",
+    'sw': "Vizuri sana! Ili kuhifadhi uzoefu wako wa Uganda, tafadhali tembelea https://www.everythinguganda.com/holiday-booking au wasiliana nasi moja kwa moja. Timu yetu itakutengenezea safari nzuri.",
+    'fr': "Parfait! Pour réserver votre expérience en Ouganda, visitez https://www.everythinguganda.com/holiday-booking ou contactez-nous directement. Notre équipe créera le voyage parfait pour vous.",
+    'de': "Wunderbar! Um Ihr Uganda-Erlebnis zu buchen, besuchen Sie https://www.everythinguganda.com/holiday-booking oder kontaktieren Sie uns direkt. Unser Team plant die perfekte Reise für Sie.",
+    'es': "¡Maravilloso! Para reservar tu experiencia en Uganda, visita https://www.everythinguganda.com/holiday-booking o contáctanos directamente. Nuestro equipo creará el viaje perfecto para ti.",
+    'pt': "Maravilhoso! Para reservar sua experiência em Uganda, visite https://www.everythinguganda.com/holiday-booking ou entre em contato conosco diretamente.",
+    'ar': "رائع! لحجز تجربتك في أوغندا، يرجى زيارة https://www.everythinguganda.com/holiday-booking أو التواصل معنا مباشرة.",
+    'it': "Meraviglioso! Per prenotare la tua esperienza in Uganda, visita https://www.everythinguganda.com/holiday-booking o contattaci direttamente.",
+    'ru': "Замечательно! Чтобы забронировать ваш опыт в Уганде, посетите https://www.everythinguganda.com/holiday-booking или свяжитесь с нами напрямую.",
+    'ko': "훌륭합니다! 우간다 여행을 예약하려면 https://www.everythinguganda.com/holiday-booking 을 방문하거나 직접 문의하세요.",
+    'ja': "素晴らしい！ウガンダ体験を予約するには、https://www.everythinguganda.com/holiday-booking をご覧いただくか、直接お問い合わせください。",
+    'zh': "太好了！要预订您的乌干达体验，请访问 https://www.everythinguganda.com/holiday-booking 或直接联系我们。",
+    'zh-cn': "太好了！要预订您的乌干达体验，请访问 https://www.everythinguganda.com/holiday-booking 或直接联系我们。",
+    'hi': "बहुत अच्छा! अपना युगांडा अनुभव बुक करने के लिए, कृपया https://www.everythinguganda.com/holiday-booking पर जाएं या हमसे सीधे संपर्क करें।",
+}
+
+_BOOKING_QUESTIONS = {
+    'en': ["What destinations can I visit?", "Tell me about accommodation options", "What activities are available?"],
+    'sw': ["Ni maeneo gani ninaweza kutembelea?", "Niambie kuhusu malazi", "Ni shughuli gani zinapatikana?"],
+    'fr': ["Quelles destinations puis-je visiter?", "Parlez-moi des options d'hébergement", "Quelles activités sont disponibles?"],
+    'de': ["Welche Reiseziele kann ich besuchen?", "Erzähl mir von Unterkunftsmöglichkeiten", "Welche Aktivitäten gibt es?"],
+    'es': ["¿Qué destinos puedo visitar?", "Háblame de las opciones de alojamiento", "¿Qué actividades están disponibles?"],
+    'pt': ["Que destinos posso visitar?", "Fale-me sobre opções de acomodação", "Que atividades estão disponíveis?"],
+    'ar': ["ما هي الوجهات التي يمكنني زيارتها؟", "أخبرني عن خيارات الإقامة", "ما هي الأنشطة المتاحة؟"],
+    'it': ["Quali destinazioni posso visitare?", "Parlami delle opzioni di alloggio", "Quali attività sono disponibili?"],
+    'ru': ["Какие направления я могу посетить?", "Расскажи о вариантах проживания", "Какие мероприятия доступны?"],
+    'ko': ["어떤 목적지를 방문할 수 있나요?", "숙박 옵션에 대해 알려주세요", "어떤 활동이 가능한가요?"],
+    'ja': ["どんな目的地を訪れることができますか？", "宿泊オプションについて教えてください", "どんなアクティビティがありますか？"],
+    'zh': ["我可以参观哪些目的地？", "告诉我住宿选择", "有哪些活动？"],
+    'zh-cn': ["我可以参观哪些目的地？", "告诉我住宿选择", "有哪些活动？"],
+    'hi': ["मैं कौन से गंतव्य देख सकता हूं?", "आवास विकल्पों के बारे में बताएं", "कौन सी गतिविधियां उपलब्ध हैं?"],
+}
+
+_ITINERARY_ANSWERS = {
+    'en': "Let's build your perfect Uganda itinerary! Tap the map icon or the itinerary button to get started.",
+    'sw': "Tuunde ratiba yako ya Uganda! Bonyeza kitufe cha ramani au ratiba kuanza.",
+    'fr': "Construisons votre itinéraire parfait en Ouganda! Appuyez sur l'icône carte pour commencer.",
+    'de': "Lassen Sie uns Ihre perfekte Uganda-Reiseroute erstellen! Tippen Sie auf das Karten-Symbol.",
+    'es': "¡Construyamos tu itinerario perfecto en Uganda! Toca el ícono del mapa para comenzar.",
+}
+
+_HANDOVER_ANSWERS = {
+    'en': "I'll connect you with one of our travel experts right away! Tap the person icon or the button below.",
+    'sw': "Nitakuunganisha na mtaalamu wetu wa usafiri! Bonyeza kitufe cha mtu.",
+    'fr': "Je vous mets en contact avec un expert voyage! Appuyez sur l'icône personne.",
+    'de': "Ich verbinde Sie sofort mit einem Reiseexperten! Tippen Sie auf das Personen-Symbol.",
+    'es': "¡Te conecto con un experto en viajes ahora mismo! Toca el ícono de persona.",
+}
+
+_VOICE_ANSWERS = {
+    'en': "You can talk to me using the mic button! Tap it to start recording your question.",
+    'sw': "Unaweza kuniambia kwa kutumia kitufe cha maikrofoni! Bonyeza kuanza kurekodi.",
+    'fr': "Vous pouvez me parler en utilisant le bouton micro! Appuyez pour commencer.",
+    'de': "Sie können mit mir über den Mikrofon-Button sprechen! Tippen Sie zum Starten.",
+    'es': "¡Puedes hablarme usando el botón del micrófono! Tócalo para empezar.",
+}
+
+_CANNED_INTENTS = ("greeting", "itinerary", "human", "booking", "voice")
+
+
+def _lang_text(mapping, lang):
+    return mapping.get(lang, mapping['en'])
+
+
+def _canned_payload(intent, lang):
+    if intent == "greeting":
+        return {
+            "answer": MultilingualChatService.get_welcome_message(lang),
+            "suggested_questions": _lang_text(_SUGGESTED_QUESTIONS, lang),
+            "action_buttons": [],
+            "booking_buttons": [],
+            "show_booking_prompt": False,
+            "images": [],
+            "quick_replies": []
+        }
+
+    if intent == "itinerary":
+        return {
+            "answer": _lang_text(_ITINERARY_ANSWERS, lang),
+            "action": "open_itinerary",
+            "suggested_questions": [],
+            "action_buttons": [{"label": "Build My Itinerary", "action": "open_itinerary"}],
+            "booking_buttons": [],
+            "show_booking_prompt": False,
+            "images": [], "quick_replies": []
+        }
+
+    if intent == "human":
+        return {
+            "answer": _lang_text(_HANDOVER_ANSWERS, lang),
+            "action": "open_handover",
+            "suggested_questions": [],
+            "action_buttons": [{"label": "Talk to a Human", "action": "open_handover"}],
+            "booking_buttons": [],
+            "show_booking_prompt": False,
+            "images": [], "quick_replies": []
+        }
+
+    if intent == "booking":
+        return {
+            "answer": _lang_text(_BOOKING_ANSWERS, lang),
+            "action": "open_booking",
+            "suggested_questions": _lang_text(_BOOKING_QUESTIONS, lang),
+            "action_buttons": [{"label": "Book Now", "action": "open_booking"}],
+            "booking_buttons": [],
+            "show_booking_prompt": True,
+            "images": [], "quick_replies": []
+        }
+
+    if intent == "voice":
+        return {
+            "answer": _lang_text(_VOICE_ANSWERS, lang),
+            "action": "open_voice",
+            "suggested_questions": [],
+            "action_buttons": [{"label": "Start Voice Chat", "action": "open_voice"}],
+            "booking_buttons": [],
+            "show_booking_prompt": False,
+            "images": [], "quick_replies": []
+        }
+
+    raise ValueError(f"Unknown canned intent: {intent}")
+
+
+def _build_canned_catalog():
+    # Every language any reply table knows; others fall back to the English entry
+    languages = set(_SUGGESTED_QUESTIONS) | set(_BOOKING_ANSWERS) | set(_BOOKING_QUESTIONS)
+    for lang in sorted(languages):
+        for intent in _CANNED_INTENTS:
+            catalog.add(("chat", intent, lang), _canned_payload(intent, lang))
+
+
+_build_canned_catalog()
+
+# Every suggested and booking question, each in its own language — answered ahead of time (faq_answers)
+_FAQ_QUESTIONS = [(question, lang)
+                  for table in (_SUGGESTED_QUESTIONS, _BOOKING_QUESTIONS)
+                  for lang, questions in table.items()
+                  for question in questions]
+
+
+def _canned_response(question, user_language, matched=None):
+    """
+    Static replies for greetings and the itinerary / handover / booking / voice
+    intents. Returns the catalog entry, or None when Gemini should answer.
+    `matched` is a precomputed intent_matcher.match(question).
+    """
+    if is_simple_greeting(question):
+        intent = "greeting"
+    else:
+        intent = (matched or match_keywords(question))[1]
+    if intent is None:
+        return None
+    return catalog.get(("chat", intent, user_language), ("chat", intent, "en"))
+
+
+_BREATHER_MESSAGE = "Nambi is taking a short breather — please try again in a few seconds!"
+
+
+def _chat_payload(answer, **extra):
+    """Standard chat response body — every field the frontend expects."""
+    payload = {
+        "answer": answer,
+        "suggested_questions": [],
+        "action_buttons": [],
+        "booking_buttons": [],
+        "show_booking_prompt": False,
+        "images": [],
+        "quick_replies": []
+    }
+    payload.update(extra)
+    return payload
+
+
+def _load_prompt_content():
+    """Site content for prompts. None if no content could be loaded."""
+    site_content = get_site_content()
+
+    # Debug: Check if content is loaded
+    if not site_content or len(site_content) < 100:
+        print(f"WARNING: Site content is empty or too short.")
+
+    return site_content or None
+
+
+def _chat_prompt(question, user_language, site_content):
+    """Prompt parts for a chat question — company content is only the passages relevant to it."""
+    return chat_prompts.build(lambda budget: get_company_context(question, site_content, budget),
+                              language=user_language, question=question)
+
+
+def _store_conversation(app, session_id, language, question, answer):
+    """Queue a question/answer pair for the write-behind writer — never blocks the response."""
+    conversation_writer.submit(app, session_id, language, question, answer)
+
+
 @chat_bp.route("/chat", methods=["POST", "OPTIONS"])
 def chat():
     """
@@ -143,336 +554,387 @@ def chat():
     
     try:
         data = request.get_json()
-        if not data:
-            log.warning("Chat request with no body")
-            return jsonify({"error": "Invalid request body"}), 400
+        local, call = _chat_prepare(data)
+        if local is not None:
+            return local
 
-        question = data.get("question", "").strip()
-        session_id = data.get("session_id")
-
-        log.info(f"CHAT | session={session_id} | q='{question[:100]}'")
-
-        # Fast in-memory language detection — zero DB, zero network
-        user_language = _fast_detect_language(question, session_id)
-        english_question = question  # Gemini handles all languages natively
-        log.debug(f"Language: {user_language}")
-
-        # Multilingual static responses
-        _suggested_questions = {
-            'en': ["What are the top tourist destinations in Uganda?", "Tell me about accommodation options", "What cultural experiences are available?"],
-            'sw': ["Ni vivutio gani vya utalii nchini Uganda?", "Niambie kuhusu malazi", "Ni uzoefu gani wa kitamaduni unapatikana?"],
-            'fr': ["Quelles sont les meilleures destinations en Ouganda?", "Parlez-moi des options d'hébergement", "Quelles expériences culturelles sont disponibles?"],
-            'de': ["Was sind die besten Reiseziele in Uganda?", "Erzähl mir von Unterkunftsmöglichkeiten", "Welche kulturellen Erlebnisse gibt es?"],
-            'es': ["¿Cuáles son los mejores destinos turísticos en Uganda?", "Háblame de las opciones de alojamiento", "¿Qué experiencias culturales están disponibles?"],
-            'pt': ["Quais são os melhores destinos turísticos em Uganda?", "Fale-me sobre opções de acomodação", "Que experiências culturais estão disponíveis?"],
-            'ar': ["ما هي أفضل الوجهات السياحية في أوغندا؟", "أخبرني عن خيارات الإقامة", "ما هي التجارب الثقافية المتاحة؟"],
-            'it': ["Quali sono le migliori destinazioni turistiche in Uganda?", "Parlami delle opzioni di alloggio", "Quali esperienze culturali sono disponibili?"],
-            'ru': ["Каковы лучшие туристические направления в Уганде?", "Расскажи мне о вариантах проживания", "Какие культурные мероприятия доступны?"],
-            'ko': ["우간다의 최고 관광지는 어디인가요?", "숙박 옵션에 대해 알려주세요", "어떤 문화 체험이 가능한가요?"],
-            'ja': ["ウガンダのトップ観光地はどこですか？", "宿泊オプションについて教えてください", "どんな文化体験ができますか？"],
-            'zh': ["乌干达最好的旅游目的地是哪里？", "告诉我住宿选择", "有哪些文化体验？"],
-            'zh-cn': ["乌干达最好的旅游目的地是哪里？", "告诉我住宿选择", "有哪些文化体验？"],
-            'hi': ["युगांडा में शीर्ष पर्यटन स्थल कौन से हैं?", "आवास विकल्पों के बारे में बताएं", "कौन से सांस्कृतिक अनुभव उपलब्ध हैं?"],
-        }
+        # Call Gemini — never sleep in the worker; out of capacity means 503 + Retry-After
+        t0 = time.time()
+        try:
+            response = get_gemini_model().generate_cached(
+                call["static_prefix"], call["suffix"],
+                fallback_prompt=call["full_prompt"], label="chat", prefix_digest=call["prefix_digest"],
+            )
+        except GeminiUnavailable as e:
+            log.warning(f"Gemini unavailable — retry after {e.retry_after}s")
+            return service_unavailable(e.retry_after, _chat_payload(_BREATHER_MESSAGE))
 
-        _booking_answers = {
-            'en': "Wonderful! To book your Uganda experience, please visit https://www.everythinguganda.com/holiday-booking or contact us directly. Our team will craft the perfect trip for you.",
-            'sw': "Vizuri sana! Ili kuhifadhi uzoefu wako wa Uganda, tafadhali tembelea https://www.everythinguganda.com/holiday-booking au wasiliana nasi moja kwa moja. Timu yetu itakutengenezea safari nzuri.",
-            'fr': "Parfait! Pour réserver votre expérience en Ouganda, visitez https://www.everythinguganda.com/holiday-booking ou contactez-nous directement. Notre équipe créera le voyage parfait pour vous.",
-            'de': "Wunderbar! Um Ihr Uganda-Erlebnis zu buchen, besuchen Sie https://www.everythinguganda.com/holiday-booking oder kontaktieren Sie uns direkt. Unser Team plant die perfekte Reise für Sie.",
-            'es': "¡Maravilloso! Para reservar tu experiencia en Uganda, visita https://www.everythinguganda.com/holiday-booking o contáctanos directamente. Nuestro equipo creará el viaje perfecto para ti.",
-            'pt': "Maravilhoso! Para reservar sua experiência em Uganda, visite https://www.everythinguganda.com/holiday-booking ou entre em contato conosco diretamente.",
-            'ar': "رائع! لحجز تجربتك في أوغندا، يرجى زيارة https://www.everythinguganda.com/holiday-booking أو التواصل معنا مباشرة.",
-            'it': "Meraviglioso! Per prenotare la tua esperienza in Uganda, visita https://www.everythinguganda.com/holiday-booking o contattaci direttamente.",
-            'ru': "Замечательно! Чтобы забронировать ваш опыт в Уганде, посетите https://www.everythinguganda.com/holiday-booking или свяжитесь с нами напрямую.",
-            'ko': "훌륭합니다! 우간다 여행을 예약하려면 https://www.everythinguganda.com/holiday-booking 을 방문하거나 직접 문의하세요.",
-            'ja': "素晴らしい！ウガンダ体験を予約するには、https://www.everythinguganda.com/holiday-booking をご覧いただくか、直接お問い合わせください。",
-            'zh': "太好了！要预订您的乌干达体验，请访问 https://www.everythinguganda.com/holiday-booking 或直接联系我们。",
-            'zh-cn': "太好了！要预订您的乌干达体验，请访问 https://www.everythinguganda.com/holiday-booking 或直接联系我们。",
-            'hi': "बहुत अच्छा! अपना युगांडा अनुभव बुक करने के लिए, कृपया https://www.everythinguganda.com/holiday-booking पर जाएं या हमसे सीधे संपर्क करें।",
-        }
+        log.info(f"Gemini responded in {time.time() - t0:.2f}s | answer='{response.text[:80]}'")
+        return _chat_finish(call, response.text)
 
-        _booking_questions = {
-            'en': ["What destinations can I visit?", "Tell me about accommodation options", "What activities are available?"],
-            'sw': ["Ni maeneo gani ninaweza kutembelea?", "Niambie kuhusu malazi", "Ni shughuli gani zinapatikana?"],
-            'fr': ["Quelles destinations puis-je visiter?", "Parlez-moi des options d'hébergement", "Quelles activités sont disponibles?"],
-            'de': ["Welche Reiseziele kann ich besuchen?", "Erzähl mir von Unterkunftsmöglichkeiten", "Welche Aktivitäten gibt es?"],
-            'es': ["¿Qué destinos puedo visitar?", "Háblame de las opciones de alojamiento", "¿Qué actividades están disponibles?"],
-            'pt': ["Que destinos posso visitar?", "Fale-me sobre opções de acomodação", "Que atividades estão disponíveis?"],
-            'ar': ["ما هي الوجهات التي يمكنني زيارتها؟", "أخبرني عن خيارات الإقامة", "ما هي الأنشطة المتاحة؟"],
-            'it': ["Quali destinazioni posso visitare?", "Parlami delle opzioni di alloggio", "Quali attività sono disponibili?"],
-            'ru': ["Какие направления я могу посетить?", "Расскажи о вариантах проживания", "Какие мероприятия доступны?"],
-            'ko': ["어떤 목적지를 방문할 수 있나요?", "숙박 옵션에 대해 알려주세요", "어떤 활동이 가능한가요?"],
-            'ja': ["どんな目的地を訪れることができますか？", "宿泊オプションについて教えてください", "どんなアクティビティがありますか？"],
-            'zh': ["我可以参观哪些目的地？", "告诉我住宿选择", "有哪些活动？"],
-            'zh-cn': ["我可以参观哪些目的地？", "告诉我住宿选择", "有哪些活动？"],
-            'hi': ["मैं कौन से गंतव्य देख सकता हूं?", "आवास विकल्पों के बारे में बताएं", "कौन सी गतिविधियां उपलब्ध हैं?"],
-        }
+    except Exception as e:
+        return _chat_error(e)
 
-        def get_lang_response(mapping, lang):
-            return mapping.get(lang, mapping['en'])
-
-        # Handle initial greeting (check both original and translated)
-        simple_greetings = ["hi", "hello", "hey", "good morning", "good afternoon", "good evening", "greetings",
-                           "habari", "jambo", "mambo", "bonjour", "hola", "hallo", "ciao", "olá", "привет", "你好", "مرحبا"]
-
-        is_greeting = (not english_question or
-                      english_question.lower().strip() in simple_greetings or
-                      question.lower().strip() in simple_greetings)
-
-        if is_greeting:
-            welcome_message = MultilingualChatService.get_welcome_message(user_language)
-            return jsonify({
-                "answer": welcome_message,
-                "suggested_questions": get_lang_response(_suggested_questions, user_language),
-                "action_buttons": [],
-                "booking_buttons": [],
-                "show_booking_prompt": False,
-                "images": [],
-                "quick_replies": []
-            })
-
-        # ── INTENT DETECTION ─────────────────────────────────────────────────
-        q = question.lower().strip()
-
-        # Booking intent
-        booking_keywords = [
-            "book", "booking", "reserve", "reservation", "i want to book",
-            "how do i book", "book now", "yes please", "make a booking",
-            "hifadhi", "weka", "ninataka kuhifadhi", "réserver", "reservar",
-            "buchen", "prenotare", "i want to travel", "plan a trip"
-        ]
-        # Itinerary intent
-        itinerary_keywords = [
-            "itinerary", "build itinerary", "create itinerary", "plan itinerary",
-            "trip plan", "travel plan", "day by day", "schedule", "build a trip",
-            "plan my trip", "create a plan", "safari plan", "tengeneza ratiba",
-            "ratiba", "mpango wa safari"
-        ]
-        # Human handover intent
-        human_keywords = [
-            "speak to human", "talk to someone", "real person", "human agent",
-            "speak to agent", "contact staff", "call me", "whatsapp",
-            "speak to a person", "i need help", "agent", "representative",
-            "niongee na mtu", "msaada wa mtu"
-        ]
-        # Voice intent
-        voice_keywords = [
-            "voice", "speak", "talk", "audio", "listen", "microphone",
-            "record", "voice chat", "speak to nambi"
-        ]
-
-        if any(k in q for k in itinerary_keywords):
-            return jsonify({
-                "answer": get_lang_response({
-                    'en': "Let's build your perfect Uganda itinerary! Tap the map icon or the itinerary button to get started.",
-                    'sw': "Tuunde ratiba yako ya Uganda! Bonyeza kitufe cha ramani au ratiba kuanza.",
-                    'fr': "Construisons votre itinéraire parfait en Ouganda! Appuyez sur l'icône carte pour commencer.",
-                    'de': "Lassen Sie uns Ihre perfekte Uganda-Reiseroute erstellen! Tippen Sie auf das Karten-Symbol.",
-                    'es': "¡Construyamos tu itinerario perfecto en Uganda! Toca el ícono del mapa para comenzar.",
-                }, user_language),
-                "action": "open_itinerary",
-                "suggested_questions": [],
-                "action_buttons": [{"label": "Build My Itinerary", "action": "open_itinerary"}],
-                "booking_buttons": [],
-                "show_booking_prompt": False,
-                "images": [], "quick_replies": []
-            })
-
-        if any(k in q for k in human_keywords):
-            return jsonify({
-                "answer": get_lang_response({
-                    'en': "I'll connect you with one of our travel experts right away! Tap the person icon or the button below.",
-                    'sw': "Nitakuunganisha na mtaalamu wetu wa usafiri! Bonyeza kitufe cha mtu.",
-                    'fr': "Je vous mets en contact avec un expert voyage! Appuyez sur l'icône personne.",
-                    'de': "Ich verbinde Sie sofort mit einem Reiseexperten! Tippen Sie auf das Personen-Symbol.",
-                    'es': "¡Te conecto con un experto en viajes ahora mismo! Toca el ícono de persona.",
-                }, user_language),
-                "action": "open_handover",
-                "suggested_questions": [],
-                "action_buttons": [{"label": "Talk to a Human", "action": "open_handover"}],
-                "booking_buttons": [],
-                "show_booking_prompt": False,
-                "images": [], "quick_replies": []
-            })
-
-        if any(k in q for k in booking_keywords):
-            return jsonify({
-                "answer": get_lang_response(_booking_answers, user_language),
-                "action": "open_booking",
-                "suggested_questions": get_lang_response(_booking_questions, user_language),
-                "action_buttons": [{"label": "Book Now", "action": "open_booking"}],
-                "booking_buttons": [],
-                "show_booking_prompt": True,
-                "images": [], "quick_replies": []
-            })
-
-        if any(k in q for k in voice_keywords):
-            return jsonify({
-                "answer": get_lang_response({
-                    'en': "You can talk to me using the mic button! Tap it to start recording your question.",
-                    'sw': "Unaweza kuniambia kwa kutumia kitufe cha maikrofoni! Bonyeza kuanza kurekodi.",
-                    'fr': "Vous pouvez me parler en utilisant le bouton micro! Appuyez pour commencer.",
-                    'de': "Sie können mit mir über den Mikrofon-Button sprechen! Tippen Sie zum Starten.",
-                    'es': "¡Puedes hablarme usando el botón del micrófono! Tócalo para empezar.",
-                }, user_language),
-                "action": "open_voice",
-                "suggested_questions": [],
-                "action_buttons": [{"label": "Start Voice Chat", "action": "open_voice"}],
-                "booking_buttons": [],
-                "show_booking_prompt": False,
-                "images": [], "quick_replies": []
-            })
-
-        # Get Gemini model
-        model = get_gemini_model()
-
-        # Load site content (from URLs or fallback to file)
-        site_content = get_site_content()
-        
-        # Debug: Check if content is loaded
-        if not site_content or len(site_content) < 100:
-            print(f"WARNING: Site content is empty or too short.")
 
-        # If site content is empty, try loading from file
-        if not site_content:
-            try:
-                with open("company_content.txt", "r", encoding="utf-8") as f:
-                    site_content = f.read()
-            except FileNotFoundError:
-                return jsonify({"error": "Content not available. Please try again later."}), 503
+async def chat_async(app, data):
+    """
+    POST /api/chat for async_app.py — same flow as chat(), but the Gemini
+    call is awaited on the event loop instead of holding a worker thread.
+    Content loading and the write-behind enqueue can block, so they run on
+    worker threads.
+    """
+    def in_app(fn, *args):
+        def run():
+            with app.app_context():
+                return fn(*args)
+        return asyncio.to_thread(run)
 
-        # Send enough content for Gemini to find answers — 238k chars scraped, send 30k
-        site_content_trimmed = site_content[:30000] if site_content else ""
+    try:
+        local, call = await in_app(_chat_prepare, data)
+        if local is not None:
+            return local
 
-        # System prompt
-        system_prompt = f"""You are Nambi, Virtual Travel Assistant for Everything Uganda. You are warm, fun and quick.
+        t0 = time.time()
+        try:
+            response = await get_gemini_model().generate_cached_async(
+                call["static_prefix"], call["suffix"],
+                fallback_prompt=call["full_prompt"], label="chat", prefix_digest=call["prefix_digest"],
+            )
+        except GeminiUnavailable as e:
+            log.warning(f"Gemini unavailable — retry after {e.retry_after}s")
+            with app.app_context():
+                return service_unavailable(e.retry_after, _chat_payload(_BREATHER_MESSAGE))
 
-LANGUAGE: Respond in {user_language} only.
+        log.info(f"Gemini responded in {time.time() - t0:.2f}s | answer='{response.text[:80]}'")
+        return await in_app(_chat_finish, call, response.text)
 
-CRITICAL: The company content below is scraped LIVE from www.everythinguganda.com. 
-Search ALL of it thoroughly before saying you don't have information.
-NEVER say "I don't have that detail" if the topic is Uganda tourism — you always know about Uganda.
+    except Exception as e:
+        with app.app_context():
+            return _chat_error(e)
 
-RESPONSE RULES:
-- ONE short paragraph — 2-3 sentences max
-- Direct, warm, conversational
-- End with a follow-up question
-- No bullet points, no headers
 
-COMPANY CONTENT:
-{site_content_trimmed}
-"""
+def _chat_prepare(data):
+    """
+    Everything /api/chat does before calling Gemini, shared by the sync view
+    and the async path in async_app.py. Returns (response, None) when the
+    request is answered locally, else (None, call) with the prompt parts.
+    """
+    if not data:
+        log.warning("Chat request with no body")
+        return (jsonify({"error": "Invalid request body"}), 400), None
 
-        full_prompt = system_prompt + f"\n\nUser: {english_question}"
+    question = data.get("question", "").strip()
+    session_id = data.get("session_id")
 
-        # Call Gemini with silent retry on rate limit
-        import time
-        t0 = time.time()
-        log.info(f"Calling Gemini | lang={user_language} | content_len={len(site_content_trimmed)}")
-        
-        last_error = None
-        response = None
-        for wait in [0, 5, 10, 20]:  # retry up to 4 times with increasing waits
-            if wait > 0:
-                log.warning(f"Gemini rate limit — waiting {wait}s before retry...")
-                time.sleep(wait)
-            try:
-                response = model.generate_content(full_prompt)
-                break
-            except Exception as e:
-                err = str(e)
-                last_error = err
-                if '429' in err or 'RESOURCE_EXHAUSTED' in err:
-                    log.warning(f"Gemini 429 on attempt (wait={wait}s): {err[:100]}")
-                    continue
-                log.error(f"Gemini error: {err}")
-                raise
-
-        if response is None:
-            log.error(f"Gemini failed after all retries: {last_error}")
-            return jsonify({
-                "answer": "I'm having a brief connection issue — please send your message again!",
-                "suggested_questions": [],
-                "action_buttons": [], "booking_buttons": [],
-                "show_booking_prompt": False, "images": [], "quick_replies": []
-            }), 200
-
-        elapsed = time.time() - t0
-        log.info(f"Gemini responded in {elapsed:.2f}s | answer='{response.text[:80]}'")
-        translated_response = response.text
-
-        # Store conversation in background — never block the response
+    log.info(f"CHAT | session={session_id} | q='{question[:100]}'")
+
+    # Fast in-memory language detection — zero DB, zero network
+    matched = match_keywords(question)
+    user_language = _fast_detect_language(question, session_id, matched)
+    log.debug(f"Language: {user_language}")
+
+    canned = _canned_response(question, user_language, matched)
+    if canned is not None:
+        return catalog_response(canned), None
+
+    # Load site content (from URLs or fallback to file)
+    site_content = _load_prompt_content()
+    if site_content is None:
+        return (jsonify({"error": "Content not available. Please try again later."}), 503), None
+
+    # Suggested questions are pre-generated and repeat questions cached — no Gemini call
+    version = get_content_version(site_content)
+    cache_key = answer_cache.make_key(question, user_language, version)
+    cached_answer = faq_answers.get(question, user_language, version) or answer_cache.get(cache_key)
+    if cached_answer is not None:
+        log.info(f"Answer cache hit | lang={user_language}")
         if session_id:
-            _app = current_app._get_current_object()
-            _q = question
-            _r = translated_response
-            def _store():
-                try:
-                    with _app.app_context():
-                        conv = Conversation.query.filter_by(session_id=session_id).first()
-                        if not conv:
-                            conv = Conversation(session_id=session_id, language=user_language, is_active=True)
-                            db.session.add(conv)
-                            try:
-                                db.session.flush()
-                            except Exception:
-                                db.session.rollback()
-                                conv = Conversation.query.filter_by(session_id=session_id).first()
-                        db.session.add(Message(conversation_id=conv.id, role='user', content=_q))
-                        db.session.add(Message(conversation_id=conv.id, role='bot', content=_r))
-                        db.session.commit()
-                        log.debug(f"Stored conversation for session={session_id}")
-                except Exception as e:
-                    log.error(f"Background store failed: {e}")
-                    try:
-                        db.session.rollback()
-                    except Exception:
-                        pass
-            threading.Thread(target=_store, daemon=True).start()
-
-        # Return response with all required fields
-        return jsonify({
-            "answer": translated_response,
-            "suggested_questions": [],
-            "action_buttons": [],
-            "booking_buttons": [],
-            "show_booking_prompt": False,
-            "images": [],
-            "quick_replies": []
-        })
+            _store_conversation(current_app._get_current_object(), session_id,
+                                user_language, question, cached_answer)
+        return jsonify(_chat_payload(cached_answer)), None
+
+    # Gemini handles all languages natively — the question goes in as asked
+    prompt = _chat_prompt(question, user_language, site_content)
+    log.info(f"Calling Gemini | lang={user_language} | prompt_tokens~{prompt.tokens}")
+
+    return None, {
+        "question": question,
+        "session_id": session_id,
+        "language": user_language,
+        "cache_key": cache_key,
+        "static_prefix": prompt.static_prefix,
+        "prefix_digest": prompt.prefix_digest,
+        "suffix": prompt.suffix,
+        "full_prompt": prompt.full_prompt,
+    }
 
-    except ValueError as e:
+
+def _chat_finish(call, answer):
+    """Cache and persist a Gemini answer, then build the /api/chat response."""
+    if answer:
+        answer_cache.set(call["cache_key"], answer)
+
+    # Store conversation in background — never block the response
+    if call["session_id"]:
+        _store_conversation(current_app._get_current_object(), call["session_id"],
+                            call["language"], call["question"], answer)
+
+    return jsonify(_chat_payload(answer))
+
+
+def _chat_error(e):
+    if isinstance(e, ValueError):
         return jsonify({"error": "Invalid input data"}), 400
-    except ConnectionError as e:
+    if isinstance(e, ConnectionError):
         return jsonify({"error": "Failed to connect to AI service"}), 503
-    except Exception as e:
-        err = str(e)
-        log.error(f"Chat endpoint error: {err}", exc_info=True)
-        if '429' in err or 'RESOURCE_EXHAUSTED' in err:
-            return jsonify({
-                "answer": "Nambi is taking a short breather — please try again in a few seconds!",
-                "suggested_questions": [],
-                "action_buttons": [], "booking_buttons": [],
-                "show_booking_prompt": False, "images": [], "quick_replies": []
-            }), 200
-        return jsonify({"error": "An unexpected error occurred. Please try again later."}), 500
+    err = str(e)
+    log.error(f"Chat endpoint error: {err}", exc_info=True)
+    if '429' in err or 'RESOURCE_EXHAUSTED' in err:
+        return jsonify(_chat_payload(_BREATHER_MESSAGE)), 200
+    return jsonify({"error": "An unexpected error occurred. Please try again later."}), 500
+
+
+def _sse(event, data):
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@chat_bp.route("/chat/stream", methods=["POST", "OPTIONS"])
+def chat_stream():
+    """
+    Chat with Nambi — answer streamed as Server-Sent Events
+    ---
+    tags:
+      - Chatbot
+    consumes:
+      - application/json
+    produces:
+      - text/event-stream
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          properties:
+            question:
+              type: string
+              example: "Tell me about Kampala"
+            session_id:
+              type: string
+              example: "abc123"
+    responses:
+      200:
+        description: >
+          Stream of `token` events ({"text": ...}) followed by one `done` event
+          carrying the same fields as /api/chat. An `error` event precedes
+          `done` if generation fails part-way.
+    """
+    if request.method == "OPTIONS":
+        return jsonify({"status": "ok"}), 200
+
+    data = request.get_json(silent=True)
+    if not data:
+        log.warning("Chat stream request with no body")
+        return jsonify({"error": "Invalid request body"}), 400
+
+    question = data.get("question", "").strip()
+    session_id = data.get("session_id")
+    log.info(f"CHAT STREAM | session={session_id} | q='{question[:100]}'")
+
+    matched = match_keywords(question)
+    user_language = _fast_detect_language(question, session_id, matched)
+    entry = _canned_response(question, user_language, matched)
+    canned = entry.payload if entry is not None else None
+
+    prompt = None
+    cache_key = None
+    if canned is None:
+        site_content = _load_prompt_content()
+        if site_content is None:
+            return jsonify({"error": "Content not available. Please try again later."}), 503
+        version = get_content_version(site_content)
+        cache_key = answer_cache.make_key(question, user_language, version)
+        cached_answer = faq_answers.get(question, user_language, version) or answer_cache.get(cache_key)
+        if cached_answer is not None:
+            log.info(f"Answer cache hit (stream) | lang={user_language}")
+            canned = _chat_payload(cached_answer)
+            if session_id:
+                _store_conversation(current_app._get_current_object(), session_id,
+                                    user_language, question, cached_answer)
+        else:
+            prompt = _chat_prompt(question, user_language, site_content)
+            log.info(f"Streaming Gemini | lang={user_language} | prompt_tokens~{prompt.tokens}")
+
+    stream = None
+    if canned is None:
+        try:
+            stream = get_gemini_model().generate_cached_stream(
+                prompt.static_prefix,
+                prompt.suffix,
+                fallback_prompt=prompt.full_prompt,
+                label="chat",
+                prefix_digest=prompt.prefix_digest,
+            )
+        except GeminiUnavailable as e:
+            log.warning(f"Gemini unavailable (stream) — retry after {e.retry_after}s")
+            return service_unavailable(e.retry_after, _chat_payload(_BREATHER_MESSAGE))
+
+    app = current_app._get_current_object()
+
+    def generate():
+        # Flush headers straight away — time-to-first-byte shouldn't wait on Gemini
+        yield ": stream open\n\n"
+
+        if canned is not None:
+            yield _sse("token", {"text": canned["answer"]})
+            yield _sse("done", canned)
+            return
+
+        t0 = time.time()
+        first_token_at = None
+        parts = []
+        try:
+            for text in stream:
+                if first_token_at is None:
+                    first_token_at = time.time() - t0
+                parts.append(text)
+                yield _sse("token", {"text": text})
+        except Exception as e:
+            err = str(e)
+            log.error(f"Chat stream error: {err}", exc_info=True)
+            if not parts:
+                if isinstance(e, GeminiUnavailable):
+                    fallback = _BREATHER_MESSAGE
+                else:
+                    fallback = "I'm having a brief connection issue — please send your message again!"
+                yield _sse("error", {"error": "generation_failed"})
+                yield _sse("done", _chat_payload(fallback))
+                return
+            # Keep the partial answer but don't cache it
+            yield _sse("error", {"error": "generation_interrupted"})
+            cache_ok = False
+        else:
+            cache_ok = True
+
+        answer = "".join(parts)
+        if cache_ok and answer:
+            answer_cache.set(cache_key, answer)
+        log.info(f"Gemini stream finished in {time.time() - t0:.2f}s | "
+                 f"first token {first_token_at or 0:.2f}s | chars={len(answer)}")
+
+        # Persist only once the full answer exists
+        if session_id and answer:
+            _store_conversation(app, session_id, user_language, question, answer)
+
+        yield _sse("done", _chat_payload(answer))
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @chat_bp.route("/debug/content", methods=["GET"])
 def debug_content():
     """Debug endpoint to check if content is loaded"""
     site_content = get_site_content()
-    
+    text = site_content.text().lower()
+
     return jsonify({
         "content_loaded": _content_loaded,
-        "content_length": len(site_content) if site_content else 0,
-        "has_accommodation": "accommodation" in site_content.lower() if site_content else False,
-        "has_where_to_stay": "where to stay" in site_content.lower() if site_content else False,
-        "content_preview": site_content[:500] if site_content else "No content",
+        "content_length": len(site_content),
+        "has_accommodation": "accommodation" in text,
+        "has_where_to_stay": "where to stay" in text,
+        "content_preview": site_content.head(500) if site_content else "No content",
     })
 
 
+@chat_bp.route("/chat/cache/stats", methods=["GET"])
+def answer_cache_stats():
+    """
+    Answer cache statistics — hits are Gemini calls saved
+    ---
+    tags:
+      - Chatbot
+    responses:
+      200:
+        description: Answer cache counters
+    """
+    return jsonify(answer_cache.stats()), 200
+
+
+@chat_bp.route("/cache/stats", methods=["GET"])
+def cache_manager_stats():
+    """
+    CacheManager — this worker's L1 hits, misses, evictions and size, and its shared L2 traffic
+    ---
+    tags:
+      - Chatbot
+    responses:
+      200:
+        description: L1 counters, entry count and bytes held against their limits; L2 backend, hits, writes, errors and invalidations (null when CACHE_L2=none)
+    """
+    return jsonify(CacheManager.stats()), 200
+
+
+@chat_bp.route("/chat/faq/stats", methods=["GET"])
+def faq_answer_stats():
+    """
+    Pre-generated suggested-question answers — coverage, batches and hits
+    ---
+    tags:
+      - Chatbot
+    responses:
+      200:
+        description: Installed content version, answer count, last batch duration, hits
+    """
+    return jsonify(faq_answers.stats()), 200
+
+
+@chat_bp.route("/chat/prompts/stats", methods=["GET"])
+def prompt_size_stats():
+    """
+    Prompt sizes per endpoint — estimated tokens against each model's budget
+    ---
+    tags:
+      - Chatbot
+    responses:
+      200:
+        description: Token budgets per model; per endpoint the static prefix size, percentiles of the tokens a request sends (cached prefix included) and how often the budget limited the context
+    """
+    return jsonify(prompt_stats()), 200
+
+
+@chat_bp.route("/chat/gemini/stats", methods=["GET"])
+def gemini_diagnostics():
+    """
+    Gemini diagnostics — per-model circuit breakers, admission and context caches
+    ---
+    tags:
+      - Chatbot
+    responses:
+      200:
+        description: Breaker state (closed / open / half-open), error and latency windows, cooldowns
+    """
+    return jsonify(gemini_stats()), 200
+
+
+@chat_bp.route("/chat/writer/stats", methods=["GET"])
+def conversation_writer_stats():
+    """
+    Write-behind conversation writer — queue depth and flush latency
+    ---
+    tags:
+      - Chatbot
+    responses:
+      200:
+        description: Writer counters
+    """
+    return jsonify(conversation_writer.stats()), 200
+
+
 @chat_bp.route("/history/<session_id>", methods=["GET"])
 def get_chat_history(session_id):
     """
@@ -581,32 +1043,48 @@ def submit_feedback():
 @chat_bp.route("/content/refresh", methods=["POST"])
 def refresh_content():
     """
-    Refresh website content
+    Refresh website content in the background
+    Only pages that changed since the last scrape are re-rendered; requests
+    keep using the current content until the new version is swapped in.
+    ---
+    tags:
+      - Chatbot
+    responses:
+      202:
+        description: Refresh started
+      409:
+        description: A refresh is already running
+    """
+    if not start_content_refresh():
+        return jsonify({"message": "Content refresh already in progress"}), 409
+    return jsonify({
+        "message": "Content refresh started",
+        "content_version": _content.version,
+        "generation": _content.generation,
+    }), 202
+
+
+@chat_bp.route("/content/status", methods=["GET"])
+def content_status():
+    """
+    Content freshness — last refresh (any worker) and what this worker serves
     ---
     tags:
       - Chatbot
     responses:
       200:
-        description: Content refreshed
+        description: Last refresh time and duration, installed generation, scheduler state
     """
-    global _site_content, _content_loaded
-    
-    try:
-        with _loading_lock:
-            _content_loaded = False
-            _site_content = None
-            load_site_content()
-        
-        # Clear cache when content is refreshed
-        CacheManager.clear()
-        
-        return jsonify({
-            "message": "Content refreshed successfully",
-            "content_length": len(_site_content) if _site_content else 0
-        }), 200
-        
-    except Exception as e:
-        return jsonify({"error": f"Failed to refresh content: {str(e)}"}), 500
+    current = _content
+    header = read_header()
+    return jsonify({
+        "last_refresh": read_refresh_status(),
+        "published_generation": header[0] if header else 0,
+        "installed_generation": current.generation,
+        "content_version": current.version,
+        "content_length": len(current.content),
+        "scheduler": refresh_scheduler.stats(),
+    }), 200
 
 
 @chat_bp.route("/sessions/cleanup", methods=["POST"])
@@ -3,45 +3,25 @@ Dynamic Itinerary Builder Routes
 Conversational itinerary building using Gemini AI
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from extensions import db
 from models.conversation import Conversation
 from models.message import Message
 from services.itinerary_builder import ItineraryBuilder
 from services.session_manager import SessionManager
+from services import conversation_summary
 from routes.chat import get_site_content
-from middleware.rate_limit import rate_limit
-from gemini import get_gemini_model
+from middleware.rate_limit import rate_limit, service_unavailable
+from gemini import get_gemini_model, GeminiUnavailable
+import asyncio
 import json
 import re
 
 itinerary_builder_bp = Blueprint("itinerary_builder", __name__)
 
 
-def _get_conversation_history(conversation_id):
-    messages = Message.query.filter_by(
-        conversation_id=conversation_id
-    ).order_by(Message.created_at).all()
-    return [{'role': m.role, 'content': m.content} for m in messages]
-
-
-def _build_history_text(history):
-    """Format conversation history for Gemini context."""
-    lines = []
-    for m in history:
-        role = "User" if m['role'] == 'user' else "Nambi"
-        lines.append(f"{role}: {m['content']}")
-    return "\n".join(lines)
-
-
-def _gemini_itinerary_conversation(history, new_message, site_content):
-    """
-    Use Gemini to drive the itinerary conversation naturally.
-    Returns dict with: status, reply, extracted_info (if ready)
-    """
-    model = get_gemini_model()
-
-    history_text = _build_history_text(history)
+def _conversation_prompt(history, new_message, summary=None):
+    history_text = conversation_summary.history_text(summary, history)
 
     prompt = f"""You are Nambi, a warm and knowledgeable Uganda travel assistant building a personalised itinerary.
 
@@ -77,21 +57,57 @@ RESPOND IN THIS EXACT JSON FORMAT:
 
 IMPORTANT: Return ONLY the JSON, no markdown, no extra text."""
 
+    return prompt
+
+
+_GATHERING_FALLBACK = {
+    "status": "gathering",
+    "reply": "I'd love to help plan your Uganda adventure! Could you tell me how many days you're thinking and what activities excite you most?",
+    "extracted": {"duration": None, "budget": None, "interests": None, "accommodation": None, "pace": None}
+}
+
+
+def _parse_conversation_reply(text):
+    text = text.strip()
+    # Strip markdown code blocks if present
+    text = re.sub(r'^```json\s*', '', text)
+    text = re.sub(r'^```\s*', '', text)
+    text = re.sub(r'\s*```$', '', text)
+    return json.loads(text)
+
+
+def _gemini_itinerary_conversation(history, new_message, site_content, summary=None):
+    """
+    Use Gemini to drive the itinerary conversation naturally.
+    history is the recent messages; summary covers everything before them.
+    Returns dict with: status, reply, extracted_info (if ready)
+    """
+    model = get_gemini_model()
+    prompt = _conversation_prompt(history, new_message, summary)
+
     try:
         response = model.generate_content(prompt)
-        text = response.text.strip()
-        # Strip markdown code blocks if present
-        text = re.sub(r'^```json\s*', '', text)
-        text = re.sub(r'^```\s*', '', text)
-        text = re.sub(r'\s*```$', '', text)
-        return json.loads(text)
+        return _parse_conversation_reply(response.text)
+    except GeminiUnavailable:
+        raise
     except Exception as e:
         print(f"Gemini itinerary conversation error: {e}")
-        return {
-            "status": "gathering",
-            "reply": "I'd love to help plan your Uganda adventure! Could you tell me how many days you're thinking and what activities excite you most?",
-            "extracted": {"duration": None, "budget": None, "interests": None, "accommodation": None, "pace": None}
-        }
+        return dict(_GATHERING_FALLBACK)
+
+
+async def _gemini_itinerary_conversation_async(history, new_message, site_content, summary=None):
+    """_gemini_itinerary_conversation() on the async Gemini client"""
+    model = get_gemini_model()
+    prompt = _conversation_prompt(history, new_message, summary)
+
+    try:
+        response = await model.generate_content_async(prompt)
+        return _parse_conversation_reply(response.text)
+    except GeminiUnavailable:
+        raise
+    except Exception as e:
+        print(f"Gemini itinerary conversation error: {e}")
+        return dict(_GATHERING_FALLBACK)
 
 
 @itinerary_builder_bp.route("/build-itinerary", methods=["POST"])
@@ -125,104 +141,186 @@ def build_itinerary():
         description: Conversational response or generated itinerary
     """
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "Invalid request body"}), 400
+        local, state = _itinerary_begin(request.get_json())
+        if local is not None:
+            return local
 
-        session_id = data.get("session_id")
-        user_message = data.get("message", "").strip()
-        generate_now = data.get("generate_now", False)
+        # Let Gemini drive the conversation
+        site_content = get_site_content()
+        result = _gemini_itinerary_conversation(state["history"], state["user_message"], site_content,
+                                                state["summary"])
 
-        if not session_id:
-            return jsonify({"error": "session_id is required"}), 400
+        local, info = _itinerary_reply(state, result)
+        if local is not None:
+            return local
 
-        conversation = SessionManager.get_or_create_session(session_id)
+        itinerary_data, error = ItineraryBuilder.generate_itinerary(info, site_content)
+        return _itinerary_generated(state, itinerary_data, error)
 
-        # Store user message
-        if user_message:
-            db.session.add(Message(
-                conversation_id=conversation.id,
-                role='user',
-                content=user_message
-            ))
-            db.session.commit()
+    except GeminiUnavailable as e:
+        return _busy_response(e)
+    except Exception as e:
+        return _unexpected_error(e)
 
-        # Get full conversation history
-        history = _get_conversation_history(conversation.id)
 
-        # Let Gemini drive the conversation
-        site_content = get_site_content()
-        result = _gemini_itinerary_conversation(history, user_message, site_content)
+async def build_itinerary_async(app, data):
+    """
+    POST /api/build-itinerary for async_app.py — the same steps as
+    build_itinerary(), with DB work on worker threads and Gemini awaited.
+    """
+    def in_app(fn, *args):
+        def run():
+            with app.app_context():
+                return fn(*args)
+        return asyncio.to_thread(run)
 
-        status = result.get("status", "gathering")
-        reply = result.get("reply", "")
-        extracted = result.get("extracted", {})
+    try:
+        local, state = await in_app(_itinerary_begin, data)
+        if local is not None:
+            return local
 
-        # Store Nambi's reply
-        db.session.add(Message(
-            conversation_id=conversation.id,
-            role='bot',
-            content=reply
-        ))
-        db.session.commit()
+        # A cold worker loads content here (snapshot wait, index build) — keep it off the event loop
+        site_content = await in_app(get_site_content)
+        result = await _gemini_itinerary_conversation_async(state["history"], state["user_message"],
+                                                            site_content, state["summary"])
 
-        # If still gathering info, return the conversational reply
-        if status == "gathering" and not generate_now:
-            return jsonify({
-                "status": "gathering_info",
-                "message": reply,
-                "question": reply,
-                "extracted_info": extracted,
-            }), 200
-
-        # Ready to generate — build the itinerary
-        # Fill any gaps with sensible defaults
-        info = {
-            'duration': extracted.get('duration') or 7,
-            'budget': extracted.get('budget') or 500,
-            'interests': extracted.get('interests') or 'general tourism',
-            'accommodation': extracted.get('accommodation') or 'mid-range',
-            'pace': extracted.get('pace') or 'moderate',
-            'group_size': 1
-        }
+        local, info = await in_app(_itinerary_reply, state, result)
+        if local is not None:
+            return local
 
-        itinerary_data, error = ItineraryBuilder.generate_itinerary(info, site_content)
+        itinerary_data, error = await ItineraryBuilder.generate_itinerary_async(info, site_content)
+        return await in_app(_itinerary_generated, state, itinerary_data, error)
 
-        if error:
-            return jsonify({"status": "error", "message": error}), 500
+    except GeminiUnavailable as e:
+        with app.app_context():
+            return _busy_response(e)
+    except Exception as e:
+        with app.app_context():
+            return _unexpected_error(e)
 
-        save_result = ItineraryBuilder.save_itinerary(itinerary_data, session_id)
 
-        response_message = (
-            f"Your {itinerary_data['days']}-day Uganda itinerary is ready! "
-            f"Here's a preview of {itinerary_data['title']}. "
-            "Would you like to view the full details, make any changes, or go ahead and book?"
-        )
+def _itinerary_begin(data):
+    """Validate the request, store the user's message and load the history."""
+    if not data:
+        return (jsonify({"error": "Invalid request body"}), 400), None
 
+    session_id = data.get("session_id")
+    user_message = data.get("message", "").strip()
+    generate_now = data.get("generate_now", False)
+
+    if not session_id:
+        return (jsonify({"error": "session_id is required"}), 400), None
+
+    conversation = SessionManager.get_or_create_session(session_id)
+
+    # Store user message
+    if user_message:
         db.session.add(Message(
             conversation_id=conversation.id,
-            role='bot',
-            content=response_message
+            role='user',
+            content=user_message
         ))
         db.session.commit()
 
-        return jsonify({
-            "status": "generated",
-            "message": response_message,
-            "itinerary_id": save_result['itinerary_id'],
-            "itinerary": save_result['itinerary'],
-            "validation": save_result['validation'],
-            "actions": [
-                {"label": "View Full Itinerary", "action": "view_itinerary"},
-                {"label": "Modify Itinerary", "action": "modify"},
-                {"label": "Proceed to Booking", "action": "book"}
-            ]
-        }), 200
+    # Recent history verbatim; older messages are covered by the rolling summary. A fold that
+    # is due runs in the background — this turn goes ahead with the summary as it stands
+    history = conversation_summary.unsummarized(conversation.id, conversation.summary_through_id or 0)
+    conversation_summary.schedule_fold(current_app._get_current_object(), conversation, history)
+
+    return None, {
+        "session_id": session_id,
+        "user_message": user_message,
+        "generate_now": generate_now,
+        "conversation_id": conversation.id,
+        "history": history,
+        "summary": conversation.summary,
+    }
+
 
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": "An unexpected error occurred", "details": str(e)}), 500
+def _itinerary_reply(state, result):
+    """
+    Store Nambi's reply. Returns (response, None) while still gathering,
+    else (None, info) with the requirements to generate from.
+    """
+    status = result.get("status", "gathering")
+    reply = result.get("reply", "")
+    extracted = result.get("extracted", {})
+
+    # Store Nambi's reply
+    db.session.add(Message(
+        conversation_id=state["conversation_id"],
+        role='bot',
+        content=reply
+    ))
+    db.session.commit()
+
+    # If still gathering info, return the conversational reply
+    if status == "gathering" and not state["generate_now"]:
+        return (jsonify({
+            "status": "gathering_info",
+            "message": reply,
+            "question": reply,
+            "extracted_info": extracted,
+        }), 200), None
+
+    # Ready to generate — build the itinerary
+    # Fill any gaps with sensible defaults
+    return None, {
+        'duration': extracted.get('duration') or 7,
+        'budget': extracted.get('budget') or 500,
+        'interests': extracted.get('interests') or 'general tourism',
+        'accommodation': extracted.get('accommodation') or 'mid-range',
+        'pace': extracted.get('pace') or 'moderate',
+        'group_size': 1
+    }
+
+
+def _itinerary_generated(state, itinerary_data, error):
+    """Save a generated itinerary and build the response."""
+    if error:
+        return jsonify({"status": "error", "message": error}), 500
+
+    save_result = ItineraryBuilder.save_itinerary(itinerary_data, state["session_id"])
+
+    response_message = (
+        f"Your {itinerary_data['days']}-day Uganda itinerary is ready! "
+        f"Here's a preview of {itinerary_data['title']}. "
+        "Would you like to view the full details, make any changes, or go ahead and book?"
+    )
+
+    db.session.add(Message(
+        conversation_id=state["conversation_id"],
+        role='bot',
+        content=response_message
+    ))
+    db.session.commit()
+
+    return jsonify({
+        "status": "generated",
+        "message": response_message,
+        "itinerary_id": save_result['itinerary_id'],
+        "itinerary": save_result['itinerary'],
+        "validation": save_result['validation'],
+        "actions": [
+            {"label": "View Full Itinerary", "action": "view_itinerary"},
+            {"label": "Modify Itinerary", "action": "modify"},
+            {"label": "Proceed to Booking", "action": "book"}
+        ]
+    }), 200
+
+
+def _busy_response(e):
+    return service_unavailable(e.retry_after, {
+        "status": "busy",
+        "message": "Nambi is taking a short breather — please try again in a few seconds!",
+        "retry_after": e.retry_after
+    })
+
+
+def _unexpected_error(e):
+    import traceback
+    traceback.print_exc()
+    return jsonify({"error": "An unexpected error occurred", "details": str(e)}), 500
 
 
 @itinerary_builder_bp.route("/itinerary/<int:itinerary_id>", methods=["GET"])
@@ -277,7 +375,13 @@ def regenerate_itinerary(itinerary_id):
     }
 
     site_content = get_site_content()
-    itinerary_data, error = ItineraryBuilder.generate_itinerary(info, site_content)
+    try:
+        itinerary_data, error = ItineraryBuilder.generate_itinerary(info, site_content)
+    except GeminiUnavailable as e:
+        return service_unavailable(e.retry_after, {
+            "error": "Nambi is taking a short breather — please try again in a few seconds!",
+            "retry_after": e.retry_after
+        })
 
     if error:
         return jsonify({"error": error}), 500
@@ -5,6 +5,7 @@ Handle language detection, switching, and translation
 
 from flask import Blueprint, request, jsonify
 from services.translation_service import get_translation_service
+from services.response_catalog import catalog, catalog_response, STATIC_MAX_AGE
 from models.conversation import Conversation
 from extensions import db
 
@@ -12,6 +13,9 @@ multilingual_bp = Blueprint("multilingual", __name__)
 
 translation_service = get_translation_service()
 
+# Static GET body, serialized once
+_LANGUAGES = catalog.add(("languages",), {"languages": translation_service.get_supported_languages()})
+
 
 @multilingual_bp.route("/languages", methods=["GET"])
 def get_supported_languages():
@@ -33,9 +37,7 @@ def get_supported_languages():
                 fr: French
                 de: German
     """
-    return jsonify({
-        "languages": translation_service.get_supported_languages()
-    }), 200
+    return catalog_response(_LANGUAGES, max_age=STATIC_MAX_AGE)
 
 
 @multilingual_bp.route("/detect-language", methods=["POST"])
@@ -5,12 +5,19 @@ Handles speech-to-text using Whisper
 
 from flask import Blueprint, request, jsonify
 from services.voice_service import VoiceService
-from middleware.rate_limit import rate_limit
+from middleware.rate_limit import rate_limit, service_unavailable
+from services.intent_matcher import is_simple_greeting
+from services.prompt_builder import get_company_context, voice_prompts
+from services.response_catalog import catalog, catalog_response, STATIC_MAX_AGE
 from werkzeug.utils import secure_filename
 import os
 
 voice_bp = Blueprint("voice", __name__)
 
+# Static GET bodies, serialized once
+_SUPPORTED_LANGUAGES = catalog.add(("voice", "supported-languages"), VoiceService.get_supported_languages())
+_MODEL_INFO = catalog.add(("voice", "models"), VoiceService.get_model_info())
+
 # TTS audio cache — avoids regenerating identical audio on repeated calls
 _tts_cache = {}
 
@@ -72,7 +79,26 @@ def _run_async(coro):
 def _generate_audio_b64(text, language='en'):
     """Generate audio from text and return as base64 string"""
     try:
-        import edge_tts
+        return _run_async(_generate_audio_b64_async(text, language))
+    except Exception as e:
+        print(f"Audio generation failed: {e}")
+        return None
+
+
+async def _edge_tts_bytes(text, voice):
+    import edge_tts
+
+    communicate = edge_tts.Communicate(text, voice)
+    audio_data = b""
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            audio_data += chunk["data"]
+    return audio_data
+
+
+async def _generate_audio_b64_async(text, language='en'):
+    """Generate audio from text and return as base64 string — awaited directly on the event loop"""
+    try:
         import base64
 
         clean_text = _strip_markdown(text)
@@ -83,20 +109,12 @@ def _generate_audio_b64(text, language='en'):
         voice = VOICE_MAP.get(language, 'en-GB-SoniaNeural')
         print(f"Generating audio: voice={voice}, lang={language}, chars={len(clean_text)}")
 
-        async def generate(v):
-            communicate = edge_tts.Communicate(clean_text, v)
-            audio_data = b""
-            async for chunk in communicate.stream():
-                if chunk["type"] == "audio":
-                    audio_data += chunk["data"]
-            return audio_data
-
         # Try the mapped voice; fall back to Sonia if it fails (e.g. sw-KE-ZuriNeural unavailable)
         try:
-            audio_bytes = _run_async(generate(voice))
+            audio_bytes = await _edge_tts_bytes(clean_text, voice)
         except Exception as voice_err:
             print(f"Voice {voice} failed ({voice_err}), falling back to en-GB-SoniaNeural")
-            audio_bytes = _run_async(generate('en-GB-SoniaNeural'))
+            audio_bytes = await _edge_tts_bytes(clean_text, 'en-GB-SoniaNeural')
 
         if not audio_bytes:
             print("Audio generation returned empty bytes")
@@ -313,7 +331,7 @@ def get_supported_languages():
         schema:
           type: object
     """
-    return jsonify(VoiceService.get_supported_languages()), 200
+    return catalog_response(_SUPPORTED_LANGUAGES, max_age=STATIC_MAX_AGE)
 
 
 @voice_bp.route("/voice/models", methods=["GET"])
@@ -329,7 +347,7 @@ def get_models():
         schema:
           type: object
     """
-    return jsonify(VoiceService.get_model_info()), 200
+    return catalog_response(_MODEL_INFO, max_age=STATIC_MAX_AGE)
 
 
 @voice_bp.route("/voice/speak", methods=["POST"])
@@ -407,20 +425,10 @@ def text_to_speech():
         # Use requested voice, or pick best for language, or default to Sonia
         voice = requested_voice or language_voice_map.get(language, 'en-GB-SoniaNeural')
 
-        import edge_tts
-
-        async def generate(v):
-            communicate = edge_tts.Communicate(text, v)
-            audio_data = b""
-            async for chunk in communicate.stream():
-                if chunk["type"] == "audio":
-                    audio_data += chunk["data"]
-            return audio_data
-
         try:
-            audio_bytes = _run_async(generate(voice))
+            audio_bytes = _run_async(_edge_tts_bytes(text, voice))
         except Exception:
-            audio_bytes = _run_async(generate('en-GB-SoniaNeural'))
+            audio_bytes = _run_async(_edge_tts_bytes(text, 'en-GB-SoniaNeural'))
 
         # Cache for future identical requests (max 50 entries)
         if len(_tts_cache) > 50:
@@ -479,179 +487,247 @@ def voice_chat():
               type: array
     """
     try:
-        print("\n" + "=" * 80)
-        print("VOICE CHAT REQUEST RECEIVED")
-        print("=" * 80)
-        
-        # Transcribe audio
-        if 'audio' not in request.files:
-            print("ERROR: No audio file in request")
-            return jsonify({'error': 'No audio file provided'}), 400
-        
-        file = request.files['audio']
-        session_id = request.form.get('session_id')
-        language_hint = request.form.get('language')  # Optional language hint from frontend
-        
-        print(f"File: {file.filename}")
-        print(f"Session ID: {session_id}")
-        print(f"Language hint from frontend: {language_hint or 'None (auto-detect)'}")
-        
-        if not session_id:
-            print("ERROR: No session_id provided")
-            return jsonify({'error': 'session_id is required'}), 400
-        
-        # Transcribe with language hint if provided
-        print("Reading audio bytes...")
-        audio_bytes = file.read()
-        print(f"Audio size: {len(audio_bytes)} bytes")
-        
-        # Use language hint if explicitly provided by frontend (not the default 'en')
-        # If no hint or default 'en', let Whisper auto-detect
-        whisper_language = None
-        if language_hint and language_hint not in ('en', 'auto') and len(language_hint) <= 5:
-            whisper_language = language_hint
-            print(f"Using language hint for Whisper: {whisper_language}")
-        else:
-            print("Auto-detecting language (no explicit hint)...")
-        
+        local, args = _voice_request(request.files, request.form)
+        if local is not None:
+            return local
+
         print("Starting transcription...")
         transcription = VoiceService.transcribe_audio_bytes(
-            audio_bytes,
-            filename=secure_filename(file.filename),
-            language=whisper_language  # Use auto-detect or hint from frontend
+            args['audio_bytes'],
+            filename=args['filename'],
+            language=args['whisper_language']  # Use auto-detect or hint from frontend
         )
-        
-        print(f"Transcription result: {transcription}")
-        
-        if not transcription['success']:
-            print(f"ERROR: Transcription failed - {transcription.get('error')}")
-            return jsonify({
-                'error': 'Transcription failed',
-                'details': transcription.get('error', 'Unknown error')
-            }), 500
-        
-        # Import chat processing logic
-        from gemini import get_gemini_model
-        from services.multilingual_chat_service import MultilingualChatService
-        from services.session_manager import SessionManager
-        from models.message import Message
-        from extensions import db
-        
-        question = transcription['text']
-        detected_language = transcription.get('language', 'en')
-
-        # Fix: low confidence on unlikely language → fall back to Swahili
-        segments = transcription.get('segments', [])
-        if segments:
-            avg_no_speech = sum(s.get('no_speech_prob', 0) for s in segments) / len(segments)
-            unlikely_langs = {'ko', 'ja', 'zh', 'ru', 'ar', 'hi', 'th', 'vi', 'tr', 'pl', 'nl'}
-            if avg_no_speech > 0.4 and detected_language in unlikely_langs:
-                print(f"Low confidence ({avg_no_speech:.2f}) for {detected_language}, falling back to sw")
-                detected_language = 'sw'
-
-        user_lang = detected_language
-        english_question = question  # Gemini handles all languages natively
-
-        # Check greeting without blocking DB call
-        simple_greetings = {"hi", "hello", "hey", "good morning", "good afternoon",
-                            "good evening", "greetings", "habari", "jambo", "mambo"}
-        is_greeting = question.lower().strip() in simple_greetings
-
-        if is_greeting:
-            from services.multilingual_chat_service import MultilingualChatService
-            welcome_message = MultilingualChatService.get_welcome_message(user_lang)
-            audio_b64 = _generate_audio_b64(welcome_message, user_lang)
-            return jsonify({
-                "transcription": {"text": transcription['text'], "language": detected_language},
-                "answer": welcome_message,
-                "audio_base64": audio_b64,
-                "suggested_questions": []
-            }), 200
-        
-        # Get Gemini model and site content
-        model = get_gemini_model()
-        
-        # Load site content
-        from routes.chat import get_site_content
-        site_content = get_site_content()
-        
-        # System prompt
-        system_prompt = f"""You are Nambi, Virtual Travel Assistant for Everything Uganda. You are warm, fun and quick.
 
-LANGUAGE: Respond in {user_lang} only.
+        local, call = _voice_call(args, transcription)
+        if local is not None:
+            return local
+
+        if call['answer'] is None:
+            # Call Gemini — responds in user's language directly, no translation needed
+            # The static prefix is served from Gemini's context cache when available
+            from gemini import get_gemini_model, GeminiUnavailable
+            try:
+                response = get_gemini_model().generate_cached(
+                    call['static_prefix'], call['suffix'],
+                    fallback_prompt=call['full_prompt'], label="voice", prefix_digest=call['prefix_digest'],
+                )
+            except GeminiUnavailable as e:
+                return _voice_busy(call, e)
+            call['answer'] = response.text
+
+        return _voice_finish(call, _generate_audio_b64(call['answer'], call['language']))
 
-CRITICAL: The company content below is scraped LIVE from www.everythinguganda.com.
-Search ALL of it thoroughly before saying you don't have information.
-NEVER say "I don't have that detail" if the topic is Uganda tourism.
+    except Exception as e:
+        return _voice_error(e)
 
-RESPONSE RULES:
-- ONE short paragraph — 2-3 sentences max
-- Direct, warm, conversational
-- End with a follow-up question
-- No bullet points, no headers
 
-COMPANY CONTENT:
-{site_content[:30000] if site_content else ""}
-"""
-        
-        # Call Gemini — responds in user's language directly, no translation needed
-        full_prompt = system_prompt + f"\n\nUser Question:\n{english_question}"
-        response = model.generate_content(full_prompt)
-        translated_response = response.text
-        
-        # Store in background — never block the audio response
-        if session_id:
-            from flask import current_app
-            _app = current_app._get_current_object()
-            _q, _r = question, translated_response
-            def _store_voice():
-                try:
-                    with _app.app_context():
-                        conv = Conversation.query.filter_by(session_id=session_id).first()
-                        if not conv:
-                            conv = Conversation(session_id=session_id, language=user_lang, is_active=True)
-                            db.session.add(conv)
-                            try:
-                                db.session.flush()
-                            except Exception:
-                                db.session.rollback()
-                                conv = Conversation.query.filter_by(session_id=session_id).first()
-                        db.session.add(Message(conversation_id=conv.id, role='user', content=_q))
-                        db.session.add(Message(conversation_id=conv.id, role='bot', content=_r))
-                        db.session.commit()
-                except Exception as e:
-                    print(f"Voice store failed: {e}")
-                    try:
-                        db.session.rollback()
-                    except Exception:
-                        pass
-            import threading
-            threading.Thread(target=_store_voice, daemon=True).start()
-        
-        return jsonify({
-            'transcription': {
-                'text': transcription['text'],
-                'language': detected_language
-            },
-            'answer': translated_response,
-            'audio_base64': _generate_audio_b64(translated_response, user_lang),
-            'suggested_questions': [],
-            'action_buttons': [],
-            'booking_buttons': [],
-            'show_booking_prompt': False,
-            'images': [],
-            'quick_replies': []
-        }), 200
-        
+async def voice_chat_async(app, files, form):
+    """
+    POST /api/voice/chat for async_app.py — Whisper runs on a worker thread,
+    Gemini and edge-tts are awaited on the event loop. Content loading and
+    the write-behind enqueue can block, so they run on worker threads too.
+    """
+    import asyncio
+    from gemini import get_gemini_model, GeminiUnavailable
+
+    def in_app(fn, *args):
+        def run():
+            with app.app_context():
+                return fn(*args)
+        return asyncio.to_thread(run)
+
+    try:
+        with app.app_context():
+            local, args = _voice_request(files, form)
+        if local is not None:
+            return local
+
+        print("Starting transcription...")
+        transcription = await asyncio.to_thread(
+            VoiceService.transcribe_audio_bytes,
+            args['audio_bytes'],
+            filename=args['filename'],
+            language=args['whisper_language'],
+        )
+
+        local, call = await in_app(_voice_call, args, transcription)
+        if local is not None:
+            return local
+
+        if call['answer'] is None:
+            try:
+                response = await get_gemini_model().generate_cached_async(
+                    call['static_prefix'], call['suffix'],
+                    fallback_prompt=call['full_prompt'], label="voice", prefix_digest=call['prefix_digest'],
+                )
+            except GeminiUnavailable as e:
+                with app.app_context():
+                    return _voice_busy(call, e)
+            call['answer'] = response.text
+
+        audio_b64 = await _generate_audio_b64_async(call['answer'], call['language'])
+        return await in_app(_voice_finish, call, audio_b64)
+
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print("=" * 80)
-        print("VOICE CHAT ERROR:")
-        print(error_trace)
-        print("=" * 80)
+        with app.app_context():
+            return _voice_error(e)
+
+
+def _voice_request(files, form):
+    """Validate the upload. Returns (response, None) on error, else (None, args for transcription)."""
+    print("\n" + "=" * 80)
+    print("VOICE CHAT REQUEST RECEIVED")
+    print("=" * 80)
+
+    # Transcribe audio
+    if 'audio' not in files:
+        print("ERROR: No audio file in request")
+        return (jsonify({'error': 'No audio file provided'}), 400), None
+
+    file = files['audio']
+    session_id = form.get('session_id')
+    language_hint = form.get('language')  # Optional language hint from frontend
+
+    print(f"File: {file.filename}")
+    print(f"Session ID: {session_id}")
+    print(f"Language hint from frontend: {language_hint or 'None (auto-detect)'}")
+
+    if not session_id:
+        print("ERROR: No session_id provided")
+        return (jsonify({'error': 'session_id is required'}), 400), None
+
+    # Transcribe with language hint if provided
+    print("Reading audio bytes...")
+    audio_bytes = file.read()
+    print(f"Audio size: {len(audio_bytes)} bytes")
+
+    # Use language hint if explicitly provided by frontend (not the default 'en')
+    # If no hint or default 'en', let Whisper auto-detect
+    whisper_language = None
+    if language_hint and language_hint not in ('en', 'auto') and len(language_hint) <= 5:
+        whisper_language = language_hint
+        print(f"Using language hint for Whisper: {whisper_language}")
+    else:
+        print("Auto-detecting language (no explicit hint)...")
+
+    return None, {
+        'session_id': session_id,
+        'audio_bytes': audio_bytes,
+        'filename': secure_filename(file.filename),
+        'whisper_language': whisper_language,
+    }
+
+
+def _voice_call(args, transcription):
+    """
+    Everything between Whisper and Gemini. Returns (response, None) on a
+    failed transcription, else (None, call); call['answer'] is already set
+    for greetings, which need no Gemini call.
+    """
+    print(f"Transcription result: {transcription}")
+
+    if not transcription['success']:
+        print(f"ERROR: Transcription failed - {transcription.get('error')}")
+        return (jsonify({
+            'error': 'Transcription failed',
+            'details': transcription.get('error', 'Unknown error')
+        }), 500), None
+
+    question = transcription['text']
+    detected_language = transcription.get('language', 'en')
+
+    # Fix: low confidence on unlikely language → fall back to Swahili
+    segments = transcription.get('segments', [])
+    if segments:
+        avg_no_speech = sum(s.get('no_speech_prob', 0) for s in segments) / len(segments)
+        unlikely_langs = {'ko', 'ja', 'zh', 'ru', 'ar', 'hi', 'th', 'vi', 'tr', 'pl', 'nl'}
+        if avg_no_speech > 0.4 and detected_language in unlikely_langs:
+            print(f"Low confidence ({avg_no_speech:.2f}) for {detected_language}, falling back to sw")
+            detected_language = 'sw'
+
+    user_lang = detected_language
+    call = {
+        'session_id': args['session_id'],
+        'question': question,
+        'transcription': {'text': transcription['text'], 'language': detected_language},
+        'language': user_lang,
+        'greeting': False,
+        'answer': None,
+    }
+
+    # Check greeting without blocking DB call
+    if question.strip() and is_simple_greeting(question):
+        from services.multilingual_chat_service import MultilingualChatService
+        call['greeting'] = True
+        call['answer'] = MultilingualChatService.get_welcome_message(user_lang)
+        return None, call
+
+    # Load site content
+    from routes.chat import get_site_content
+    site_content = get_site_content()
+
+    # Nambi's system prompt — Gemini handles all languages natively
+    prompt = voice_prompts.build(lambda budget: get_company_context(question, site_content, budget),
+                                 language=user_lang, question=question)
+    call['full_prompt'] = prompt.full_prompt
+    call['static_prefix'] = prompt.static_prefix
+    call['prefix_digest'] = prompt.prefix_digest
+    call['suffix'] = prompt.suffix
+    return None, call
+
+
+def _voice_busy(call, e):
+    print(f"Gemini unavailable — retry after {e.retry_after}s")
+    return service_unavailable(e.retry_after, {
+        'transcription': call['transcription'],
+        'error': 'Nambi is busy right now — please try again shortly',
+        'retry_after': e.retry_after
+    })
+
+
+def _voice_finish(call, audio_b64):
+    """Persist the exchange in the background and build the voice chat response."""
+    if call['greeting']:
         return jsonify({
-            'error': 'Voice chat failed',
-            'details': str(e),
-            'type': type(e).__name__
-        }), 500
+            "transcription": call['transcription'],
+            "answer": call['answer'],
+            "audio_base64": audio_b64,
+            "suggested_questions": []
+        }), 200
+
+    # Store in background — never block the audio response
+    if call['session_id']:
+        from flask import current_app
+        _store_voice_exchange(current_app._get_current_object(), call['session_id'],
+                              call['language'], call['question'], call['answer'])
+
+    return jsonify({
+        'transcription': call['transcription'],
+        'answer': call['answer'],
+        'audio_base64': audio_b64,
+        'suggested_questions': [],
+        'action_buttons': [],
+        'booking_buttons': [],
+        'show_booking_prompt': False,
+        'images': [],
+        'quick_replies': []
+    }), 200
+
+
+def _store_voice_exchange(app, session_id, user_lang, question, answer):
+    from services.conversation_writer import conversation_writer
+    conversation_writer.submit(app, session_id, user_lang, question, answer)
+
+
+def _voice_error(e):
+    import traceback
+    error_trace = traceback.format_exc()
+    print("=" * 80)
+    print("VOICE CHAT ERROR:")
+    print(error_trace)
+    print("=" * 80)
+    return jsonify({
+        'error': 'Voice chat failed',
+        'details': str(e),
+        'type': type(e).__name__
+    }), 500
@@ -0,0 +1,93 @@
+"""
+Answer cache for /api/chat
+Keyed on normalized question + language + content version, so repeat
+questions skip the Gemini call entirely.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def _is_punct(ch):
+    return unicodedata.category(ch)[0] in ("P", "S")
+
+
+def normalize_question(question):
+    """Casefold, drop punctuation/symbols and collapse whitespace."""
+    text = unicodedata.normalize("NFKC", question or "").casefold()
+    text = "".join(" " if _is_punct(ch) else ch for ch in text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def content_version(content):
+    """Short hash identifying a version of the site content."""
+    return hashlib.sha1((content or "").encode("utf-8")).hexdigest()[:16]
+
+
+class AnswerCache:
+    """Thread-safe LRU with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = max_entries or int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+        self.ttl = ttl or int(os.getenv("ANSWER_CACHE_TTL", "3600"))
+        self._entries = OrderedDict()  # key -> (expires_at, answer)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(question, language, version):
+        return (normalize_question(question), language or "en", version)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, answer = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return answer
+
+    def set(self, key, answer):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "gemini_calls_saved": self.hits,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+answer_cache = AnswerCache()
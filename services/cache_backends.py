@@ -0,0 +1,325 @@
+"""
+Shared second-tier (L2) stores behind CacheManager
+Every gunicorn worker keeps its own L1 (StripedLRUCache); the L2 is shared
+by all of them — a SQLite file on the host, or any server that speaks the
+Redis protocol. Every write also records a change under a shared,
+increasing version, so each worker can drop exactly the L1 entries another
+worker replaced, deleted or cleared (changes_since).
+
+Values cross the L2 in a compact binary encoding (encode / decode):
+marshal, zlib-compressed when large; values marshal can't hold (class
+instances, datetimes) stay in the L1. marshal is not secure against
+maliciously constructed data — a crafted value can crash the interpreter —
+so the L2 must only be writable by these workers. Where other clients can
+reach it, set CACHE_L2_SECRET: every value is then signed with HMAC-SHA256
+and one whose tag doesn't verify is dropped before it is unmarshalled.
+
+    CACHE_L2=sqlite:///cache_l2.sqlite     (default)
+    CACHE_L2=redis://host:6379/0
+    CACHE_L2=none                          L1 only
+"""
+
+import hashlib
+import hmac
+import marshal
+import os
+import socket
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from urllib.parse import urlparse
+
+CACHE_L2 = os.getenv("CACHE_L2", "sqlite:///cache_l2.sqlite")
+CACHE_L2_SECRET = os.getenv("CACHE_L2_SECRET", "").encode("utf-8")  # HMAC key; empty = unsigned
+CHANGE_LOG = 1000      # change records kept; a worker further behind drops its whole L1
+CHANGE_GRACE = 2.0     # seconds a missing change record may be in flight before it counts as lost
+COMPRESS_OVER = 1024   # bytes; larger payloads are zlib-compressed when that helps
+
+# Encoded value: [HMAC tag, 16 bytes, with CACHE_L2_SECRET] + expires_at (unix time, 8 bytes)
+# + codec byte + payload
+_EXPIRES = struct.Struct("<d")
+_MARSHAL, _ZLIB = 1, 0x10
+_TAG_BYTES = 16
+
+
+def _tag(body):
+    return hmac.new(CACHE_L2_SECRET, body, hashlib.sha256).digest()[:_TAG_BYTES]
+
+
+def encode(value, expires_at):
+    """Binary form of plain data (dicts, lists, strings, numbers...); ValueError for anything else."""
+    codec, payload = _MARSHAL, marshal.dumps(value)
+    if len(payload) > COMPRESS_OVER:
+        packed = zlib.compress(payload, 1)
+        if len(packed) < len(payload):
+            codec, payload = codec | _ZLIB, packed
+    body = _EXPIRES.pack(expires_at) + bytes([codec]) + payload
+    return _tag(body) + body if CACHE_L2_SECRET else body
+
+
+def decode(data):
+    """(value, expires_at) from encode()'s output; ValueError if it isn't that (or isn't signed by us)."""
+    if CACHE_L2_SECRET:
+        tag, data = data[:_TAG_BYTES], data[_TAG_BYTES:]
+        if not hmac.compare_digest(tag, _tag(data)):
+            raise ValueError("Undecodable cache value: bad signature")
+    try:
+        (expires_at,) = _EXPIRES.unpack_from(data)
+        codec = data[_EXPIRES.size]
+        payload = data[_EXPIRES.size + 1:]
+        if codec & 0x0F != _MARSHAL:
+            raise ValueError(f"unknown codec {codec:#x}")
+        if codec & _ZLIB:
+            payload = zlib.decompress(payload)
+        return marshal.loads(payload), expires_at
+    except (struct.error, IndexError, zlib.error, EOFError, TypeError, ValueError) as e:
+        raise ValueError(f"Undecodable cache value: {e}") from e
+
+
+class SQLiteBackend:
+    """L2 in a WAL-mode SQLite file shared by the workers on one host."""
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS changes (version INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT)")
+
+    def _conn(self):
+        # One connection per thread, never inherited across fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def _change(self, conn, key):
+        version = conn.execute("INSERT INTO changes (key) VALUES (?)", (key,)).lastrowid
+        self._writes += 1
+        if self._writes % 100 == 0:
+            conn.execute("DELETE FROM changes WHERE version <= ?", (version - CHANGE_LOG,))
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        return version
+
+    def set(self, key, data, expires_at):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                         (key, data, expires_at))
+            return self._change(conn, key)
+
+    def delete(self, key):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return self._change(conn, key)
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM cache")
+            return self._change(conn, None)
+
+    def version(self):
+        return self._conn().execute("SELECT COALESCE(MAX(version), 0) FROM changes").fetchone()[0]
+
+    def changes_since(self, version):
+        """(latest version, [(version, key)] after `version`; None instead of the list when the log no longer reaches back)."""
+        latest = self.version()
+        if latest <= version:
+            return latest, []
+        rows = self._conn().execute("SELECT version, key FROM changes WHERE version > ? ORDER BY version",
+                                    (version,)).fetchall()
+        if not rows or rows[0][0] != version + 1:
+            return latest, None
+        return latest, rows
+
+
+class RedisError(Exception):
+    """An error reply from the server."""
+
+
+# What a failing L2 raises; CacheManager falls back to L1 alone for a while
+L2_ERRORS = (OSError, sqlite3.Error, RedisError)
+
+
+class _RespConnection:
+    """Just enough of a Redis (RESP2) client for the commands below."""
+
+    def __init__(self, host, port, db, password, timeout):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.reader = self.sock.makefile("rb")
+        if password:
+            self.command("AUTH", password)
+        if db:
+            self.command("SELECT", db)
+
+    def command(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self.sock.sendall(b"".join(parts))
+        return self._reply()
+
+    def _reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            if n < 0:
+                return None
+            return self.reader.read(n + 2)[:-2]
+        if kind == b"*":
+            n = int(rest)
+            return None if n < 0 else [self._reply() for _ in range(n)]
+        raise RedisError(f"Unexpected Redis reply: {line!r}")
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+_GENERATION = struct.Struct("<q")   # ahead of each Redis value: the generation it was written under
+
+
+class RedisBackend:
+    """
+    L2 on a Redis-protocol server. clear() bumps {prefix}generation, and
+    every value is stored with the generation it was written under; a GET
+    fetches the value and the current generation in one MGET, so a value
+    from before a clear — by any process — is never served, and old values
+    are left to expire. A change bumps {prefix}version with INCR and then
+    stores the key under {prefix}change:<version>; a reader that finds a
+    version without its record waits CHANGE_GRACE for the writer to finish
+    before treating it as lost.
+    """
+
+    name = "redis"
+
+    def __init__(self, url, prefix="nambi:cache:", timeout=0.5):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.strip("/") or 0)
+        self.password = parsed.password
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+        self._gap_since = None
+
+    def _conn(self):
+        # One connection per thread, never inherited across fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = _RespConnection(self.host, self.port, self.db, self.password, self.timeout)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _command(self, *args):
+        try:
+            return self._conn().command(*args)
+        except OSError:
+            # Drop the broken connection so the next call reconnects
+            conn = getattr(self._local, "conn", None)
+            if conn is not None:
+                conn.close()
+            self._local.conn = None
+            raise
+
+    def get(self, key):
+        generation, data = self._command("MGET", self.prefix + "generation", self.prefix + "v:" + key)
+        if data is None or len(data) < _GENERATION.size:
+            return None
+        if _GENERATION.unpack_from(data)[0] != int(generation or 0):
+            return None   # written before the last clear()
+        return data[_GENERATION.size:]
+
+    def _change(self, key):
+        version = self._command("INCR", self.prefix + "version")
+        self._command("SET", f"{self.prefix}change:{version}", "*" if key is None else "k:" + key,
+                      "EX", 3600)
+        return version
+
+    def set(self, key, data, expires_at):
+        ttl_ms = max(1, int((expires_at - time.time()) * 1000))
+        # A clear() landing between these two commands leaves the value tagged with the old generation: unseen
+        generation = int(self._command("GET", self.prefix + "generation") or 0)
+        self._command("SET", self.prefix + "v:" + key, _GENERATION.pack(generation) + data, "PX", ttl_ms)
+        return self._change(key)
+
+    def delete(self, key):
+        self._command("DEL", self.prefix + "v:" + key)
+        return self._change(key)
+
+    def clear(self):
+        self._command("INCR", self.prefix + "generation")
+        return self._change(None)
+
+    def version(self):
+        return int(self._command("GET", self.prefix + "version") or 0)
+
+    def changes_since(self, version):
+        """(latest version, [(version, key)] after `version`; None instead of the list when the log no longer reaches back)."""
+        latest = self.version()
+        if latest <= version:
+            return latest, []
+        if latest - version > CHANGE_LOG:
+            return latest, None
+        versions = list(range(version + 1, latest + 1))
+        records = self._command("MGET", *(f"{self.prefix}change:{v}" for v in versions))
+        rows = []
+        for v, record in zip(versions, records):
+            if record is None:
+                # INCR landed but its record hasn't yet — or never will (writer died in between)
+                now = time.monotonic()
+                if self._gap_since is None:
+                    self._gap_since = now
+                if now - self._gap_since < CHANGE_GRACE:
+                    return v - 1, rows
+                self._gap_since = None
+                return latest, None
+            record = record.decode("utf-8")
+            rows.append((v, None if record == "*" else record[2:]))
+        self._gap_since = None
+        return latest, rows
+
+
+def backend_from_url(url=None):
+    """The L2 backend for CACHE_L2, or None for L1 only."""
+    url = CACHE_L2 if url is None else url
+    if not url or url == "none":
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith("redis://"):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported CACHE_L2: {url!r}")
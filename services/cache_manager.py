@@ -1,79 +1,404 @@
-from functools import wraps
-from datetime import datetime, timedelta
+"""
+Process-wide cache behind CacheManager
+A bounded LRU split into CACHE_STRIPES independently locked stripes (a key's
+stripe is picked by its hash), so threads touching different keys rarely
+contend. Each stripe holds 1/CACHE_STRIPES of the entry and byte limits and
+evicts its least recently used entries past them. TTLs run on the monotonic
+clock; every stripe keeps a min-heap of expiry times and drops what is due
+on each write, so expiry is amortized O(log n) with no full scans.
+
+That LRU is the L1 of a two-tier cache (TwoTierCache): writes go through to
+a store shared by every worker (services.cache_backends, CACHE_L2), an L1
+miss is filled from it, and each process replays the shared change log at
+most every CACHE_L1_SYNC seconds to drop L1 entries other workers replaced,
+deleted or cleared — so a content refresh in one worker clears them all.
+"""
+
 import hashlib
+import heapq
 import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from services.cache_backends import CACHE_L2, L2_ERRORS, backend_from_url, decode, encode
+from logger import get_logger
+
+log = get_logger("cache_manager")
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 2**20)))
+CACHE_STRIPES = int(os.getenv("CACHE_STRIPES", "16"))
+CACHE_L1_SYNC = float(os.getenv("CACHE_L1_SYNC", "0.5"))  # seconds between checks of the L2 change log
+CACHE_L2_RETRY = 5.0   # seconds L2 is bypassed after an error
+
+
+def sizeof(value):
+    """Approximate memory held by a cached value: payload bytes for strings, recursive for containers."""
+    if isinstance(value, (str, bytes, bytearray)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class _Stripe:
+    __slots__ = ("lock", "entries", "heap", "bytes", "hits", "misses", "evictions", "expirations", "rejected")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()   # key -> (value, size, expires_at), least recently used first
+        self.heap = []                 # (expires_at, key); stale items are skipped when popped
+        self.bytes = 0
+        # Counters live with the stripe so counting never takes a shared lock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+
+
+class StripedLRUCache:
+    """Thread-safe LRU with entry and byte limits, monotonic TTLs and counters."""
+
+    def __init__(self, max_entries=None, max_bytes=None, stripes=None):
+        self.max_entries = max_entries or CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or CACHE_MAX_BYTES
+        n = stripes or CACHE_STRIPES
+        self._stripes = [_Stripe() for _ in range(n)]
+        self._entry_limit = max(1, self.max_entries // n)
+        self._byte_limit = max(1, self.max_bytes // n)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # A thread in the parent may have held a stripe lock at fork time
+        for stripe in self._stripes:
+            stripe.lock = threading.Lock()
+
+    def _stripe(self, key):
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def get(self, key):
+        stripe = self._stripe(key)
+        now = time.monotonic()
+        with stripe.lock:
+            entry = stripe.entries.get(key)
+            if entry is not None and now >= entry[2]:
+                self._remove(stripe, key)
+                stripe.expirations += 1
+                entry = None
+            if entry is None:
+                stripe.misses += 1
+                return None
+            stripe.entries.move_to_end(key)
+            stripe.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl, size=None):
+        size = sizeof(value) if size is None else size
+        stripe = self._stripe(key)
+        now = time.monotonic()
+        if size > self._byte_limit:
+            # Would evict a whole stripe to hold one value; keep what's there instead
+            with stripe.lock:
+                if key in stripe.entries:
+                    self._remove(stripe, key)
+                stripe.rejected += 1
+            return False
+        expires_at = now + ttl
+        with stripe.lock:
+            stripe.expirations += self._expire(stripe, now)
+            if key in stripe.entries:
+                self._remove(stripe, key)
+            stripe.entries[key] = (value, size, expires_at)
+            stripe.bytes += size
+            heapq.heappush(stripe.heap, (expires_at, key))
+            while len(stripe.entries) > self._entry_limit or stripe.bytes > self._byte_limit:
+                _, (_, old_size, _) = stripe.entries.popitem(last=False)
+                stripe.bytes -= old_size
+                stripe.evictions += 1
+            if len(stripe.heap) > 2 * len(stripe.entries) + 64:
+                # Overwrites and evictions leave stale heap items; rebuild before they pile up
+                stripe.heap = [(exp, k) for k, (_, _, exp) in stripe.entries.items()]
+                heapq.heapify(stripe.heap)
+        return True
+
+    def delete(self, key):
+        stripe = self._stripe(key)
+        with stripe.lock:
+            if key in stripe.entries:
+                self._remove(stripe, key)
+
+    def clear(self):
+        for stripe in self._stripes:
+            with stripe.lock:
+                stripe.entries.clear()
+                stripe.heap.clear()
+                stripe.bytes = 0
+
+    def cleanup_expired(self):
+        """Drop every entry that is due now. Returns how many were dropped."""
+        now = time.monotonic()
+        total = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                dropped = self._expire(stripe, now)
+                stripe.expirations += dropped
+            total += dropped
+        return total
+
+    @staticmethod
+    def _remove(stripe, key):
+        _, size, _ = stripe.entries.pop(key)
+        stripe.bytes -= size
+
+    def _expire(self, stripe, now):
+        """Pop due heap items; a stale item (key gone or re-set with a later expiry) is skipped."""
+        dropped = 0
+        heap = stripe.heap
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            entry = stripe.entries.get(key)
+            if entry is not None and entry[2] == expires_at:
+                self._remove(stripe, key)
+                dropped += 1
+        return dropped
+
+    def __len__(self):
+        return sum(len(s.entries) for s in self._stripes)
+
+    def stats(self):
+        totals = dict.fromkeys(("hits", "misses", "evictions", "expirations", "rejected", "entries", "bytes"), 0)
+        for stripe in self._stripes:
+            with stripe.lock:
+                for name in ("hits", "misses", "evictions", "expirations", "rejected", "bytes"):
+                    totals[name] += getattr(stripe, name)
+                totals["entries"] += len(stripe.entries)
+        lookups = totals["hits"] + totals["misses"]
+        return {
+            **totals,
+            "hit_rate": round(totals["hits"] / lookups, 4) if lookups else 0.0,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "stripes": len(self._stripes),
+        }
+
+
+class TwoTierCache:
+    """
+    A per-process L1 (StripedLRUCache) in front of a shared L2 backend. The
+    L2 holds encoded values; the L1 holds live objects and is kept in step
+    with the L2's change log. With l2=None this is the L1 alone. An L2 error
+    never fails a cache call — the L1 carries on by itself for
+    CACHE_L2_RETRY seconds.
+    """
+
+    def __init__(self, l1, l2=None):
+        self.l1 = l1
+        self.l2 = l2
+        self._seen = None        # L2 version the L1 reflects; read on first use
+        self._own = set()        # versions written by this process, not to be replayed on its own L1
+        self._synced_at = 0.0
+        self._sync_lock = threading.Lock()
+        self._down_until = 0.0
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_writes = 0
+        self.l2_errors = 0
+        self.unencodable = 0
+        self.invalidated = 0
+        self.flushes = 0
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._sync_lock = threading.Lock()
+
+    def _usable(self):
+        return self.l2 is not None and time.monotonic() >= self._down_until
+
+    def _failed(self, operation, error):
+        self.l2_errors += 1
+        self._down_until = time.monotonic() + CACHE_L2_RETRY
+        log.warning(f"Cache L2 {operation} failed, using L1 only for {CACHE_L2_RETRY:.0f}s: {error}")
+
+    def _sync(self):
+        """Replay L2 changes made since the last look onto the L1; one thread at a time, at most every CACHE_L1_SYNC."""
+        now = time.monotonic()
+        if now - self._synced_at < CACHE_L1_SYNC or not self._usable():
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._synced_at = now
+            if self._seen is None:
+                self._seen = self.l2.version()
+                return
+            latest, changes = self.l2.changes_since(self._seen)
+            if changes is None:
+                # Too far behind to know what changed
+                self.l1.clear()
+                self.flushes += 1
+            else:
+                for version, key in changes:
+                    if version in self._own:
+                        continue
+                    if key is None:
+                        self.l1.clear()
+                        self.flushes += 1
+                    else:
+                        self.l1.delete(key)
+                        self.invalidated += 1
+            self._own = {v for v in self._own if v > latest}
+            self._seen = latest
+        except L2_ERRORS as e:
+            self._failed("sync", e)
+        finally:
+            self._sync_lock.release()
+
+    def _wrote(self, version):
+        self.l2_writes += 1
+        self._own.add(version)
+
+    def get(self, key):
+        self._sync()
+        value = self.l1.get(key)
+        if value is not None or not self._usable():
+            return value
+        try:
+            data = self.l2.get(key)
+        except L2_ERRORS as e:
+            self._failed("get", e)
+            return None
+        ttl = None
+        if data is not None:
+            try:
+                value, expires_at = decode(data)
+                ttl = expires_at - time.time()
+            except ValueError as e:
+                # Written by something else under our prefix; treat as a miss
+                log.warning(f"Cache L2 value for {key!r} ignored: {e}")
+        if ttl is None or ttl <= 0:
+            self.l2_misses += 1
+            return None
+        self.l2_hits += 1
+        self.l1.set(key, value, ttl)
+        return value
+
+    def set(self, key, value, ttl):
+        self.l1.set(key, value, ttl)
+        if not self._usable():
+            return
+        expires_at = time.time() + ttl
+        try:
+            data = encode(value, expires_at)
+        except ValueError:
+            # Not plain data: lives in this worker's L1 only, and whatever the L2 held for the
+            # key is now stale — drop it so no worker (or this one, after an eviction) serves it
+            self.unencodable += 1
+            self.delete_shared(key)
+            return
+        try:
+            self._wrote(self.l2.set(key, data, expires_at))
+        except L2_ERRORS as e:
+            self._failed("set", e)
+
+    def delete(self, key):
+        self.l1.delete(key)
+        self.delete_shared(key)
+
+    def delete_shared(self, key):
+        """Drop key from the L2; every other worker's L1 follows at its next sync."""
+        if self._usable():
+            try:
+                self._wrote(self.l2.delete(key))
+            except L2_ERRORS as e:
+                self._failed("delete", e)
+
+    def clear(self):
+        self.l1.clear()
+        if self._usable():
+            try:
+                self._wrote(self.l2.clear())
+            except L2_ERRORS as e:
+                self._failed("clear", e)
+
+    def cleanup_expired(self):
+        # The L2 drops its own expired entries
+        return self.l1.cleanup_expired()
+
+    def stats(self):
+        l2 = None
+        if self.l2 is not None:
+            lookups = self.l2_hits + self.l2_misses
+            l2 = {
+                "backend": self.l2.name,
+                "hits": self.l2_hits,
+                "misses": self.l2_misses,
+                "hit_rate": round(self.l2_hits / lookups, 4) if lookups else 0.0,
+                "writes": self.l2_writes,
+                "errors": self.l2_errors,
+                "unencodable": self.unencodable,
+                "available": self._usable(),
+                "version_seen": self._seen,
+                "invalidated": self.invalidated,
+                "l1_flushes": self.flushes,
+            }
+        return {**self.l1.stats(), "l2": l2}
+
+
+def _l2_backend():
+    try:
+        return backend_from_url()
+    except (ValueError, *L2_ERRORS) as e:
+        log.warning(f"Cache L2 unavailable ({CACHE_L2}), using L1 only: {e}")
+        return None
+
+
+_store = TwoTierCache(StripedLRUCache(), _l2_backend())
+
 
 class CacheManager:
-    """Simple in-memory cache manager (can be upgraded to Redis later)"""
-    
-    _cache = {}
-    _cache_timestamps = {}
-    
+    """Process-wide cache (bounded L1, shared L2 — see TwoTierCache)"""
+
     DEFAULT_TTL = 3600  # 1 hour in seconds
-    
+
     @staticmethod
     def get(key):
         """Get value from cache"""
-        if key in CacheManager._cache:
-            # Check if expired
-            if CacheManager._is_expired(key):
-                CacheManager.delete(key)
-                return None
-            return CacheManager._cache[key]
-        return None
-    
+        return _store.get(key)
+
     @staticmethod
     def set(key, value, ttl=None):
         """Set value in cache with TTL"""
         if ttl is None:
             ttl = CacheManager.DEFAULT_TTL
-        
-        CacheManager._cache[key] = value
-        CacheManager._cache_timestamps[key] = {
-            'created_at': datetime.utcnow(),
-            'ttl': ttl
-        }
-    
+        _store.set(key, value, ttl)
+
     @staticmethod
     def delete(key):
         """Delete key from cache"""
-        if key in CacheManager._cache:
-            del CacheManager._cache[key]
-        if key in CacheManager._cache_timestamps:
-            del CacheManager._cache_timestamps[key]
-    
+        _store.delete(key)
+
     @staticmethod
     def clear():
         """Clear all cache"""
-        CacheManager._cache.clear()
-        CacheManager._cache_timestamps.clear()
-    
-    @staticmethod
-    def _is_expired(key):
-        """Check if cache key is expired"""
-        if key not in CacheManager._cache_timestamps:
-            return True
-        
-        timestamp_data = CacheManager._cache_timestamps[key]
-        created_at = timestamp_data['created_at']
-        ttl = timestamp_data['ttl']
-        
-        expiry_time = created_at + timedelta(seconds=ttl)
-        return datetime.utcnow() > expiry_time
-    
+        _store.clear()
+
     @staticmethod
     def cleanup_expired():
         """Remove expired cache entries"""
-        expired_keys = [
-            key for key in CacheManager._cache.keys()
-            if CacheManager._is_expired(key)
-        ]
-        
-        for key in expired_keys:
-            CacheManager.delete(key)
-        
-        return len(expired_keys)
-    
+        return _store.cleanup_expired()
+
+    @staticmethod
+    def stats():
+        """L1 hit/miss/eviction counters and size, plus the L2's"""
+        return _store.stats()
+
     @staticmethod
     def generate_key(*args, **kwargs):
         """Generate cache key from arguments"""
@@ -88,18 +413,18 @@ def cached(ttl=None):
         def wrapper(*args, **kwargs):
             # Generate cache key
             cache_key = f"{func.__name__}:{CacheManager.generate_key(*args, **kwargs)}"
-            
+
             # Try to get from cache
             cached_result = CacheManager.get(cache_key)
             if cached_result is not None:
                 return cached_result
-            
+
             # Execute function
             result = func(*args, **kwargs)
-            
+
             # Store in cache
             CacheManager.set(cache_key, result, ttl)
-            
+
             return result
         return wrapper
     return decorator
@@ -0,0 +1,57 @@
+"""
+Near-duplicate block elimination for the scraped corpus
+The extractor keeps every element's innerText it hasn't seen verbatim, so a
+container repeats its children's text — joined with newlines (exact repeats
+of the child lines) or inline (one long line made of several children).
+This pass runs over all pages at once: exact repeats are dropped, then each
+remaining block is compared by word shingles against everything already
+kept, shortest first, and dropped when it is mostly contained in it.
+"""
+
+import os
+import re
+
+SHINGLE_WORDS = 5
+CONTAINMENT_THRESHOLD = float(os.getenv("DEDUP_CONTAINMENT", "0.8"))  # fraction of shingles already kept
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _shingles(words):
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def dedupe_pages(pages):
+    """
+    pages: [(url, text)] with one extracted block per line.
+    Returns [(url, text)] in the same order with duplicate and
+    near-duplicate blocks removed; pages left empty are dropped.
+    """
+    blocks = []     # (page index, line index, words)
+    seen = set()
+    for p, (_, text) in enumerate(pages):
+        for i, line in enumerate(text.splitlines()):
+            words = _WORD.findall(line.lower())
+            key = " ".join(words)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            blocks.append((p, i, words))
+
+    # Shortest first, so a container is checked after the children it repeats
+    kept_shingles = set()
+    keep = set()
+    for p, i, words in sorted(blocks, key=lambda b: len(b[2])):
+        if len(words) >= SHINGLE_WORDS:
+            shingles = _shingles(words)
+            if len(shingles & kept_shingles) >= CONTAINMENT_THRESHOLD * len(shingles):
+                continue
+            kept_shingles |= shingles
+        keep.add((p, i))
+
+    result = []
+    for p, (url, text) in enumerate(pages):
+        lines = [line for i, line in enumerate(text.splitlines()) if (p, i) in keep]
+        if lines:
+            result.append((url, "\n".join(lines)))
+    return result
@@ -1,11 +1,18 @@
 """
 Content Fetcher for everythinguganda.com (Next.js/React site)
-Uses Playwright with a single persistent browser session.
+Pages are fetched with pooled httpx and extracted from the server-rendered
+HTML and __NEXT_DATA__; Playwright (a single browser session with a small
+pool of concurrent pages) only renders pages where that yields too little.
 """
 
 import os
+import json
+import time
+import hashlib
 import concurrent.futures
 
+from services.content_dedup import dedupe_pages
+
 SITE_URLS = [
     "https://www.everythinguganda.com/",
     "https://www.everythinguganda.com/facts",
@@ -23,8 +30,9 @@ SITE_URLS = [
 
 
 def fetch_full_site(start_url="https://www.everythinguganda.com/"):
-    print("Starting Playwright site scrape...")
-    result = _playwright_fetch(SITE_URLS)
+    print("Starting site scrape...")
+    pages, _ = _refetch(SITE_URLS, {})
+    result = _assemble([(url, pages[url][1]) for url in SITE_URLS if pages[url][1]])
     if result and len(result) > 1000:
         print(f"Scrape complete: {len(result):,} chars")
         return result
@@ -34,6 +42,17 @@ def fetch_full_site(start_url="https://www.everythinguganda.com/"):
 
 def _playwright_fetch(urls):
     """Run Playwright in a dedicated thread — Linux/Windows safe."""
+    try:
+        return _run_isolated(lambda: _scrape(urls))
+    except Exception as e:
+        print(f"Playwright fetch error: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def _run_isolated(make_coro, timeout=600):
+    """Run a coroutine on a fresh event loop in its own thread and return its result."""
     def run():
         import asyncio
         # ProactorEventLoop is Windows-only — use SelectorEventLoop on Linux
@@ -43,111 +62,429 @@ def _playwright_fetch(urls):
             loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         try:
-            return loop.run_until_complete(_scrape(urls))
+            return loop.run_until_complete(make_coro())
         finally:
             loop.close()
 
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(run).result(timeout=timeout)
+
+
+# Pages rendered concurrently in the one browser context
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "4"))
+# Readiness replaces the old fixed 5s sleep — see _wait_ready
+READY_SELECTOR = os.getenv("SCRAPE_READY_SELECTOR", "main, article, h1")
+READY_TIMEOUT = float(os.getenv("SCRAPE_READY_TIMEOUT", "8"))  # seconds
+READY_POLL = 0.25          # seconds between text-length polls
+READY_STABLE_POLLS = 4     # unchanged polls that count as settled while the network is still busy
+
+LAUNCH_ARGS = [
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-web-security",
+    "--disable-features=VizDisplayCompositor",
+    "--disable-extensions",
+    "--no-first-run",
+]
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+# Extract all meaningful text via JS
+EXTRACT_JS = """() => {
+    // Remove noise elements
+    ['script','style','noscript','nav','footer','header',
+     'iframe','svg','img'].forEach(tag => {
+        document.querySelectorAll(tag).forEach(el => el.remove());
+    });
+
+    // Collect text from content elements
+    const tags = ['h1','h2','h3','h4','h5','p','li',
+                  'td','th','span','div','article',
+                  'section','main','blockquote'];
+    const seen = new Set();
+    const lines = [];
+
+    tags.forEach(tag => {
+        document.querySelectorAll(tag).forEach(el => {
+            const t = (el.innerText || '').trim();
+            if (t.length > 15 && !seen.has(t)) {
+                seen.add(t);
+                lines.push(t);
+            }
+        });
+    });
+    return lines.join('\\n');
+}"""
+
+_TEXT_LENGTH_JS = "() => document.body ? document.body.innerText.length : 0"
+
+
+async def _wait_ready(page, timeout=None):
+    """
+    Wait until the page has rendered its content instead of sleeping a fixed
+    5s. After the content selector appears (or half the timeout passes), the
+    page is ready once the network is quiet and body text length held for a
+    poll, or text length held for READY_STABLE_POLLS polls (sites whose
+    analytics never let the network go quiet). Returns the reason.
+    """
+    import asyncio
+
+    timeout = READY_TIMEOUT if timeout is None else timeout
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+
+    idle = asyncio.ensure_future(page.wait_for_load_state("networkidle", timeout=timeout * 1000))
     try:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
-            return pool.submit(run).result(timeout=600)
-    except Exception as e:
-        print(f"Playwright fetch error: {e}")
-        import traceback
-        traceback.print_exc()
+        try:
+            await page.wait_for_selector(READY_SELECTOR, state="attached", timeout=timeout * 500)
+        except Exception:
+            pass  # no matching element — rely on text stability
+
+        last, stable = -1, 0
+        while loop.time() < deadline:
+            length = await page.evaluate(_TEXT_LENGTH_JS)
+            if length and length == last:
+                stable += 1
+            else:
+                last, stable = length, 0
+            quiet = idle.done() and not idle.cancelled() and idle.exception() is None
+            if quiet and stable >= 1:
+                return "networkidle"
+            if stable >= READY_STABLE_POLLS:
+                return "stable"
+            await asyncio.sleep(READY_POLL)
+        return "timeout"
+    finally:
+        idle.cancel()
+        try:
+            await idle
+        except BaseException:
+            pass
+
+
+async def _scrape_page(page, url):
+    """Render one URL in an existing page. Returns (text, timings dict)."""
+    t0 = time.perf_counter()
+    await page.goto(url, timeout=90000, wait_until="domcontentloaded")
+    t_loaded = time.perf_counter()
+    reason = await _wait_ready(page)
+    t_ready = time.perf_counter()
+    content = await page.evaluate(EXTRACT_JS)
+    t_done = time.perf_counter()
+    return content, {
+        "goto_ms": (t_loaded - t0) * 1000,
+        "ready_ms": (t_ready - t_loaded) * 1000,
+        "ready": reason,
+        "extract_ms": (t_done - t_ready) * 1000,
+        "total_ms": (t_done - t0) * 1000,
+    }
+
+
+def _page_block(url, text):
+    return f"\n--- CONTENT FROM {url} ---\n{text}"
+
+
+def _assemble(pages):
+    """Corpus from [(url, text)] after removing blocks repeated within and across pages."""
+    before = sum(len(text) for _, text in pages)
+    pages = dedupe_pages(pages)
+    after = sum(len(text) for _, text in pages)
+    if before:
+        print(f"Dedup: {before:,} -> {after:,} chars ({100 - after * 100 / before:.0f}% removed)")
+    return "\n".join(_page_block(url, text) for url, text in pages)
+
+
+async def _scrape(urls, concurrency=None):
+    texts = await _scrape_pages(urls, concurrency)
+    all_text = [_page_block(url, text) for url, text in zip(urls, texts) if text]
+    if not all_text:
         return None
 
+    return "\n".join(all_text)
+
 
-async def _scrape(urls):
+async def _scrape_pages(urls, concurrency=None):
+    """Render urls with a pool of pages. Returns extracted text per URL, in order (None where it failed)."""
+    import asyncio
     from playwright.async_api import async_playwright
 
-    all_text = []
+    concurrency = max(1, min(concurrency or SCRAPE_CONCURRENCY, len(urls)))
+    results = [None] * len(urls)
+    pending = asyncio.Queue()
+    for i, url in enumerate(urls):
+        pending.put_nowait((i, url))
 
+    async def worker(context):
+        # Each worker owns one page and reuses it for every URL it takes
+        page = await context.new_page()
+        try:
+            while True:
+                try:
+                    i, url = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    content, t = await _scrape_page(page, url)
+                except Exception as e:
+                    print(f"  Failed {url}: {e}")
+                    continue
+                chars = len(content) if content else 0
+                print(f"  {url} | {chars:,} chars | total={t['total_ms']:.0f}ms "
+                      f"goto={t['goto_ms']:.0f}ms ready={t['ready_ms']:.0f}ms ({t['ready']}) "
+                      f"extract={t['extract_ms']:.0f}ms")
+                if content and len(content) > 100:
+                    results[i] = content
+        finally:
+            try:
+                await page.close()
+            except Exception:
+                pass
+
+    t0 = time.perf_counter()
     async with async_playwright() as p:
         # Single browser for all URLs — avoids repeated launch overhead
-        browser = await p.chromium.launch(
-            headless=True,
-            args=[
-                "--no-sandbox",
-                "--disable-dev-shm-usage",
-                "--disable-gpu",
-                "--disable-web-security",
-                "--disable-features=VizDisplayCompositor",
-                "--disable-extensions",
-                "--no-first-run",
-            ]
-        )
-
+        browser = await p.chromium.launch(headless=True, args=LAUNCH_ARGS)
         context = await browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            ),
+            user_agent=USER_AGENT,
             viewport={"width": 1280, "height": 800},
             ignore_https_errors=True,
         )
+        print(f"Fetching {len(urls)} pages with {concurrency} concurrent pages")
+        await asyncio.gather(*(worker(context) for _ in range(concurrency)))
+        await browser.close()
 
-        for url in urls:
-            page = None
-            try:
-                print(f"Fetching: {url}")
-                page = await context.new_page()
-
-                # Use 'load' — faster than networkidle, works on Next.js
-                await page.goto(url, timeout=90000, wait_until="load")
-
-                # Wait for React to hydrate
-                await page.wait_for_timeout(5000)
-
-                # Extract all meaningful text via JS
-                content = await page.evaluate("""() => {
-                    // Remove noise elements
-                    ['script','style','noscript','nav','footer','header',
-                     'iframe','svg','img'].forEach(tag => {
-                        document.querySelectorAll(tag).forEach(el => el.remove());
-                    });
-
-                    // Collect text from content elements
-                    const tags = ['h1','h2','h3','h4','h5','p','li',
-                                  'td','th','span','div','article',
-                                  'section','main','blockquote'];
-                    const seen = new Set();
-                    const lines = [];
-
-                    tags.forEach(tag => {
-                        document.querySelectorAll(tag).forEach(el => {
-                            const t = (el.innerText || '').trim();
-                            if (t.length > 15 && !seen.has(t)) {
-                                seen.add(t);
-                                lines.push(t);
-                            }
-                        });
-                    });
-                    return lines.join('\\n');
-                }""")
+    print(f"Scraped {sum(1 for r in results if r)}/{len(urls)} pages in {time.perf_counter() - t0:.1f}s")
+    return results
 
-                await page.close()
 
-                if content and len(content) > 100:
-                    all_text.append(f"\n--- CONTENT FROM {url} ---\n{content}")
-                    print(f"  Got {len(content):,} chars")
-                else:
-                    print(f"  Only {len(content) if content else 0} chars")
+# Per-URL refresh state: url -> {etag, last_modified, html_hash, text_hash, fetched_at, rendered_at, source, text}
+PAGE_STATE_PATH = os.getenv("CONTENT_PAGE_STATE_PATH", "content_pages.json")
+PROBE_TIMEOUT = float(os.getenv("SCRAPE_PROBE_TIMEOUT", "20"))  # seconds per conditional GET
+# Browser-rendered pages serve a static shell whose validators never change; re-render them past this age
+RENDER_MAX_AGE = float(os.getenv("SCRAPE_RENDER_MAX_AGE", str(24 * 3600)))  # seconds
+
+
+def load_page_state(path=None):
+    try:
+        with open(path or PAGE_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_page_state(state, path=None):
+    path = path or PAGE_STATE_PATH
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _digest(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha1(data).hexdigest()
+
+
+# Fast path: text from the server-rendered HTML and __NEXT_DATA__, no browser
+FAST_PATH = os.getenv("SCRAPE_FAST_PATH", "1") != "0"
+FAST_MIN_CHARS = int(os.getenv("SCRAPE_FAST_MIN_CHARS", "800"))  # below this, render with Playwright
+
+_NOISE_TAGS = ["script", "style", "noscript", "nav", "footer", "header", "iframe", "svg", "img"]
+# __NEXT_DATA__ keys that never hold page copy
+_NEXT_DATA_SKIP = frozenset("""
+id _id __typename slug url href src image images icon alt key locale locales buildId
+createdAt updatedAt publishedAt date type variant className style color
+""".split())
+
+
+def _next_data_text(raw, lines, seen):
+    """Collect prose strings from the __NEXT_DATA__ page props (CMS rich text is stripped of markup)."""
+    from bs4 import BeautifulSoup
+
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return
+    stack = [data.get("props", {}).get("pageProps", data)]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend(v for k, v in reversed(list(node.items())) if k not in _NEXT_DATA_SKIP)
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, str):
+            text = node.strip()
+            if "<" in text and ">" in text:
+                text = BeautifulSoup(text, "html.parser").get_text(" ", strip=True)
+            # Same length floor as EXTRACT_JS; skip identifiers and paths
+            if len(text) > 15 and " " in text and not text.startswith(("http", "/")) and text not in seen:
+                seen.add(text)
+                lines.append(text)
+
 
+def extract_html(html):
+    """
+    Page text without a browser: the server-rendered body text, then any
+    prose in __NEXT_DATA__ that isn't already on the page. Mirrors
+    EXTRACT_JS — noise tags dropped, lines over 15 chars, de-duplicated.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    next_data = soup.find("script", id="__NEXT_DATA__")
+    raw = next_data.string if next_data else None
+    for tag in soup(_NOISE_TAGS):
+        tag.decompose()
+
+    lines, seen = [], set()
+    body = soup.body or soup
+    for line in body.get_text("\n").splitlines():
+        line = line.strip()
+        if len(line) > 15 and line not in seen:
+            seen.add(line)
+            lines.append(line)
+    if raw:
+        _next_data_text(raw, lines, seen)
+    return "\n".join(lines)
+
+
+async def _probe(urls, state):
+    """
+    Conditional GET per URL with the stored ETag/Last-Modified, on one pooled
+    httpx client. Returns {url: (validators, text, needs_render)}. A 304, or
+    a 200 whose HTML is byte-identical to last time, keeps the stored text
+    (text None). Changed HTML is extracted on the fast path; only pages where
+    that yields under FAST_MIN_CHARS (or that failed) need Playwright. A page
+    whose text came from the browser is re-rendered once its rendered_at is
+    RENDER_MAX_AGE old, whatever the validators say — they only describe the
+    shell.
+    """
+    import asyncio
+    import httpx
+
+    now = time.time()
+
+    def stale_render(prev):
+        return prev.get("source") == "browser" and now - prev.get("rendered_at", 0) >= RENDER_MAX_AGE
+
+    async def probe(client, url):
+        prev = state.get(url) or {}
+        headers = {}
+        if prev.get("etag"):
+            headers["If-None-Match"] = prev["etag"]
+        if prev.get("last_modified"):
+            headers["If-Modified-Since"] = prev["last_modified"]
+        try:
+            r = await client.get(url, headers=headers)
+        except Exception as e:
+            print(f"  Probe failed {url}: {e}")
+            return url, ({}, None, True)
+        if r.status_code == 304:
+            return url, ({}, None, not prev.get("text") or stale_render(prev))
+        if r.status_code != 200:
+            return url, ({}, None, True)
+        validators = {
+            "etag": r.headers.get("etag"),
+            "last_modified": r.headers.get("last-modified"),
+            "html_hash": _digest(r.content),
+        }
+        if prev.get("text") and validators["html_hash"] == prev.get("html_hash"):
+            return url, (validators, None, stale_render(prev))
+        if FAST_PATH:
+            try:
+                text = await asyncio.to_thread(extract_html, r.text)
             except Exception as e:
-                print(f"  Failed {url}: {e}")
-                if page:
-                    try:
-                        await page.close()
-                    except Exception:
-                        pass
+                print(f"  Fast extract failed {url}: {e}")
+                text = ""
+            if len(text) >= FAST_MIN_CHARS:
+                print(f"  {url} | {len(text):,} chars | fast path")
+                return url, (validators, text, False)
+        return url, (validators, None, True)
 
-        await browser.close()
+    limits = httpx.Limits(max_connections=SCRAPE_CONCURRENCY * 2, max_keepalive_connections=SCRAPE_CONCURRENCY * 2)
+    async with httpx.AsyncClient(headers={"User-Agent": USER_AGENT}, timeout=PROBE_TIMEOUT,
+                                 follow_redirects=True, limits=limits) as client:
+        return dict(await asyncio.gather(*(probe(client, url) for url in urls)))
 
-    if not all_text:
-        return None
 
-    return "\n".join(all_text)
+def _refetch(urls, state):
+    """
+    Fast path for every URL, Playwright for the pages it couldn't handle.
+    Returns ({url: (validators, text, source)}, rendered count). source is
+    "http", "browser", "unchanged" (text None) or "failed" (text None).
+    """
+    try:
+        probes = _run_isolated(lambda: _probe(urls, state))
+    except Exception as e:
+        print(f"Probe error, rendering every page: {e}")
+        probes = {url: ({}, None, True) for url in urls}
+
+    to_render = [url for url in urls if probes[url][2]]
+    rendered = {}
+    if to_render:
+        try:
+            rendered = dict(zip(to_render, _run_isolated(lambda: _scrape_pages(to_render))))
+        except Exception as e:
+            print(f"Playwright fetch error: {e}")
+
+    pages = {}
+    for url in urls:
+        validators, text, needs_render = probes[url]
+        if needs_render:
+            text = rendered.get(url)
+            pages[url] = (validators, text, "browser" if text else "failed")
+        else:
+            pages[url] = (validators, text, "http" if text else "unchanged")
+    return pages, len(to_render)
+
+
+def fetch_site_incremental(urls=None, state_path=None):
+    """
+    Refresh the corpus page by page: pages whose conditional GET says they
+    changed are re-extracted (fast path first, Playwright only if needed),
+    the rest keep the text stored in the page state. Returns (content,
+    changed) where changed holds the URLs whose text differs from the
+    previous refresh.
+    """
+    urls = list(urls or SITE_URLS)
+    state = load_page_state(state_path)
+    t0 = time.perf_counter()
+    pages, rendered = _refetch(urls, state)
+
+    now = time.time()
+    changed = set()
+    new_state = {}
+    for url in urls:
+        entry = dict(state.get(url) or {})
+        validators, text, source = pages[url]
+        if source == "failed":
+            # Keep the previous text and validators so the page is retried next time
+            if entry:
+                new_state[url] = entry
+            continue
+        entry.update(validators)
+        entry["fetched_at"] = now
+        if text:
+            text_hash = _digest(text)
+            if text_hash != entry.get("text_hash"):
+                changed.add(url)
+            entry.update(text=text, text_hash=text_hash, rendered_at=now, source=source)
+        new_state[url] = entry
+    changed |= set(state) - set(new_state)
+    save_page_state(new_state, state_path)
+
+    # Page state keeps the raw text; dedup runs over the whole corpus every time
+    content = _assemble([(url, new_state[url]["text"]) for url in urls if new_state.get(url, {}).get("text")])
+    fast = sum(1 for p in pages.values() if p[2] == "http")
+    print(f"Incremental scrape: {fast} fast path, {rendered} rendered, {len(changed)} changed of "
+          f"{len(urls)} pages, {len(content):,} chars in {time.perf_counter() - t0:.1f}s")
+    return content, changed
 
 
 # Legacy compatibility
@@ -0,0 +1,245 @@
+"""
+Passage index over scraped site content
+Chunks the corpus by page marker and heading, then ranks passages with BM25
+so prompts only carry the parts of the site that answer the question.
+Passages are byte ranges into the SiteContent (the mapped snapshot) plus
+their term counts; only the passages a prompt uses are decoded.
+"""
+
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+from services.content_snapshot import SiteContent
+
+# Character budget for the company content pasted into a prompt
+RETRIEVAL_CHAR_BUDGET = int(os.getenv("RETRIEVAL_CHAR_BUDGET", "12000"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "12"))
+
+_PAGE_MARKER = re.compile(rb"^--- CONTENT FROM (\S+) ---$", re.MULTILINE)
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+_STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i in is it
+its me my of on or our so tell that the their there these this to was what
+when where which who why will with you your about any some
+""".split())
+
+
+def _tokenize(text):
+    tokens = []
+    for tok in _TOKEN.findall(text.lower()):
+        if tok in _STOPWORDS or len(tok) < 2:
+            continue
+        # Cheap plural folding — "lodges" and "lodge" should meet in the index
+        if len(tok) > 4 and tok.endswith("s") and not tok.endswith("ss"):
+            tok = tok[:-1]
+        tokens.append(tok)
+    return tokens
+
+
+def _is_heading(line):
+    """Short line without sentence punctuation — h1-h5 text in the innerText dump."""
+    return 3 <= len(line) <= 80 and line[-1] not in ".!?,;:" and not line.startswith("---")
+
+
+def page_ranges(content):
+    """Byte ranges [(url, start, end)] of the page bodies in a SiteContent, split on the CONTENT FROM markers."""
+    if not content:
+        return []
+    matches = list(_PAGE_MARKER.finditer(content.data))
+    if not matches:
+        return [(None, 0, len(content))]
+
+    pages = []
+    if content.slice(0, matches[0].start()).strip():
+        pages.append((None, 0, matches[0].start()))
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+        pages.append((m.group(1).decode("utf-8"), m.end(), end))
+    return pages
+
+
+def split_pages(text):
+    """Split a scraped corpus (a str) into [(url, body)] using the CONTENT FROM markers."""
+    content = SiteContent.from_text(text)
+    return [(url, content.slice(start, end).strip()) for url, start, end in page_ranges(content)]
+
+
+def chunk_passages(content, max_chars=800):
+    """
+    Chunk a SiteContent into passages. A new passage starts at every
+    heading-like line and whenever the current one would exceed max_chars.
+    Returns a list of dicts: url, heading, the passage's byte range (start,
+    end) and its page's (page_start), size (characters of passage_text())
+    and term counts — the text itself stays in the content.
+    """
+    passages = []
+    for url, start, end in page_ranges(content):
+        passages.extend(_chunk_page(content, url, start, end, max_chars))
+    return passages
+
+
+def _chunk_page(content, url, page_start, page_end, max_chars=800):
+    passages = []
+    heading = None
+    buf = []
+    size = 0
+    has_body = False
+    first = last = page_start   # byte range of the lines in buf
+
+    def flush():
+        if buf:
+            text = "\n".join(buf)
+            passages.append({"url": url, "heading": heading, "start": first, "end": last,
+                             "page_start": page_start, "size": len(text), "terms": Counter(_tokenize(text))})
+
+    offset = page_start
+    for raw in bytes(content.data[page_start:page_end]).split(b"\n"):
+        line_start, offset = offset, offset + len(raw) + 1
+        line = raw.decode("utf-8").strip()
+        if not line:
+            continue
+        if _is_heading(line) and has_body:
+            # Heading after body text starts a new passage
+            flush()
+            heading, buf, size, has_body = line, [], 0, False
+        elif size + len(line) > max_chars and buf:
+            flush()
+            buf, size, has_body = [], 0, False
+        if heading is None and _is_heading(line):
+            heading = line
+        if not buf:
+            first = line_start
+        buf.append(line)
+        last = line_start + len(raw)
+        size += len(line) + 1
+        has_body = has_body or not _is_heading(line)
+    flush()
+    return passages
+
+
+def passage_text(content, passage):
+    """A passage's lines from the content, stripped, blank ones dropped."""
+    raw = content.slice(passage["start"], passage["end"])
+    return "\n".join(line.strip() for line in raw.split("\n") if line.strip())
+
+
+def changed_pages(old_content, new_content):
+    """URLs whose page body differs between two SiteContents (added and removed pages included)."""
+    old = {url: (start, end) for url, start, end in page_ranges(old_content)}
+    new = {url: (start, end) for url, start, end in page_ranges(new_content)}
+    changed = set()
+    for url in old.keys() | new.keys():
+        if url not in old or url not in new:
+            changed.add(url)
+        elif old_content.data[slice(*old[url])] != new_content.data[slice(*new[url])]:
+            changed.add(url)
+    return changed
+
+
+class ContentIndex:
+    """BM25 inverted index over the passages of one SiteContent"""
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, content, passages):
+        self.content = content
+        self.passages = passages
+        self._postings = defaultdict(list)   # term -> [(passage_id, tf)]
+        self._lengths = []
+        for pid, p in enumerate(passages):
+            terms = p["terms"]
+            self._lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self._postings[term].append((pid, tf))
+        self._avg_len = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+    @classmethod
+    def build(cls, content):
+        return cls(content, chunk_passages(content))
+
+    def update(self, content, changed_urls):
+        """
+        Index for a new SiteContent in which only the pages in changed_urls
+        differ. Passages of the other pages are reused with their byte ranges
+        moved to where the page now starts, so only changed pages are
+        re-chunked and re-tokenized.
+        """
+        by_url = defaultdict(list)
+        for p in self.passages:
+            by_url[p["url"]].append(p)
+        passages = []
+        for url, start, end in page_ranges(content):
+            if url in changed_urls or url not in by_url:
+                passages.extend(_chunk_page(content, url, start, end))
+                continue
+            for p in by_url[url]:
+                shift = start - p["page_start"]
+                passages.append({**p, "start": p["start"] + shift, "end": p["end"] + shift, "page_start": start})
+        return ContentIndex(content, passages)
+
+    def __len__(self):
+        return len(self.passages)
+
+    def _idf(self, term):
+        n = len(self.passages)
+        df = len(self._postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query, k=RETRIEVAL_TOP_K):
+        """Return [(passage_id, score)] for the top-k passages, best first."""
+        if not self.passages:
+            return []
+        scores = defaultdict(float)
+        for term in set(_tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for pid, tf in postings:
+                norm = self.K1 * (1 - self.B + self.B * self._lengths[pid] / self._avg_len)
+                scores[pid] += idf * tf * (self.K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+    def build_context(self, query, char_budget=RETRIEVAL_CHAR_BUDGET, k=RETRIEVAL_TOP_K):
+        """
+        Pack the best passages for `query` into at most char_budget characters,
+        grouped by source page in corpus order. Returns "" when nothing matches.
+        """
+        chosen = []
+        used = 0
+        for pid, _ in self.search(query, k):
+            size = self.passages[pid]["size"] + 1
+            if used + size > char_budget:
+                continue
+            chosen.append(pid)
+            used += size
+        if not chosen:
+            return ""
+
+        parts = []
+        current_url = object()
+        for pid in sorted(chosen):
+            p = self.passages[pid]
+            if p["url"] != current_url:
+                current_url = p["url"]
+                if current_url:
+                    parts.append(f"\n--- CONTENT FROM {current_url} ---")
+            parts.append(passage_text(self.content, p))
+        return "\n".join(parts).strip()
+
+
+def select_context(index, content, question, char_budget=RETRIEVAL_CHAR_BUDGET):
+    """
+    Company content for a prompt (content is a SiteContent): top BM25
+    passages when the index has hits, otherwise the leading slice of the
+    corpus (the previous behaviour).
+    """
+    if index is not None and len(index):
+        context = index.build_context(question, char_budget)
+        if context:
+            return context
+    return content.head(char_budget) if content else ""
@@ -0,0 +1,86 @@
+"""
+Scheduled content refresh
+One thread per worker. It maps new snapshot generations as soon as another
+process publishes them (so idle workers switch without waiting for a
+request), and every CONTENT_REFRESH_INTERVAL ± jitter it tries a refresh.
+Only the worker that takes the host-wide loader lock scrapes; the others
+skip that round and pick up its generation on their next poll.
+"""
+
+import os
+import random
+import threading
+import time
+
+from logger import get_logger
+
+log = get_logger("content_scheduler")
+
+REFRESH_INTERVAL = float(os.getenv("CONTENT_REFRESH_INTERVAL", str(6 * 3600)))  # seconds, 0 disables
+REFRESH_JITTER = float(os.getenv("CONTENT_REFRESH_JITTER", "0.1"))  # ± fraction of the interval
+POLL_INTERVAL = float(os.getenv("CONTENT_POLL_INTERVAL", "5"))  # seconds between generation checks
+
+
+class RefreshScheduler:
+    """
+    refresh() runs one scheduled refresh attempt; poll() installs a newer
+    generation if one was published. Both are called from the scheduler
+    thread only and must not raise for expected failures.
+    """
+
+    def __init__(self, refresh, poll, interval=None, jitter=None, poll_interval=None):
+        self.refresh = refresh
+        self.poll = poll
+        self.interval = REFRESH_INTERVAL if interval is None else interval
+        self.jitter = REFRESH_JITTER if jitter is None else jitter
+        self.poll_interval = poll_interval or POLL_INTERVAL
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._next_at = None
+        self.attempts = 0
+
+    def ensure_started(self):
+        # gunicorn --preload forks after import: threads don't survive, so track the pid
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._schedule()
+            self._thread = threading.Thread(target=self._run, name="content-refresh-scheduler", daemon=True)
+            self._thread.start()
+
+    def _schedule(self):
+        if self.interval <= 0:
+            self._next_at = None
+            return
+        # Jitter keeps workers (and hosts) that started together from waking in lockstep
+        delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+        self._next_at = time.monotonic() + delay
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except Exception as e:
+                log.error(f"Snapshot poll failed: {e}", exc_info=True)
+            if self._next_at is None or time.monotonic() < self._next_at:
+                continue
+            self.attempts += 1
+            try:
+                self.refresh()
+            except Exception as e:
+                log.error(f"Scheduled content refresh failed: {e}", exc_info=True)
+            self._schedule()
+
+    def stats(self):
+        return {
+            "running": self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+            "interval_s": self.interval,
+            "jitter": self.jitter,
+            "next_refresh_in_s": round(self._next_at - time.monotonic(), 1) if self._next_at else None,
+            "attempts": self.attempts,
+        }
@@ -0,0 +1,239 @@
+"""
+Versioned on-disk content snapshot shared by every worker on the host
+One process (whoever takes the loader lock) scrapes and writes the snapshot
+atomically (temp file + os.replace); every worker maps it read-only and
+picks up a new generation by checking the file header, so the site is
+scraped once per host instead of once per worker. Workers read the text
+through SiteContent, which decodes only the slices a request needs, so the
+corpus itself lives once in the page cache rather than once per worker.
+
+File layout: 48-byte header (magic, generation, created_at, content length,
+content version) followed by the UTF-8 content.
+"""
+
+import contextlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from services.answer_cache import content_version
+from logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines run a single process
+    fcntl = None
+
+log = get_logger("content_snapshot")
+
+SNAPSHOT_PATH = os.getenv("CONTENT_SNAPSHOT_PATH", "content_snapshot.bin")
+SNAPSHOT_MAX_AGE = float(os.getenv("CONTENT_SNAPSHOT_MAX_AGE", str(6 * 3600)))  # seconds before startup re-scrapes
+SNAPSHOT_WAIT = float(os.getenv("CONTENT_SNAPSHOT_WAIT", "600"))  # seconds to wait on another process's load
+CHECK_INTERVAL = 1.0  # seconds between generation checks
+
+_MAGIC = b"NAMBISN1"
+_HEADER = struct.Struct("<8sQdQ16s")  # magic, generation, created_at, length, version
+
+
+class SiteContent:
+    """
+    Site text read in place from a snapshot mapping (or from bytes, for
+    content that never went through one). Offsets are UTF-8 byte offsets;
+    only the slices asked for are decoded, so holding one is not holding a
+    copy of the corpus.
+    """
+
+    def __init__(self, data, version):
+        self.data = memoryview(data)
+        self.version = version
+
+    @classmethod
+    def from_text(cls, text):
+        text = text or ""
+        return cls(text.encode("utf-8"), content_version(text))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __bool__(self):
+        return len(self.data) > 0
+
+    def slice(self, start, end):
+        """Text between two byte offsets on line boundaries."""
+        return str(self.data[start:end], "utf-8")
+
+    def head(self, chars):
+        """The first `chars` characters."""
+        return str(self.data[:chars * 4], "utf-8", "ignore")[:chars]
+
+    def text(self):
+        """The whole corpus as a str — a private copy, for diagnostics only."""
+        return str(self.data, "utf-8")
+
+
+class Snapshot:
+    """
+    One mapped generation of the content file. The mapping is never closed
+    explicitly: it is unmapped once the last SiteContent reading from it (a
+    request still using an older generation) is gone.
+    """
+
+    def __init__(self, mm, generation, created_at, length, version):
+        self._mm = mm
+        self.generation = generation
+        self.created_at = created_at
+        self.length = length
+        self.version = version
+
+    def content(self):
+        return SiteContent(memoryview(self._mm)[_HEADER.size:_HEADER.size + self.length], self.version)
+
+    def age(self):
+        return time.time() - self.created_at
+
+
+def _read_header(f):
+    raw = f.read(_HEADER.size)
+    if len(raw) < _HEADER.size:
+        return None
+    magic, generation, created_at, length, version = _HEADER.unpack(raw)
+    if magic != _MAGIC:
+        return None
+    return generation, created_at, length, version.decode("ascii")
+
+
+def read_header(path=None):
+    """(generation, created_at, length, version) of the snapshot on disk, or None."""
+    try:
+        with open(path or SNAPSHOT_PATH, "rb") as f:
+            return _read_header(f)
+    except OSError:
+        return None
+
+
+def read_generation(path=None):
+    """Generation of the snapshot on disk, 0 if none."""
+    header = read_header(path)
+    return header[0] if header else 0
+
+
+def write_refresh_status(status, path=None):
+    """Record the outcome of the last refresh next to the snapshot, for every worker to report."""
+    status_path = (path or SNAPSHOT_PATH) + ".status.json"
+    tmp = f"{status_path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(status, f)
+    os.replace(tmp, status_path)
+
+
+def read_refresh_status(path=None):
+    try:
+        with open((path or SNAPSHOT_PATH) + ".status.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def open_snapshot(path=None):
+    """Map the current snapshot read-only. None if there isn't a valid one."""
+    path = path or SNAPSHOT_PATH
+    try:
+        with open(path, "rb") as f:
+            header = _read_header(f)
+            if header is None:
+                return None
+            generation, created_at, length, version = header
+            if os.fstat(f.fileno()).st_size < _HEADER.size + length:
+                return None
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    return Snapshot(mm, generation, created_at, length, version)
+
+
+def write_snapshot(content, path=None):
+    """Atomically publish content as the next generation. Returns the new generation."""
+    path = path or SNAPSHOT_PATH
+    data = (content or "").encode("utf-8")
+    generation = read_generation(path) + 1
+    header = _HEADER.pack(_MAGIC, generation, time.time(), len(data),
+                          content_version(content).encode("ascii"))
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    log.info(f"Content snapshot written | generation={generation} | {len(data):,} bytes")
+    return generation
+
+
+@contextlib.contextmanager
+def loader_lock(path=None, blocking=False):
+    """
+    Host-wide lock around scraping. Yields True if this process holds it,
+    False if another process is already loading (non-blocking mode).
+    """
+    lock_path = (path or SNAPSHOT_PATH) + ".lock"
+    if fcntl is None:
+        yield True
+        return
+    with open(lock_path, "a+") as f:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(f.fileno(), flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def wait_for_generation(after, timeout=None, path=None):
+    """Poll until a snapshot newer than `after` exists. Returns it, or None on timeout."""
+    deadline = time.monotonic() + (SNAPSHOT_WAIT if timeout is None else timeout)
+    while time.monotonic() < deadline:
+        if read_generation(path) > after:
+            return open_snapshot(path)
+        time.sleep(0.5)
+    return None
+
+
+class SnapshotWatcher:
+    """Per-process view of the shared snapshot; maps a new generation when one appears."""
+
+    def __init__(self, path=None):
+        self.path = path or SNAPSHOT_PATH
+        self.snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self):
+        return self.snapshot.generation if self.snapshot else 0
+
+    def poll(self, force=False):
+        """Return a newly mapped Snapshot if the generation on disk moved, else None."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < CHECK_INTERVAL:
+            return None
+        with self._lock:
+            self._checked_at = now
+            if read_generation(self.path) <= self.generation:
+                return None
+            snapshot = open_snapshot(self.path)
+            if snapshot is None or snapshot.generation <= self.generation:
+                return None
+            self.snapshot = snapshot
+            return snapshot
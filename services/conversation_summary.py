@@ -0,0 +1,171 @@
+"""
+Rolling conversation summary
+Multi-turn prompts carry a short summary of the older messages plus the
+most recent ones verbatim. Every SUMMARY_EVERY messages, the oldest raw
+messages are folded into Conversation.summary with one Gemini call, so the
+prompt size stays bounded however long the session runs. The boundary is
+the id of the last folded message (Conversation.summary_through_id).
+
+The fold never runs on the request path: a request that finds one due
+hands it to a background thread (schedule_fold) and goes ahead with the
+current summary and the unsummarized tail. The fold's Gemini call is low
+priority, admitted only while the bucket has spare capacity; when it is
+deferred, a later turn schedules it again.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from extensions import db
+from models.conversation import Conversation
+from models.message import Message
+from logger import get_logger
+
+log = get_logger("conversation_summary")
+
+SUMMARY_EVERY = int(os.getenv("CONVERSATION_SUMMARY_EVERY", "6"))          # K — messages folded per update
+RECENT_MESSAGES = int(os.getenv("CONVERSATION_RECENT_MESSAGES", "6"))      # raw messages always kept
+SUMMARY_MAX_CHARS = int(os.getenv("CONVERSATION_SUMMARY_MAX_CHARS", "1500"))
+
+
+def unsummarized(conversation_id, after_id=0):
+    """
+    Messages with an id above after_id (the rest are folded into the summary),
+    in id order — the order they were stored, which for write-behind chat
+    exchanges can be later than their created_at.
+    """
+    messages = Message.query.filter(
+        Message.conversation_id == conversation_id, Message.id > after_id
+    ).order_by(Message.id).all()
+    return [{'id': m.id, 'role': m.role, 'content': m.content} for m in messages]
+
+
+def format_messages(messages):
+    """Format [{'role', 'content'}] as "User:/Nambi:" lines for Gemini."""
+    lines = []
+    for m in messages:
+        role = "User" if m['role'] == 'user' else "Nambi"
+        lines.append(f"{role}: {m['content']}")
+    return "\n".join(lines)
+
+
+def history_text(summary, recent):
+    """Summary of earlier turns followed by the recent messages verbatim."""
+    recent_text = format_messages(recent)
+    if not summary:
+        return recent_text
+    return f"(Summary of earlier conversation: {summary})\n{recent_text}"
+
+
+def fold_count(unsummarized):
+    """How many of the oldest unsummarized messages to fold now (0 = not yet)."""
+    if unsummarized < SUMMARY_EVERY + RECENT_MESSAGES:
+        return 0
+    return unsummarized - RECENT_MESSAGES
+
+
+def summarize(previous, messages, model=None):
+    """Fold messages into the previous summary with one Gemini call."""
+    if model is None:
+        from gemini import get_gemini_model
+        model = get_gemini_model()
+
+    prompt = f"""Update the running summary of a conversation between a traveller and Nambi, a Uganda travel assistant.
+
+CURRENT SUMMARY:
+{previous or "(none yet)"}
+
+NEW MESSAGES:
+{format_messages(messages)}
+
+Write the updated summary in at most {SUMMARY_MAX_CHARS // 6} words. Keep every fact the traveller has given
+(trip length, budget, interests, accommodation, pace, group size, dates, names) and any open questions.
+Drop greetings and small talk. Return only the summary text."""
+
+    text = model.generate_content(prompt).text.strip()
+    return text[:SUMMARY_MAX_CHARS]
+
+
+def refresh(conversation, history):
+    """
+    history holds the messages after conversation.summary_through_id, in id
+    order, each with its 'id'. Folds the oldest of them into the summary
+    when due and returns the messages still to be sent verbatim. Never
+    raises — on failure the raw history is used until the next attempt.
+    Blocks on a Gemini call: requests use schedule_fold() instead.
+    """
+    n = fold_count(len(history))
+    if not n:
+        return history
+
+    from gemini import get_gemini_model
+    previous_id = conversation.summary_through_id or 0
+    through_id = history[n - 1]['id']
+    try:
+        summary = summarize(conversation.summary, history[:n], model=get_gemini_model(background=True))
+    except Exception as e:
+        log.warning(f"Summary update skipped for conversation={conversation.id}: {e}")
+        return history
+
+    # Compare-and-set: a concurrent request that already folded these messages wins
+    updated = Conversation.query.filter_by(
+        id=conversation.id, summary_through_id=previous_id
+    ).update({"summary": summary, "summary_through_id": through_id}, synchronize_session=False)
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        log.warning(f"Summary save failed for conversation={conversation.id}: {e}")
+        return history
+
+    if updated:
+        conversation.summary = summary
+        conversation.summary_through_id = through_id
+        log.info(f"Summary updated | conversation={conversation.id} | folded={n} | chars={len(summary)}")
+        return history[n:]
+    db.session.refresh(conversation)
+    return [m for m in history if m['id'] > (conversation.summary_through_id or 0)]
+
+
+# One fold at a time per process; threads start on first use, so none is inherited across fork
+_fold_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-summary")
+_pending = set()   # conversation ids with a fold queued or running
+_pending_lock = threading.Lock()
+
+
+def _after_fork():
+    global _pending_lock
+    _pending_lock = threading.Lock()
+    _pending.clear()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def schedule_fold(app, conversation, history):
+    """
+    Queue a background refresh() when history (as for refresh) has a fold
+    due. Returns at once; True if a fold was queued.
+    """
+    if not fold_count(len(history)):
+        return False
+    with _pending_lock:
+        if conversation.id in _pending:
+            return False
+        _pending.add(conversation.id)
+    _fold_pool.submit(_fold, app, conversation.id)
+    return True
+
+
+def _fold(app, conversation_id):
+    try:
+        with app.app_context():
+            conversation = db.session.get(Conversation, conversation_id)
+            if conversation is not None:
+                refresh(conversation, unsummarized(conversation.id, conversation.summary_through_id or 0))
+    except Exception as e:
+        log.warning(f"Background summary update failed for conversation={conversation_id}: {e}")
+    finally:
+        with _pending_lock:
+            _pending.discard(conversation_id)
@@ -0,0 +1,196 @@
+"""
+Write-behind persistence for chat and voice exchanges
+Requests hand question/answer pairs to one writer thread per process through
+a bounded queue. The writer coalesces them into a single transaction every
+WRITE_BEHIND_FLUSH_MS or WRITE_BEHIND_BATCH records: one upsert for the
+conversations, one multi-row insert for the messages.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from extensions import db
+from models.conversation import Conversation
+from models.message import Message
+from logger import get_logger
+
+log = get_logger("conversation_writer")
+
+QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000"))
+BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH", "200"))
+FLUSH_MS = int(os.getenv("WRITE_BEHIND_FLUSH_MS", "250"))
+ENQUEUE_TIMEOUT = 0.05  # seconds a request may wait on a full queue before the record is dropped
+
+_STOP = object()
+
+
+def _upsert_conversations(rows):
+    """INSERT ... ON CONFLICT (session_id) DO NOTHING for the dialects that support it."""
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        existing = set(db.session.scalars(
+            select(Conversation.session_id).where(Conversation.session_id.in_([r["session_id"] for r in rows]))
+        ))
+        rows = [r for r in rows if r["session_id"] not in existing]
+        if rows:
+            db.session.execute(insert(Conversation), rows)
+        return
+    db.session.execute(
+        dialect_insert(Conversation).values(rows).on_conflict_do_nothing(index_elements=["session_id"])
+    )
+
+
+class ConversationWriter:
+    """Single background writer fed by a bounded queue"""
+
+    def __init__(self, queue_size=None, batch_size=None, flush_ms=None):
+        self.batch_size = batch_size or BATCH_SIZE
+        self.flush_interval = (flush_ms or FLUSH_MS) / 1000.0
+        self._queue = queue.Queue(maxsize=queue_size or QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._app = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self._flush_ms = deque(maxlen=200)
+
+    def submit(self, app, session_id, language, question, answer):
+        """Queue one exchange. Never blocks the request for more than ENQUEUE_TIMEOUT."""
+        self._ensure_started(app)
+        record = (session_id, language or "en", question, answer, datetime.utcnow())
+        try:
+            self._queue.put(record, timeout=ENQUEUE_TIMEOUT)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            log.error(f"Write-behind queue full — dropped exchange for session={session_id}")
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def _ensure_started(self, app):
+        # gunicorn --preload forks after import: threads don't survive, so track the pid
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._app = app
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="conversation-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                return
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stop = True
+                    break
+                batch.append(record)
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch):
+        t0 = time.perf_counter()
+        try:
+            with self._app.app_context():
+                try:
+                    self._write(batch)
+                except Exception:
+                    db.session.rollback()
+                    raise
+        except Exception as e:
+            with self._lock:
+                self.failed += len(batch)
+            log.error(f"Write-behind flush of {len(batch)} exchanges failed: {e}")
+            return
+        elapsed = (time.perf_counter() - t0) * 1000
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+            self._flush_ms.append(elapsed)
+        log.debug(f"Flushed {len(batch)} exchanges in {elapsed:.1f}ms")
+
+    @staticmethod
+    def _write(batch):
+        languages = {}
+        for session_id, language, _, _, _ in batch:
+            languages.setdefault(session_id, language)
+        _upsert_conversations([
+            {"session_id": sid, "language": lang, "is_active": True} for sid, lang in languages.items()
+        ])
+        ids = dict(db.session.execute(
+            select(Conversation.session_id, Conversation.id).where(Conversation.session_id.in_(list(languages)))
+        ).all())
+        rows = []
+        for session_id, _, question, answer, at in batch:
+            rows.append({"conversation_id": ids[session_id], "role": "user", "content": question, "created_at": at})
+            rows.append({"conversation_id": ids[session_id], "role": "bot", "content": answer, "created_at": at})
+        db.session.execute(insert(Message), rows)
+        db.session.commit()
+
+    def drain(self, timeout=10.0):
+        """Flush everything queued and stop the writer (shutdown hook)."""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            log.error("Write-behind drain timed out — queue still full")
+            return
+        thread.join(timeout)
+        with self._lock:
+            self._thread = None
+        log.info(f"Write-behind writer drained | written={self.written} failed={self.failed}")
+
+    def stats(self):
+        with self._lock:
+            samples = sorted(self._flush_ms)
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "avg_batch_size": round(self.written / self.batches, 2) if self.batches else 0.0,
+                "flush_ms_avg": round(sum(samples) / len(samples), 2) if samples else 0.0,
+                "flush_ms_p95": round(samples[max(0, int(len(samples) * 0.95) - 1)], 2) if samples else 0.0,
+                "flush_ms_max": round(samples[-1], 2) if samples else 0.0,
+            }
+
+
+conversation_writer = ConversationWriter()
+atexit.register(conversation_writer.drain)
@@ -0,0 +1,194 @@
+"""
+Pre-generated answers for the suggested and booking questions
+Every user who taps a suggested question gets the same answer, so after each
+content load one process per host (whoever takes the FAQ lock) generates
+them all — every question in its own language — in a concurrency-limited
+batch and writes them to FAQ_PATH keyed by content version. The batch runs
+at low priority: a call is only admitted while the Gemini bucket has spare
+capacity, so live requests never queue behind it. Every worker
+loads that file, and a tap is answered with a dict lookup. Answers for an
+older content version are never served.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from gemini import GeminiUnavailable
+from services.answer_cache import normalize_question
+from services.content_snapshot import loader_lock
+from logger import get_logger
+
+log = get_logger("faq_answers")
+
+FAQ_ENABLED = os.getenv("FAQ_PREGEN", "1") == "1"
+FAQ_PATH = os.getenv("FAQ_ANSWERS_PATH", "faq_answers.json")
+FAQ_CONCURRENCY = int(os.getenv("FAQ_PREGEN_CONCURRENCY", "4"))  # Gemini calls in flight per batch
+FAQ_RETRIES = 3                  # failed attempts per question before it is skipped
+FAQ_MAX_BACKOFF = 30.0           # seconds, cap on a Retry-After between attempts
+FAQ_WAIT_INTERVAL = 5.0          # seconds between checks while another process generates
+FAQ_WAIT = float(os.getenv("FAQ_PREGEN_WAIT", "900"))  # give up waiting on another process (or on capacity) after this
+
+
+def _read(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class FaqAnswers:
+    """
+    Per-process view of the pre-generated answers. get() is a lock-free
+    lookup on an immutable (version, answers) pair that is replaced whole.
+    """
+
+    def __init__(self, path=None, concurrency=None):
+        self.path = path or FAQ_PATH
+        self.concurrency = concurrency or FAQ_CONCURRENCY
+        self._loaded = (None, {})   # (content version, {normalized question: {language: answer}})
+        self._target = None         # version this process is loading or generating for
+        self._pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.batches = 0
+        self.generated = 0
+        self.failed = 0
+        self.last_batch_s = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def get(self, question, language, version):
+        """
+        The pre-generated answer for a suggested question, or None. A question
+        tapped while the session language reads differently (French question,
+        no French keyword matched) is answered in the question's own language.
+        """
+        loaded_version, answers = self._loaded
+        if version != loaded_version:
+            return None
+        by_language = answers.get(normalize_question(question))
+        if not by_language:
+            return None
+        answer = by_language.get(language) or next(iter(by_language.values()))
+        with self._lock:
+            self.hits += 1
+        return answer
+
+    def ensure(self, version, questions, generate):
+        """
+        Make answers for `version` available in this process, in the
+        background. questions: [(question, language)]; generate(question,
+        language) returns the answer text. Cheap when already under way.
+        """
+        if not FAQ_ENABLED or not version:
+            return
+        if self._target == version and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._target == version and self._pid == os.getpid():
+                return
+            self._target = version
+            self._pid = os.getpid()
+            if self._install(version):
+                return
+            self._thread = threading.Thread(target=self._run, args=(version, questions, generate),
+                                            name="faq-pregen", daemon=True)
+            self._thread.start()
+
+    def _install(self, version):
+        data = _read(self.path)
+        if not data or data.get("version") != version:
+            return False
+        answers = {}
+        for question, language, answer in data["answers"]:
+            answers.setdefault(normalize_question(question), {})[language] = answer
+        self._loaded = (version, answers)
+        log.info(f"FAQ answers installed: {len(data['answers'])} | version={version}")
+        return True
+
+    def _run(self, version, questions, generate):
+        deadline = time.monotonic() + FAQ_WAIT
+        while self._target == version and time.monotonic() < deadline:
+            with loader_lock(self.path, blocking=False) as owner:
+                if self._install(version):
+                    return
+                if owner:
+                    try:
+                        self._generate(version, questions, generate)
+                    except Exception as e:
+                        log.error(f"FAQ pre-generation failed: {e}", exc_info=True)
+                    return
+            time.sleep(FAQ_WAIT_INTERVAL)
+
+    def _generate(self, version, questions, generate):
+        """One batch for `version`; the caller holds the FAQ lock."""
+        t0 = time.perf_counter()
+        unique = list(dict.fromkeys((q, lang) for q, lang in questions))
+
+        deadline = time.monotonic() + FAQ_WAIT
+
+        def one(item):
+            question, language = item
+            failures = 0
+            while failures < FAQ_RETRIES and time.monotonic() < deadline:
+                if self._target != version:
+                    return None     # a newer content version superseded this batch
+                try:
+                    return generate(question, language)
+                except GeminiUnavailable as e:
+                    # Calls are admitted at low priority: wait for spare capacity instead of competing
+                    # for it; being held back isn't a failure, so it doesn't use up an attempt
+                    time.sleep(min(e.retry_after or 1, FAQ_MAX_BACKOFF))
+                except Exception as e:
+                    failures += 1
+                    log.warning(f"FAQ answer failed | lang={language} | q='{question[:60]}' | {e}")
+            return None
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="faq-pregen") as pool:
+            results = list(pool.map(one, unique))
+
+        answers = [[q, lang, a] for (q, lang), a in zip(unique, results) if a]
+        self.batches += 1
+        self.generated += len(answers)
+        self.failed += len(unique) - len(answers)
+        self.last_batch_s = round(time.perf_counter() - t0, 2)
+        if self._target != version:
+            return
+        _write(self.path, {"version": version, "generated_at": time.time(), "answers": answers})
+        self._install(version)
+        log.info(f"FAQ pre-generation: {len(answers)}/{len(unique)} answers in {self.last_batch_s}s "
+                 f"| version={version}")
+
+    def stats(self):
+        version, answers = self._loaded
+        return {
+            "enabled": FAQ_ENABLED,
+            "version": version,
+            "target_version": self._target,
+            "questions": len(answers),
+            "answers": sum(len(a) for a in answers.values()),
+            "generating": self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+            "hits": self.hits,
+            "batches": self.batches,
+            "generated": self.generated,
+            "failed": self.failed,
+            "last_batch_s": self.last_batch_s,
+            "concurrency": self.concurrency,
+        }
+
+
+faq_answers = FaqAnswers()
@@ -0,0 +1,126 @@
+"""
+Compiled keyword matcher for /api/chat
+Greeting words (-> language) and intent keywords (-> canned reply) are
+compiled once at import into a single alternation regex, so one pass over
+the question yields both. Keywords only match as whole words: "agent" no
+longer fires inside "agents", nor "talk" inside "talking".
+"""
+
+import re
+
+# Greeting word -> language. Earlier entries win when several appear.
+GREETING_LANGUAGES = {
+    'habari': 'sw', 'jambo': 'sw', 'mambo': 'sw', 'karibu': 'sw',
+    'bonjour': 'fr', 'salut': 'fr', 'bonsoir': 'fr',
+    'hola': 'es', 'buenos': 'es', 'gracias': 'es',
+    'hallo': 'de', 'guten': 'de', 'danke': 'de',
+    'ciao': 'it', 'buongiorno': 'it', 'grazie': 'it',
+    'olá': 'pt', 'obrigado': 'pt',
+    'привет': 'ru', 'здравствуйте': 'ru', 'спасибо': 'ru',
+    'مرحبا': 'ar', 'شكرا': 'ar', 'السلام': 'ar',
+    'नमस्ते': 'hi', 'धन्यवाद': 'hi',
+    '안녕': 'ko', '감사': 'ko',
+    'こんにちは': 'ja', 'ありがとう': 'ja',
+    '你好': 'zh-cn', '谢谢': 'zh-cn',
+}
+
+# Whole-message greetings answered with the welcome message
+SIMPLE_GREETINGS = frozenset([
+    "hi", "hello", "hey", "good morning", "good afternoon", "good evening", "greetings",
+    "habari", "jambo", "mambo", "bonjour", "hola", "hallo", "ciao", "olá", "привет", "你好", "مرحبا",
+])
+
+# Intent -> keywords, in priority order (first intent found wins)
+INTENT_KEYWORDS = {
+    "itinerary": [
+        "itinerary", "build itinerary", "create itinerary", "plan itinerary",
+        "trip plan", "travel plan", "day by day", "schedule", "build a trip",
+        "plan my trip", "create a plan", "safari plan", "tengeneza ratiba",
+        "ratiba", "mpango wa safari",
+    ],
+    "human": [
+        "speak to human", "talk to someone", "real person", "human agent",
+        "speak to agent", "contact staff", "call me", "whatsapp",
+        "speak to a person", "i need help", "agent", "representative",
+        "niongee na mtu", "msaada wa mtu",
+    ],
+    "booking": [
+        "book", "booking", "reserve", "reservation", "i want to book",
+        "how do i book", "book now", "yes please", "make a booking",
+        "hifadhi", "weka", "ninataka kuhifadhi", "réserver", "reservar",
+        "buchen", "prenotare", "i want to travel", "plan a trip",
+    ],
+    "voice": [
+        "voice", "speak", "talk", "audio", "listen", "microphone",
+        "record", "voice chat", "speak to nambi",
+    ],
+}
+
+# Scripts written without spaces between words — matched as substrings, as before
+_UNSPACED = re.compile(r'[\u3040-\u30ff\u4e00-\u9fff\uac00-\ud7af]')
+
+
+def _trie_pattern(keywords):
+    """
+    Prefix-factored alternation for keywords ("book", "booking", "book now"
+    -> "book(?:ing|\\s+now)?"), so the regex engine does one branch per
+    character instead of trying every keyword at every position. Longer
+    continuations are tried first; spaces match any whitespace run.
+    """
+    trie = {}
+    for word in keywords:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def render(node):
+        end = "" in node
+        branches = [(r"\s+" if ch == " " else re.escape(ch)) + render(child)
+                    for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end:
+            return body + "?" if len(branches) == 1 and len(body) == 1 else f"(?:{body})?"
+        return body
+
+    return render(trie)
+
+
+def _compile():
+    # Keyword -> [(kind, value, priority)]; a keyword can be both a greeting and an intent
+    table = {}
+    for priority, (word, lang) in enumerate(GREETING_LANGUAGES.items()):
+        table.setdefault(word, []).append(("language", lang, priority))
+    for priority, (intent, keywords) in enumerate(INTENT_KEYWORDS.items()):
+        for word in keywords:
+            table.setdefault(word, []).append(("intent", intent, priority))
+
+    spaced = [w for w in table if not _UNSPACED.search(w)]
+    unspaced = [w for w in table if _UNSPACED.search(w)]
+    regex = re.compile(rf"(?<!\w)(?:{_trie_pattern(spaced)})(?!\w)|{_trie_pattern(unspaced)}")
+    return regex, table
+
+
+_REGEX, _TABLE = _compile()
+
+
+def match(text):
+    """
+    One pass over text. Returns (language, intent): the language of the
+    highest-priority greeting word and the highest-priority intent found,
+    each None if absent.
+    """
+    best = {"language": None, "intent": None}
+    for m in _REGEX.finditer(text.lower()):
+        for kind, value, priority in _TABLE[" ".join(m.group().split())]:
+            current = best[kind]
+            if current is None or priority < current[1]:
+                best[kind] = (value, priority)
+    language, intent = best["language"], best["intent"]
+    return (language[0] if language else None), (intent[0] if intent else None)
+
+
+def is_simple_greeting(text):
+    return not text or text.lower().strip() in SIMPLE_GREETINGS
@@ -3,8 +3,9 @@ AI-powered Dynamic Itinerary Builder
 Generates personalized itineraries through natural conversation
 """
 
-from gemini import get_gemini_model
+from gemini import get_gemini_model, GeminiUnavailable
 from services.itinerary_validator import ItineraryValidator
+from services.prompt_builder import get_company_context, itinerary_prompts
 from models.itinerary import Itinerary
 from extensions import db
 import json
@@ -137,40 +138,46 @@ class ItineraryBuilder:
         Generate a detailed itinerary using AI
         """
         model = get_gemini_model()
-        
-        # Build the prompt
-        prompt = f"""You are an expert Uganda travel planner. Create a detailed, day-by-day itinerary based on these requirements:
+        prompt = ItineraryBuilder._generation_prompt(info, site_content)
 
-TRAVELER REQUIREMENTS:
+        try:
+            # The static planner instructions are served from Gemini's context cache when available
+            response = model.generate_cached(prompt.static_prefix, prompt.suffix, fallback_prompt=prompt.full_prompt,
+                                             label="itinerary", prefix_digest=prompt.prefix_digest)
+            return ItineraryBuilder._parse_generation(response.text, info), None
+        except GeminiUnavailable:
+            raise  # route answers 503 + Retry-After
+        except Exception as e:
+            return None, f"Failed to generate itinerary: {str(e)}"
+
+    @staticmethod
+    async def generate_itinerary_async(info, site_content):
+        """generate_itinerary() for the async path (async_app.py)"""
+        model = get_gemini_model()
+        prompt = ItineraryBuilder._generation_prompt(info, site_content)
+
+        try:
+            response = await model.generate_cached_async(prompt.static_prefix, prompt.suffix,
+                                                         fallback_prompt=prompt.full_prompt,
+                                                         label="itinerary", prefix_digest=prompt.prefix_digest)
+            return ItineraryBuilder._parse_generation(response.text, info), None
+        except GeminiUnavailable:
+            raise
+        except Exception as e:
+            return None, f"Failed to generate itinerary: {str(e)}"
+
+    @staticmethod
+    def _generation_prompt(info, site_content):
+        """The Prompt for an itinerary generation call"""
+        requirements = f"""TRAVELER REQUIREMENTS:
 - Duration: {info['duration']} days
 - Budget: £{info['budget']} per person (British Pounds)
 - Interests: {info['interests']}
 - Pace: {info.get('pace', 'moderate')}
 - Accommodation: {info['accommodation']}
-- Group size: {info.get('group_size', 1)} person(s)
+- Group size: {info.get('group_size', 1)} person(s)"""
 
-AVAILABLE ACTIVITIES (include relevant ones based on interests):
-Wildlife & Nature: gorilla trekking, chimpanzee tracking, game drives, bird watching, nature walks
-Adventure: white water rafting, hiking, mountain climbing, zip-lining, quad biking
-Culture & Heritage: village visits, cultural performances, craft markets, historical sites
-Water Activities: fishing on Lake Victoria or Lake Albert, Nile perch angling, boat cruises, lake fishing
-Agro-experiences: agrofarming tours, coffee plantation visits, vanilla farm tours, tea estate walks, rural farm stays
-Relaxation: sunset cruises, spa retreats, lodge relaxation, scenic drives
-
-INSTRUCTIONS:
-1. Create a realistic day-by-day itinerary
-2. Include specific destinations from Uganda
-3. Suggest appropriate accommodations for each location
-4. ALL costs must be quoted in British Pounds (£), not USD
-5. Consider travel time between destinations
-6. Match the pace preference (relaxed = fewer activities, packed = more activities)
-7. Focus on the traveler's interests
-8. If interests include agrofarming or fishing, dedicate at least one full day to that activity
-
-UGANDA CONTEXT (use this information):
-{site_content[:3000]}
-
-OUTPUT FORMAT (JSON):
+        output_format = f"""OUTPUT FORMAT (JSON):
 {{
   "title": "Descriptive title",
   "days": {info['duration']},
@@ -183,23 +190,22 @@ OUTPUT FORMAT (JSON):
 }}
 
 Generate the itinerary now:"""
-        
-        try:
-            response = model.generate_content(prompt)
-            response_text = response.text
-            
-            # Try to extract JSON from response
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                itinerary_data = json.loads(json_match.group())
-                return itinerary_data, None
-            else:
-                # If no JSON, parse the text response
-                return ItineraryBuilder._parse_text_response(response_text, info), None
-                
-        except Exception as e:
-            return None, f"Failed to generate itinerary: {str(e)}"
-    
+
+        # Uganda context for the full prompt: the passages that match the traveller's interests
+        query = f"{info['interests']} {info['accommodation']} Uganda"
+        prompt = itinerary_prompts.build(lambda budget: get_company_context(query, site_content, budget),
+                                         requirements=requirements, output_format=output_format)
+        return prompt
+
+    @staticmethod
+    def _parse_generation(response_text, info):
+        # Try to extract JSON from response
+        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group())
+        # If no JSON, parse the text response
+        return ItineraryBuilder._parse_text_response(response_text, info)
+
     @staticmethod
     def _parse_text_response(text, info):
         """Parse a text response into itinerary format"""
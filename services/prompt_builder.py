@@ -0,0 +1,241 @@
+"""
+Prompt assembly shared by chat, voice and itinerary generation
+Each prompt is a system template around company content plus a per-request
+part (question, traveller requirements). Templates are split into literal
+segments once at import. The static prefix is the instructions ahead of the
+company content: the same for every request, it is rendered and hashed once
+and is what Gemini may cache. Retrieved passages and the request follow it
+in the suffix, so the cached and the full prompt carry the same context.
+Whichever form a request takes — cached prefix plus suffix, or the full
+prompt — it is held to the token budget of every model it may be sent to
+by shrinking the retrieved context; sizes are recorded per endpoint.
+"""
+
+import os
+import string
+import threading
+from collections import deque, namedtuple
+
+from gemini import digest_prefix, serving_models
+from services.content_index import RETRIEVAL_CHAR_BUDGET, select_context
+from logger import get_logger
+
+log = get_logger("prompt_builder")
+
+BYTES_PER_TOKEN = 4   # estimate: Gemini averages ~4 bytes of UTF-8 per token on this content
+DEFAULT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "4000"))  # per request, cached prefix included
+STATS_WINDOW = 500    # prompts kept per endpoint for percentiles
+
+
+def _parse_budgets(spec):
+    """"gemini-2.5-flash:6000,gemini-2.0-flash-lite:3000" -> {model: tokens}"""
+    budgets = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, tokens = item.rpartition(":")
+        budgets[model] = int(tokens)
+    return budgets
+
+
+MODEL_TOKEN_BUDGETS = _parse_budgets(os.getenv("PROMPT_TOKEN_BUDGETS", ""))
+
+
+def estimate_tokens(text):
+    """Token count estimate without a tokenizer round trip."""
+    return -(-len(text.encode("utf-8")) // BYTES_PER_TOKEN)
+
+
+def token_budget(models=None):
+    """The tightest budget among the models a prompt may be sent to."""
+    return min(MODEL_TOKEN_BUDGETS.get(m, DEFAULT_TOKEN_BUDGET) for m in (models or serving_models()))
+
+
+_indexed = (None, None)   # (site content, its ContentIndex), set when content is installed
+
+
+def set_content_index(site_content, index):
+    """Register the retrieval index for the installed site content."""
+    global _indexed
+    _indexed = (site_content, index)
+
+
+def get_company_context(question, site_content, char_budget=None):
+    """Company content for a prompt — only the passages relevant to the question."""
+    text, index = _indexed
+    if site_content is not text:
+        index = None
+    if char_budget is None:
+        return select_context(index, site_content, question)
+    return select_context(index, site_content, question, char_budget)
+
+
+def _clip_bytes(text, max_bytes):
+    data = text.encode("utf-8")
+    if len(data) <= max_bytes:
+        return text
+    return data[:max(0, max_bytes)].decode("utf-8", errors="ignore")
+
+
+class _Template:
+    """A str.format template split once into (literal, field) segments."""
+
+    def __init__(self, text):
+        self.segments = [(literal, field) for literal, field, _, _ in string.Formatter().parse(text)]
+        self.literal_bytes = sum(len(literal.encode("utf-8")) for literal, _ in self.segments)
+
+    def render(self, **values):
+        return "".join(literal + (values[field] if field else "") for literal, field in self.segments)
+
+
+# Nambi's persona for chat and voice — one copy
+NAMBI_SYSTEM = """You are Nambi, Virtual Travel Assistant for Everything Uganda. You are warm, fun and quick.
+{language_line}
+CRITICAL: The company content below is scraped LIVE from www.everythinguganda.com.
+Search ALL of it thoroughly before saying you don't have information.
+NEVER say "I don't have that detail" if the topic is Uganda tourism — you always know about Uganda.
+
+RESPONSE RULES:
+- ONE short paragraph — 2-3 sentences max
+- Direct, warm, conversational
+- End with a follow-up question
+- No bullet points, no headers
+
+COMPANY CONTENT:
+{content}
+"""
+
+ACTIVITIES_AND_INSTRUCTIONS = """AVAILABLE ACTIVITIES (include relevant ones based on interests):
+Wildlife & Nature: gorilla trekking, chimpanzee tracking, game drives, bird watching, nature walks
+Adventure: white water rafting, hiking, mountain climbing, zip-lining, quad biking
+Culture & Heritage: village visits, cultural performances, craft markets, historical sites
+Water Activities: fishing on Lake Victoria or Lake Albert, Nile perch angling, boat cruises, lake fishing
+Agro-experiences: agrofarming tours, coffee plantation visits, vanilla farm tours, tea estate walks, rural farm stays
+Relaxation: sunset cruises, spa retreats, lodge relaxation, scenic drives
+
+INSTRUCTIONS:
+1. Create a realistic day-by-day itinerary
+2. Include specific destinations from Uganda
+3. Suggest appropriate accommodations for each location
+4. ALL costs must be quoted in British Pounds (£), not USD
+5. Consider travel time between destinations
+6. Match the pace preference (relaxed = fewer activities, packed = more activities)
+7. Focus on the traveler's interests
+8. If interests include agrofarming or fishing, dedicate at least one full day to that activity"""
+
+PLANNER_SYSTEM = """You are an expert Uganda travel planner. Create a detailed, day-by-day itinerary based on the traveler requirements you are given.
+
+""" + ACTIVITIES_AND_INSTRUCTIONS.replace("{", "{{").replace("}", "}}") + """
+
+UGANDA CONTEXT (use this information):
+{content}
+"""
+
+# static_prefix: the instructions, cacheable; prefix_digest: its identity for caching and single-flight;
+# suffix: retrieved context and request, what follows it on the cached path;
+# full_prompt: the self-contained fallback; tokens: estimate of what the request sends, on either path
+Prompt = namedtuple("Prompt", "static_prefix prefix_digest suffix full_prompt tokens")
+
+
+class PromptBuilder:
+    """
+    One endpoint's prompts. system has {content} (and optionally
+    {language_line}); what comes before {content} is the static prefix.
+    request is the per-request part, formatted from the fields passed to
+    build().
+    """
+
+    _registry = {}
+
+    def __init__(self, endpoint, system, request, joiner="\n\n", language_line=None, language_prefix=None):
+        self.endpoint = endpoint
+        self.system = _Template(system)
+        head, _, tail = system.partition("{content}")
+        self.tail = _Template(tail).render()
+        self.request = _Template(request)
+        self.joiner = joiner
+        self.language_line = language_line      # inside the system prompt of the full prompt
+        self.language_prefix = language_prefix  # ahead of the request in the cached suffix
+        prefix = _Template(head).render(language_line="")
+        self._static = (prefix, digest_prefix(prefix), estimate_tokens(prefix))
+        self._lock = threading.Lock()
+        self._sizes = deque(maxlen=STATS_WINDOW)
+        self.prompts = 0
+        self.context_limited = 0
+        self.truncated = 0
+        PromptBuilder._registry[endpoint] = self
+
+    def build(self, context, language=None, **fields):
+        """
+        Prompt for one request. context(char_budget) returns the company
+        content to embed (in the suffix and the full prompt alike); it is
+        asked for no more than the budget leaves room for, and clipped if it
+        overshoots, so the cached path (static prefix + suffix) and the full
+        prompt both fit token_budget().
+        """
+        request = self.request.render(**fields)
+        language_line = self.language_line.format(language=language) if self.language_line and language else ""
+        prefix = self.language_prefix.format(language=language) if self.language_prefix and language else ""
+        budget_bytes = token_budget() * BYTES_PER_TOKEN
+        # The full prompt carries language_line, the cached path prefix + suffix carries language_prefix
+        language_bytes = max(len(language_line.encode("utf-8")), len(prefix.encode("utf-8")))
+        fixed = self.system.literal_bytes + language_bytes + len(self.joiner)
+
+        room = budget_bytes - fixed - len(request.encode("utf-8"))
+        truncated = room < 0
+        if truncated:
+            # Only an oversized question gets here; it keeps its head, the context gets nothing
+            request = _clip_bytes(request, budget_bytes - fixed)
+            room = 0
+        limit = min(RETRIEVAL_CHAR_BUDGET, room)
+        company = _clip_bytes(context(limit) if limit > 0 else "", room)
+
+        full_prompt = self.system.render(language_line=language_line, content=company) + self.joiner + request
+        suffix = company + self.tail + self.joiner + prefix + request
+        static_prefix, digest, _ = self._static
+        tokens = max(estimate_tokens(full_prompt), estimate_tokens(static_prefix + suffix))
+        self._record(tokens, estimate_tokens(suffix), limit < RETRIEVAL_CHAR_BUDGET, truncated)
+        return Prompt(static_prefix, digest, suffix, full_prompt, tokens)
+
+    def _record(self, tokens, suffix_tokens, context_limited, truncated):
+        with self._lock:
+            self.prompts += 1
+            self._sizes.append((tokens, suffix_tokens))
+            self.context_limited += context_limited
+            self.truncated += truncated
+        if truncated:
+            log.warning(f"{self.endpoint} prompt over its {token_budget()}-token budget — request text clipped")
+
+    def stats(self):
+        with self._lock:
+            sizes = list(self._sizes)
+            counters = {"prompts": self.prompts, "context_limited": self.context_limited,
+                        "truncated": self.truncated}
+        sent = sorted(s[0] for s in sizes)
+        return {
+            **counters,
+            "token_budget": token_budget(),
+            "static_prefix_tokens": self._static[2],
+            # Per request, cached prefix included — a cached prefix is cheaper to bill, not smaller
+            "request_tokens": {
+                "mean": round(sum(sent) / len(sent)) if sent else 0,
+                "p50": sent[len(sent) // 2] if sent else 0,
+                "p95": sent[min(len(sent) - 1, int(len(sent) * 0.95))] if sent else 0,
+                "max": sent[-1] if sent else 0,
+            },
+            "suffix_tokens_mean": round(sum(s[1] for s in sizes) / len(sizes)) if sizes else 0,
+        }
+
+
+def prompt_stats():
+    """Prompt sizes per endpoint for the diagnostics endpoint."""
+    return {"models": {m: token_budget([m]) for m in serving_models()},
+            "endpoints": {name: b.stats() for name, b in PromptBuilder._registry.items()}}
+
+
+_LANGUAGE_LINE = "\nLANGUAGE: Respond in {language} only.\n"
+_LANGUAGE_PREFIX = "LANGUAGE: Respond in {language} only.\n\n"
+
+chat_prompts = PromptBuilder("chat", NAMBI_SYSTEM, "User: {question}",
+                             language_line=_LANGUAGE_LINE, language_prefix=_LANGUAGE_PREFIX)
+voice_prompts = PromptBuilder("voice", NAMBI_SYSTEM, "User Question:\n{question}",
+                              language_line=_LANGUAGE_LINE, language_prefix=_LANGUAGE_PREFIX)
+itinerary_prompts = PromptBuilder("itinerary", PLANNER_SYSTEM, "{requirements}\n\n{output_format}", joiner="\n")
@@ -0,0 +1,59 @@
+"""
+Static response catalog
+JSON bodies that never change while the process runs (canned chat replies,
+language and model lists) are serialized once, with an ETag, and served
+as raw bytes — no dict building or jsonify per request.
+"""
+
+import hashlib
+import json
+
+from flask import Response, request
+
+STATIC_MAX_AGE = 86400  # seconds browsers/CDNs may reuse GET catalog responses
+
+
+class CatalogEntry:
+    __slots__ = ("payload", "body", "etag")
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.etag = hashlib.sha1(self.body).hexdigest()[:16]
+
+
+class ResponseCatalog:
+    """Pre-serialized JSON responses keyed by tuple, e.g. ("chat", "booking", "fr")."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def add(self, key, payload):
+        entry = CatalogEntry(payload)
+        self._entries[key] = entry
+        return entry
+
+    def get(self, key, fallback=None):
+        entry = self._entries.get(key)
+        if entry is None and fallback is not None:
+            entry = self._entries.get(fallback)
+        return entry
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def catalog_response(entry, max_age=None):
+    """
+    Response for a catalog entry. With max_age (GET endpoints) it carries
+    Cache-Control and answers If-None-Match with 304.
+    """
+    response = Response(entry.body, mimetype="application/json")
+    response.set_etag(entry.etag)
+    if max_age:
+        response.headers["Cache-Control"] = f"public, max-age={max_age}"
+        response.make_conditional(request)
+    return response
+
+
+catalog = ResponseCatalog()